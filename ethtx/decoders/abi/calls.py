@@ -124,14 +124,9 @@ class ABICallsDecoder(ABISubmoduleAbc):
 
             if not function_abi and call.to_address in proxies:
                 # try to find signature in delegate-called contracts
-                for semantic in proxies[call.to_address].semantics:
-                    function_abi = (
-                        semantic.contract.functions[function_signature]
-                        if function_signature in semantic.contract.functions
-                        else None
-                    )
-                    if function_abi:
-                        break
+                function_abi = proxies[call.to_address].get_function_abi(
+                    function_signature
+                )
 
             if not function_abi:
                 if standard == "ERC20":
@@ -81,14 +81,7 @@ class ABIEventsDecoder(ABISubmoduleAbc):
 
             if not event_abi and event.contract in proxies:
                 # try to find signature in delegate-called contracts
-                for semantic in proxies[event.contract].semantics:
-                    event_abi = (
-                        semantic.contract.events[event_signature]
-                        if event_signature in semantic.contract.events
-                        else None
-                    )
-                    if event_abi:
-                        break
+                event_abi = proxies[event.contract].get_event_abi(event_signature)
 
             if not event_abi and event_signature in ERC20_EVENTS:
                 # try standard ERC20 events
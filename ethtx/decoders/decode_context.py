@@ -0,0 +1,80 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+class DecodeContext:
+    """State of one decode: the addresses whose semantics it used and lookups
+    memoized for it. Every decode runs in its own context (see `decode_context`),
+    so one EthTx can decode transactions in many threads at once."""
+
+    def __init__(self):
+        # ordered set of (chain_id, address)
+        self.used: Dict[Tuple[str, str], None] = {}
+        self.memo: Dict[Hashable, Any] = {}
+
+        self._token: Optional[Token] = None
+
+    @property
+    def addresses(self) -> List[str]:
+        return [address for _, address in self.used]
+
+    def use(self, chain_id: str, address: str) -> None:
+        self.used[(chain_id, address)] = None
+
+    def memoize(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        """Value of the key loaded once per decode."""
+        try:
+            return self.memo[key]
+        except KeyError:
+            value = self.memo[key] = load()
+            return value
+
+
+_decode_context: ContextVar[Optional[DecodeContext]] = ContextVar(
+    "decode_context", default=None
+)
+
+
+def get_decode_context() -> Optional[DecodeContext]:
+    """Context of the decode running in the current thread or task, if any."""
+    return _decode_context.get()
+
+
+def start_decode() -> DecodeContext:
+    context = DecodeContext()
+    context._token = _decode_context.set(context)
+    return context
+
+
+def end_decode(context: DecodeContext) -> None:
+    if context._token is not None:
+        _decode_context.reset(context._token)
+        context._token = None
+
+
+@contextmanager
+def decode_context() -> Iterator[DecodeContext]:
+    """Run a decode in a new context, visible to the threads it runs functions in
+    with `run_blocking` and to the tasks it starts."""
+    context = start_decode()
+    try:
+        yield context
+    finally:
+        end_decode(context)
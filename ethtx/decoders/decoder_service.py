@@ -14,18 +14,32 @@
 # not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
 # the trademark and/or other branding elements.
 
+import asyncio
 import logging
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Set, Tuple, Union
 
 from .abi.decoder import ABIDecoder
+from .decode_context import decode_context
 from .semantic.decoder import SemanticDecoder
 from ..models.decoded_model import DecodedTransaction, Proxy
-from ..models.objects_model import Block, Call
+from ..models.objects_model import Block, Call, Transaction
+from ..exceptions import ProcessingException
+from ..providers.async_web3_provider import AsyncWeb3Provider
 from ..providers.web3_provider import NodeDataProvider
-from ..semantics.standards.eip1969 import is_eip1969_proxy, is_eip1969_beacon_proxy
+from ..semantics.standards.erc20 import erc20_transfer_event
+from ..utils.async_tools import run_blocking
 
 log = logging.getLogger(__name__)
 
+EIP1969_PROXY = "EIP1969Proxy"
+EIP1969_BEACON = "EIP1969Beacon"
+GENERIC_PROXY = "GenericProxy"
+PROXY_FALLBACK_NAMES = {
+    EIP1969_PROXY: "EIP1969_Proxy",
+    EIP1969_BEACON: "EIP1969_BeaconProxy",
+    GENERIC_PROXY: "Proxy",
+}
+
 
 class DecoderService:
     def __init__(
@@ -34,11 +48,13 @@ class DecoderService:
         semantic_decoder: SemanticDecoder,
         web3provider: NodeDataProvider,
         default_chain: str,
+        async_web3provider: Optional[AsyncWeb3Provider] = None,
     ):
         self.abi_decoder: ABIDecoder = abi_decoder
         self.semantic_decoder: SemanticDecoder = semantic_decoder
         self.web3provider: NodeDataProvider = web3provider
         self.default_chain: str = default_chain
+        self.async_web3provider: Optional[AsyncWeb3Provider] = async_web3provider
 
     def decode_transaction(
         self, chain_id: str, tx_hash: str, recreate_semantics: bool = False
@@ -48,22 +64,255 @@ class DecoderService:
 
         chain_id = chain_id or self.default_chain
 
-        self.semantic_decoder.repository.record()
-        # read a raw transaction from a node
-        transaction = self.web3provider.get_full_transaction(
-            tx_hash=tx_hash, chain_id=chain_id
+        repository = self.semantic_decoder.repository
+        # semantics used by this decode are recorded in its own context
+        with decode_context() as context:
+            # read a raw transaction from a node
+            transaction = self.web3provider.get_full_transaction(
+                tx_hash=tx_hash, chain_id=chain_id
+            )
+            # read a raw block from a node
+            block = Block.from_raw(
+                w3block=self.web3provider.get_block(
+                    transaction.metadata.block_number, chain_id
+                ),
+                chain_id=chain_id,
+            )
+            self._prefetch_semantics(chain_id, [transaction])
+
+            semantically_decoded_tx = self._decode_transaction(
+                block, transaction, chain_id
+            )
+
+        repository.count_usage(context)
+        used_semantics = context.addresses
+        log.info(
+            "Semantics used in decoding %s: %s",
+            tx_hash,
+            ", ".join(used_semantics),
         )
-        # read a raw block from a node
-        block = Block.from_raw(
-            w3block=self.web3provider.get_block(
-                transaction.metadata.block_number, chain_id
-            ),
-            chain_id=chain_id,
+
+        if recreate_semantics:
+            repository.delete_semantics(chain_id, used_semantics)
+            return self.decode_transaction(chain_id, tx_hash, False)
+
+        return semantically_decoded_tx
+
+    def decode_block(
+        self, chain_id: str, block_number: int
+    ) -> List[DecodedTransaction]:
+        chain_id = chain_id or self.default_chain
+
+        # read the block with all transactions, receipts and traces from a node
+        block = self.web3provider.get_full_block(
+            block_number=block_number, chain_id=chain_id
         )
 
-        # prepare lists of delegations to properly decode delegate-calling contracts
-        delegations = self.get_delegations(transaction.root_call)
-        proxies = self.get_proxies(delegations, chain_id)
+        self._prefetch_semantics(chain_id, block.transactions)
+
+        repository = self.semantic_decoder.repository
+        decoded_transactions = []
+        for transaction in block.transactions:
+            with decode_context() as context:
+                decoded_transactions.append(
+                    self._decode_transaction(block, transaction, chain_id)
+                )
+            repository.count_usage(context)
+            log.info(
+                "Semantics used in decoding %s: %s",
+                transaction.metadata.tx_hash,
+                ", ".join(context.addresses),
+            )
+
+        return decoded_transactions
+
+    async def decode_transaction_async(
+        self, chain_id: str, tx_hash: str
+    ) -> DecodedTransaction:
+        tx_hash = tx_hash if tx_hash.startswith("0x") else "0x" + tx_hash
+        chain_id = chain_id or self.default_chain
+
+        if self.async_web3provider is None:
+            raise ProcessingException("async decoding requires an AsyncWeb3Provider")
+
+        # the tasks and threads of this decode share its context
+        with decode_context() as context:
+            # the transaction, its receipt and trace are read concurrently
+            transaction = await self.async_web3provider.get_full_transaction(
+                tx_hash=tx_hash, chain_id=chain_id
+            )
+
+            # the block and proxy storage slots are read concurrently, together with
+            # the semantics (and token metadata) of all the contracts used
+            delegations = self.get_delegations(transaction.root_call)
+            w3block, proxy_types, _ = await asyncio.gather(
+                self.async_web3provider.get_block(
+                    transaction.metadata.block_number, chain_id
+                ),
+                asyncio.gather(
+                    *(
+                        self._get_proxy_type_async(
+                            chain_id,
+                            delegator,
+                            delegates[0],
+                            transaction.metadata.block_number,
+                        )
+                        for delegator, delegates in delegations.items()
+                    )
+                ),
+                self._prefetch_semantics_async(chain_id, transaction),
+            )
+            block = Block.from_raw(w3block=w3block, chain_id=chain_id)
+
+            # decoding itself is blocking
+            decoded_transaction = await run_blocking(
+                self._decode_with_proxy_types,
+                block,
+                transaction,
+                chain_id,
+                delegations,
+                dict(zip(delegations, proxy_types)),
+            )
+
+        self.semantic_decoder.repository.count_usage(context)
+        log.info(
+            "Semantics used in decoding %s: %s", tx_hash, ", ".join(context.addresses)
+        )
+
+        return decoded_transaction
+
+    async def _prefetch_semantics_async(
+        self, chain_id: str, transaction: Transaction
+    ) -> None:
+        await run_blocking(self._prefetch_semantics, chain_id, [transaction])
+        contracts = self._get_contracts(transaction)
+
+        # code of new contracts is read concurrently, stored ones are known from the
+        # prefetched semantics
+        await asyncio.gather(
+            *(
+                self.async_web3provider.get_code_hash(address, chain_id)
+                for address in contracts
+            )
+        )
+
+        # semantics of new contracts are created concurrently
+        repository = self.semantic_decoder.repository
+        await asyncio.gather(
+            *(
+                run_blocking(repository.get_semantics, chain_id, address)
+                for address in contracts
+            )
+        )
+
+    async def _get_proxy_type_async(
+        self, chain_id: str, delegator: str, delegate: str, block_number: int
+    ) -> str:
+        implementations = await self.async_web3provider.get_proxy_implementations(
+            delegator, chain_id, block_number
+        )
+        return self._get_proxy_type(delegate, implementations)
+
+    def _decode_with_proxy_types(
+        self,
+        block: Block,
+        transaction: Transaction,
+        chain_id: str,
+        delegations: Dict[str, List[str]],
+        proxy_types: Dict[str, str],
+    ) -> DecodedTransaction:
+        proxies = {
+            delegator: self._create_proxy(
+                chain_id, delegator, delegates, proxy_types[delegator]
+            )
+            for delegator, delegates in delegations.items()
+        }
+
+        return self._decode_transaction(block, transaction, chain_id, proxies)
+
+    def _prefetch_semantics(
+        self, chain_id: str, transactions: List[Transaction]
+    ) -> None:
+        """Read stored semantics of all the addresses used by the transactions at once."""
+        contracts = set().union(
+            *(self._get_contracts(transaction) for transaction in transactions)
+        )
+        addresses = contracts.union(
+            *(self._get_addresses(transaction) for transaction in transactions)
+        )
+        fields = set().union(
+            *(self._get_contract_fields(transaction) for transaction in transactions)
+        )
+        self.semantic_decoder.repository.prefetch_semantics(
+            chain_id, addresses, contracts, fields
+        )
+
+    @staticmethod
+    def _get_addresses(transaction: Transaction) -> Set[str]:
+        """Senders of all the calls and parties of Transfer events."""
+        addresses = set()
+
+        calls_queue = [transaction.root_call]
+        while calls_queue:
+            call = calls_queue.pop()
+            calls_queue.extend(call.subcalls)
+            addresses.add(call.from_address)
+
+        for event in transaction.events:
+            if (
+                len(event.topics) >= 3
+                and event.topics[0] == erc20_transfer_event.signature
+            ):
+                addresses.update("0x" + topic[-40:] for topic in event.topics[1:3])
+
+        return addresses
+
+    @staticmethod
+    def _get_contract_fields(transaction: Transaction) -> Set[str]:
+        """Contract entries used to decode the calls and events of the transaction."""
+        signatures = set()
+
+        calls_queue = [transaction.root_call]
+        while calls_queue:
+            call = calls_queue.pop()
+            calls_queue.extend(call.subcalls)
+            if call.call_data and len(call.call_data) >= 10:
+                signatures.add(("functions", call.call_data[:10]))
+
+        for event in transaction.events:
+            if event.topics:
+                signatures.add(("events", event.topics[0]))
+
+        return {f"{part}.{signature}" for part, signature in signatures} | {
+            f"transformations.{signature}" for _, signature in signatures
+        }
+
+    @staticmethod
+    def _get_contracts(transaction: Transaction) -> Set[str]:
+        contracts = {event.contract for event in transaction.events}
+
+        calls_queue = [transaction.root_call]
+        while calls_queue:
+            call = calls_queue.pop()
+            calls_queue.extend(call.subcalls)
+            if call.to_address:
+                contracts.add(call.to_address)
+
+        return contracts
+
+    def _decode_transaction(
+        self,
+        block: Block,
+        transaction: Transaction,
+        chain_id: str,
+        proxies: Optional[Dict[str, Proxy]] = None,
+    ) -> DecodedTransaction:
+        if proxies is None:
+            # prepare lists of delegations to properly decode delegate-calling contracts
+            delegations = self.get_delegations(transaction.root_call)
+            proxies = self.get_proxies(
+                delegations, chain_id, transaction.metadata.block_number
+            )
 
         # decode transaction using ABI
         abi_decoded_tx = self.abi_decoder.decode_transaction(
@@ -71,73 +320,74 @@ class DecoderService:
         )
 
         # decode transaction using additional semantics
-        semantically_decoded_tx = self.semantic_decoder.decode_transaction(
+        return self.semantic_decoder.decode_transaction(
             block=block.metadata,
             transaction=abi_decoded_tx,
             proxies=proxies,
             chain_id=chain_id,
         )
 
-        used_semantics = self.semantic_decoder.repository.end_record()
-        log.info(
-            "Semantics used in decoding %s: %s",
-            tx_hash,
-            ", ".join(set(used_semantics)) if used_semantics else "",
-        )
-
-        if recreate_semantics:
-            self.semantic_decoder.repository.delete_semantics(chain_id, used_semantics)
-            return self.decode_transaction(chain_id, tx_hash, False)
-
-        return semantically_decoded_tx
-
     def get_proxies(
-        self, delegations: Dict[str, List[str]], chain_id: str
+        self,
+        delegations: Dict[str, List[str]],
+        chain_id: str,
+        block_number: Optional[int] = None,
     ) -> Dict[str, Proxy]:
         proxies = {}
-        chain = self.web3provider._get_node_connection(chain_id)
 
-        for delegator in delegations:
-            delegator_semantics = self.semantic_decoder.repository.get_semantics(
-                chain_id, delegator
+        for delegator, delegates in delegations.items():
+            implementations = self.web3provider.get_proxy_implementations(
+                delegator, chain_id, block_number
             )
-
-            if is_eip1969_proxy(chain, delegator, delegations[delegator][0]):
-                proxy_type = "EIP1969Proxy"
-                fallback_name = "EIP1969_Proxy"
-
-            elif is_eip1969_beacon_proxy(chain, delegator, delegations[delegator][0]):
-                proxy_type = "EIP1969Beacon"
-                fallback_name = "EIP1969_BeaconProxy"
-
-            else:
-                proxy_type = "GenericProxy"
-                fallback_name = "Proxy"
-
-            delegates_semantics = [
-                self.semantic_decoder.repository.get_semantics(chain_id, delegate)
-                for delegate in delegations[delegator]
-            ]
-
-            token_semantics = delegator_semantics.erc20
-            if not token_semantics:
-                for delegate_semantics in delegates_semantics:
-                    if delegate_semantics.erc20:
-                        token_semantics = delegate_semantics.erc20
-                        break
-
-            proxies[delegator] = Proxy(
-                address=delegator,
-                name=delegator_semantics.name
-                if delegator_semantics and delegator_semantics.name != delegator
-                else fallback_name,
-                type=proxy_type,
-                semantics=[semantics for semantics in delegates_semantics if semantics],
-                token=token_semantics,
+            proxies[delegator] = self._create_proxy(
+                chain_id,
+                delegator,
+                delegates,
+                self._get_proxy_type(delegates[0], implementations),
             )
 
         return proxies
 
+    @staticmethod
+    def _get_proxy_type(
+        delegate: str, implementations: Tuple[Optional[str], Optional[str]]
+    ) -> str:
+        implementation, beacon_implementation = implementations
+
+        if implementation == delegate.lower():
+            return EIP1969_PROXY
+        if beacon_implementation == delegate.lower():
+            return EIP1969_BEACON
+        return GENERIC_PROXY
+
+    def _create_proxy(
+        self, chain_id: str, delegator: str, delegates: List[str], proxy_type: str
+    ) -> Proxy:
+        delegator_semantics = self.semantic_decoder.repository.get_semantics(
+            chain_id, delegator
+        )
+        delegates_semantics = [
+            self.semantic_decoder.repository.get_semantics(chain_id, delegate)
+            for delegate in delegates
+        ]
+
+        token_semantics = delegator_semantics.erc20
+        if not token_semantics:
+            for delegate_semantics in delegates_semantics:
+                if delegate_semantics.erc20:
+                    token_semantics = delegate_semantics.erc20
+                    break
+
+        return Proxy(
+            address=delegator,
+            name=delegator_semantics.name
+            if delegator_semantics and delegator_semantics.name != delegator
+            else PROXY_FALLBACK_NAMES[proxy_type],
+            type=proxy_type,
+            semantics=[semantics for semantics in delegates_semantics if semantics],
+            token=token_semantics,
+        )
+
     @staticmethod
     def get_delegations(calls: Union[Call, List[Call]]) -> Dict[str, List[str]]:
         delegations = {}
@@ -14,7 +14,8 @@
 # not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
 # the trademark and/or other branding elements.
 
-from typing import Dict
+import atexit
+from typing import Dict, List, Optional
 
 from mongoengine import connect
 from pymongo import MongoClient
@@ -24,35 +25,59 @@ from .decoders.decoder_service import DecoderService
 from .decoders.semantic.decoder import SemanticDecoder
 from .models.decoded_model import Proxy, DecodedTransaction
 from .models.objects_model import Call
-from .providers import EtherscanProvider, Web3Provider, ENSProvider
+from .providers import AsyncWeb3Provider, EtherscanProvider, Web3Provider, ENSProvider
+from .providers.bytecode_store import BytecodeStore
+from .providers.web3_provider import NODE_MAX_WORKERS
 from .providers.semantic_providers import (
     ISemanticsDatabase,
     SemanticsRepository,
     MongoSemanticsDatabase,
+    RedisSharedCache,
+    SharedCacheSemanticsDatabase,
+    SQLiteSemanticsDatabase,
+    WriteBehindQueue,
 )
 from .utils.validators import assert_tx_hash
 
 
 class EthTxConfig:
-    mongo_connection_string: str
+    mongo_connection_string: Optional[str]
     etherscan_api_key: str
     web3nodes: Dict[str, dict]
     etherscan_urls: Dict[str, str]
     default_chain: str
+    write_behind: bool
+    shared_cache_url: Optional[str]
+    semantics_snapshot: Optional[str]
+    semantics_lease_ttl: Optional[float]
+    node_max_workers: int
+    sqlite_semantics_url: Optional[str]
 
     def __init__(
         self,
-        mongo_connection_string: str,
+        mongo_connection_string: Optional[str],
         web3nodes: Dict[str, dict],
         etherscan_api_key: str,
         etherscan_urls: Dict[str, str],
         default_chain: str = "mainnet",
+        write_behind: bool = False,
+        shared_cache_url: Optional[str] = None,
+        semantics_snapshot: Optional[str] = None,
+        semantics_lease_ttl: Optional[float] = None,
+        node_max_workers: int = NODE_MAX_WORKERS,
+        sqlite_semantics_url: Optional[str] = None,
     ):
         self.mongo_connection_string = mongo_connection_string
         self.etherscan_api_key = etherscan_api_key
         self.web3nodes = web3nodes
         self.default_chain = default_chain
         self.etherscan_urls = etherscan_urls
+        self.write_behind = write_behind
+        self.shared_cache_url = shared_cache_url
+        self.semantics_snapshot = semantics_snapshot
+        self.semantics_lease_ttl = semantics_lease_ttl
+        self.node_max_workers = node_max_workers
+        self.sqlite_semantics_url = sqlite_semantics_url
 
 
 class EthTxDecoders:
@@ -72,6 +97,17 @@ class EthTxDecoders:
             chain_id, tx_hash, recreate_semantics
         )
 
+    async def decode_transaction_async(
+        self, tx_hash: str, chain_id: str = None
+    ) -> DecodedTransaction:
+        assert_tx_hash(tx_hash)
+        return await self._decoder_service.decode_transaction_async(chain_id, tx_hash)
+
+    def decode_block(
+        self, block_number: int, chain_id: str = None
+    ) -> List[DecodedTransaction]:
+        return self._decoder_service.decode_block(chain_id, block_number)
+
     def get_proxies(self, call_tree: Call, chain_id: str) -> Dict[str, Proxy]:
         delegations = self._decoder_service.get_delegations(call_tree)
         return self._decoder_service.get_proxies(delegations, chain_id)
@@ -79,6 +115,7 @@ class EthTxDecoders:
 
 class EthTxProviders:
     web3provider: Web3Provider
+    async_web3provider: AsyncWeb3Provider
     etherscan_provider: EtherscanProvider
     ens_provider: ENSProvider
 
@@ -87,8 +124,10 @@ class EthTxProviders:
         web3provider: Web3Provider,
         etherscan_provider: EtherscanProvider,
         ens_provider: ENSProvider,
+        async_web3provider: AsyncWeb3Provider = None,
     ):
         self.web3provider = web3provider
+        self.async_web3provider = async_web3provider
         self.etherscan_provider = etherscan_provider
         self.ens_provider = ens_provider
 
@@ -101,6 +140,7 @@ class EthTx:
         web3provider: Web3Provider,
         etherscan_provider: EtherscanProvider,
         ens_provider: ENSProvider,
+        semantics_lease_ttl: Optional[float] = None,
     ):
         self._default_chain = default_chain
         self._semantics_repository = SemanticsRepository(
@@ -108,27 +148,49 @@ class EthTx:
             etherscan_provider=etherscan_provider,
             web3provider=web3provider,
             ens_provider=ens_provider,
+            creation_lease_ttl=semantics_lease_ttl,
         )
 
+        async_web3provider = AsyncWeb3Provider(web3provider)
+
         abi_decoder = ABIDecoder(self.semantics, self._default_chain)
         semantic_decoder = SemanticDecoder(self.semantics, self._default_chain)
         decoder_service = DecoderService(
-            abi_decoder, semantic_decoder, web3provider, self._default_chain
+            abi_decoder,
+            semantic_decoder,
+            web3provider,
+            self._default_chain,
+            async_web3provider,
         )
         self._decoders = EthTxDecoders(decoder_service=decoder_service)
         self._providers = EthTxProviders(
             web3provider=web3provider,
             etherscan_provider=etherscan_provider,
             ens_provider=ens_provider,
+            async_web3provider=async_web3provider,
         )
 
     @staticmethod
     def initialize(config: EthTxConfig):
-        mongo_client: MongoClient = connect(host=config.mongo_connection_string)
-        repository = MongoSemanticsDatabase(db=mongo_client.get_database())
+        if config.sqlite_semantics_url:
+            repository = SQLiteSemanticsDatabase.from_url(config.sqlite_semantics_url)
+        else:
+            mongo_client: MongoClient = connect(host=config.mongo_connection_string)
+            repository = MongoSemanticsDatabase(
+                db=mongo_client.get_database(),
+                write_behind=WriteBehindQueue() if config.write_behind else None,
+            )
+        repository.create_indexes()
+        if config.shared_cache_url:
+            repository = SharedCacheSemanticsDatabase(
+                repository, RedisSharedCache.from_url(config.shared_cache_url)
+            )
 
         web3provider = Web3Provider(
-            nodes=config.web3nodes, default_chain=config.default_chain
+            nodes=config.web3nodes,
+            default_chain=config.default_chain,
+            bytecode_store=BytecodeStore(database=repository),
+            max_workers=config.node_max_workers,
         )
         etherscan_provider = EtherscanProvider(
             api_key=config.etherscan_api_key,
@@ -138,13 +200,30 @@ class EthTx:
 
         ens_provider = ENSProvider
 
-        return EthTx(
+        ethtx = EthTx(
             config.default_chain,
             repository,
             web3provider,
             etherscan_provider,
             ens_provider,
+            config.semantics_lease_ttl,
         )
+        if config.semantics_snapshot:
+            ethtx.semantics.load_snapshot(config.semantics_snapshot)
+        atexit.register(ethtx.semantics.flush_usage)
+
+        return ethtx
+
+    def __enter__(self) -> "EthTx":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Flush semantics usage and stop the background node requests."""
+        self.semantics.flush_usage()
+        self._providers.web3provider.close()
 
     @property
     def decoders(self) -> EthTxDecoders:
@@ -20,6 +20,7 @@ __all__ = [
     "ProcessingException",
     "InvalidTransactionHash",
     "InvalidEtherscanReturnCodeException",
+    "InvalidSnapshotException",
 ]
 
 import json
@@ -52,3 +53,10 @@ class InvalidEtherscanReturnCodeException(Exception):
         params_msg = " with params: " + json.dumps(params) if params else ""
         msg = f"Invalid status code for etherscan request: {returned_code} {params_msg}"
         super().__init__(msg)
+
+
+class InvalidSnapshotException(Exception):
+    """Invalid Semantics Snapshot Exception."""
+
+    def __init__(self, msg):
+        super().__init__("Invalid semantics snapshot: " + msg)
@@ -17,14 +17,19 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import List, Any, Optional
+from typing import Dict, List, Any, Optional
 from decimal import Decimal, getcontext
 
-from pydantic import validator
+from pydantic import PrivateAttr, validator
 
 from ethtx.models.base_model import BaseModel
 from ethtx.models.objects_model import BlockMetadata
-from ethtx.models.semantics_model import AddressSemantics, ERC20Semantics
+from ethtx.models.semantics_model import (
+    AddressSemantics,
+    ERC20Semantics,
+    EventSemantics,
+    FunctionSemantics,
+)
 
 
 class AddressInfo(BaseModel):
@@ -131,3 +136,27 @@ class Proxy(BaseModel):
     type: str
     semantics: Optional[List[AddressSemantics]]
     token: Optional[ERC20Semantics]
+
+    # entries of all the delegates, the first one defining a signature wins
+    _functions: Optional[Dict[str, FunctionSemantics]] = PrivateAttr(default=None)
+    _events: Optional[Dict[str, EventSemantics]] = PrivateAttr(default=None)
+
+    def get_function_abi(self, signature: str) -> Optional[FunctionSemantics]:
+        if self._functions is None:
+            self._functions = self._merge_entries("functions")
+
+        return self._functions.get(signature)
+
+    def get_event_abi(self, signature: str) -> Optional[EventSemantics]:
+        if self._events is None:
+            self._events = self._merge_entries("events")
+
+        return self._events.get(signature)
+
+    def _merge_entries(self, part: str) -> Dict:
+        entries = {}
+        for semantics in self.semantics or []:
+            for signature, entry in getattr(semantics.contract, part).items():
+                entries.setdefault(signature, entry)
+
+        return entries
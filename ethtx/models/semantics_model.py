@@ -16,7 +16,9 @@
 
 from __future__ import annotations
 
-from typing import List, Dict, Optional, TYPE_CHECKING
+from typing import Any, Callable, List, Dict, Iterable, Optional, Set, TYPE_CHECKING
+
+from pydantic import PrivateAttr
 
 from ethtx.models.base_model import BaseModel
 
@@ -82,24 +84,69 @@ class ContractSemantics(BaseModel):
     functions: Dict[str, FunctionSemantics] = {}
     transformations: Dict[str, Dict[str, TransformationSemantics]] = {}
 
+    # fields read from a partially loaded contract, None when it is complete
+    _fields: Optional[Set[str]] = PrivateAttr(default=None)
+
+    # lookups derived from the entries, built once and reset when the entries change
+    _indexes: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    @property
+    def is_complete(self) -> bool:
+        return self._fields is None
+
+    @property
+    def anonymous_event(self) -> Optional[EventSemantics]:
+        """The anonymous event of the contract, if it has exactly one."""
+
+        def build():
+            anonymous_events = [
+                event for event in self.events.values() if event.anonymous
+            ]
+            return anonymous_events[0] if len(anonymous_events) == 1 else None
+
+        return self._get_index("anonymous_event", build)
+
+    @property
+    def constructor_abi(self) -> Optional[FunctionSemantics]:
+        """The constructor with the created contract code added to its outputs."""
+
+        def build():
+            constructor = self.functions.get("constructor")
+            if not constructor:
+                return None
+
+            # entries are shared, the output is added to a copy
+            return constructor.copy(
+                update={
+                    "outputs": constructor.outputs
+                    + [
+                        ParameterSemantics(
+                            parameter_name="__create_output__",
+                            parameter_type="ignore",
+                            indexed=False,
+                            dynamic=True,
+                        )
+                    ]
+                }
+            )
 
-class AddressSemantics(BaseModel):
-    chain_id: str
-    address: str
-    name: str
-    is_contract: bool
-    contract: ContractSemantics
-    standard: Optional[str]
-    erc20: Optional[ERC20Semantics]
+        return self._get_index("constructor_abi", build)
 
-    class Config:
-        allow_mutation = True
+    def reset_indexes(self) -> None:
+        self._indexes = {}
+
+    def _get_index(self, name: str, build: Callable[[], Any]) -> Any:
+        indexes = self._indexes
+        if name not in indexes:
+            indexes[name] = build()
+
+        return indexes[name]
 
     @staticmethod
     def from_mongo_record(
-        raw_address_semantics: Dict, database: "ISemanticsDatabase"
-    ) -> "AddressSemantics":
-        ZERO_HASH = "0xc5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"
+        raw_contract_semantics: Dict, fields: Optional[Iterable[str]] = None
+    ) -> "ContractSemantics":
+        """Decode a contract record, `fields` read by a projection make it partial."""
 
         def decode_parameter(_parameter):
             components_semantics = []
@@ -117,6 +164,83 @@ class AddressSemantics(BaseModel):
 
             return decoded_parameter
 
+        events = {}
+        for signature, event in raw_contract_semantics.get("events", {}).items():
+            parameters_semantics = []
+            for parameter in event["parameters"]:
+                parameters_semantics.append(decode_parameter(parameter))
+
+            events[signature] = EventSemantics(
+                signature=signature,
+                anonymous=event["anonymous"],
+                name=event["name"],
+                parameters=parameters_semantics,
+            )
+
+        functions = {}
+        for signature, function in raw_contract_semantics.get("functions", {}).items():
+            inputs_semantics = []
+            for parameter in function["inputs"]:
+                inputs_semantics.append(decode_parameter(parameter))
+            outputs_semantics = []
+            for parameter in function["outputs"]:
+                outputs_semantics.append(decode_parameter(parameter))
+
+            functions[signature] = FunctionSemantics(
+                signature=signature,
+                name=function["name"],
+                inputs=inputs_semantics,
+                outputs=outputs_semantics,
+            )
+
+        transformations = {}
+        for signature, parameters_transformations in raw_contract_semantics.get(
+            "transformations", {}
+        ).items():
+            transformations[signature] = {}
+            for parameter, transformation in parameters_transformations.items():
+                transformations[signature][parameter] = TransformationSemantics(
+                    transformed_name=transformation["transformed_name"],
+                    transformed_type=transformation["transformed_type"],
+                    transformation=transformation["transformation"],
+                )
+
+        contract_semantics = ContractSemantics(
+            code_hash=raw_contract_semantics["code_hash"],
+            name=raw_contract_semantics["name"],
+            events=events,
+            functions=functions,
+            transformations=transformations,
+        )
+        if fields is not None:
+            contract_semantics._fields = set(fields)
+
+        return contract_semantics
+
+
+class AddressSemantics(BaseModel):
+    chain_id: str
+    address: str
+    name: str
+    is_contract: bool
+    contract: ContractSemantics
+    standard: Optional[str]
+    erc20: Optional[ERC20Semantics]
+
+    class Config:
+        allow_mutation = True
+
+    @staticmethod
+    def from_mongo_record(
+        raw_address_semantics: Dict,
+        database: "ISemanticsDatabase",
+        raw_contract_semantics: Optional[Dict] = None,
+        contract_fields: Optional[Iterable[str]] = None,
+    ) -> "AddressSemantics":
+        ZERO_HASH = "0xc5d2460186f7233c927e7db2dcc703c0e500b653ca82273b7bfad8045d85a470"
+        if contract_fields is not None:
+            contract_fields = list(contract_fields)
+
         if raw_address_semantics.get("erc20"):
             erc20_semantics = ERC20Semantics(
                 name=raw_address_semantics["erc20"]["name"],
@@ -132,57 +256,26 @@ class AddressSemantics(BaseModel):
             )
 
         else:
-            raw_contract_semantics = database.get_contract_semantics(
-                raw_address_semantics["contract"]
-            )
-            events = {}
-
-            for signature, event in raw_contract_semantics["events"].items():
-                parameters_semantics = []
-                for parameter in event["parameters"]:
-                    parameters_semantics.append(decode_parameter(parameter))
-
-                events[signature] = EventSemantics(
-                    signature=signature,
-                    anonymous=event["anonymous"],
-                    name=event["name"],
-                    parameters=parameters_semantics,
-                )
-
-            functions = {}
-            for signature, function in raw_contract_semantics["functions"].items():
-                inputs_semantics = []
-                for parameter in function["inputs"]:
-                    inputs_semantics.append(decode_parameter(parameter))
-                outputs_semantics = []
-                for parameter in function["outputs"]:
-                    outputs_semantics.append(decode_parameter(parameter))
-
-                functions[signature] = FunctionSemantics(
-                    signature=signature,
-                    name=function["name"],
-                    inputs=inputs_semantics,
-                    outputs=outputs_semantics,
-                )
-
-            transformations = {}
-            for signature, parameters_transformations in raw_contract_semantics[
-                "transformations"
-            ].items():
-                transformations[signature] = {}
-                for parameter, transformation in parameters_transformations.items():
-                    transformations[signature][parameter] = TransformationSemantics(
-                        transformed_name=transformation["transformed_name"],
-                        transformed_type=transformation["transformed_type"],
-                        transformation=transformation["transformation"],
+            if not raw_contract_semantics:
+                if contract_fields is not None and not contract_fields:
+                    # nothing to project, entries are read when they are looked up and
+                    # the contract is named after the address until then
+                    raw_contract_semantics = {
+                        "code_hash": raw_address_semantics["contract"],
+                        "name": raw_address_semantics.get(
+                            "name", raw_address_semantics.get("address")
+                        ),
+                    }
+                elif contract_fields is None:
+                    raw_contract_semantics = database.get_contract_semantics(
+                        raw_address_semantics["contract"]
                     )
-
-            contract_semantics = ContractSemantics(
-                code_hash=raw_contract_semantics["code_hash"],
-                name=raw_contract_semantics["name"],
-                events=events,
-                functions=functions,
-                transformations=transformations,
+                else:
+                    raw_contract_semantics = database.get_contract_semantics_fields(
+                        raw_address_semantics["contract"], contract_fields
+                    )
+            contract_semantics = ContractSemantics.from_mongo_record(
+                raw_contract_semantics, contract_fields
             )
 
         address = raw_address_semantics.get("address")
@@ -14,6 +14,7 @@
 # not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
 # the trademark and/or other branding elements.
 
+from .async_web3_provider import AsyncWeb3Provider
 from .ens_provider import ENSProvider
 from .etherscan import EtherscanProvider
 from .signature_provider import FourByteProvider
@@ -0,0 +1,232 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import asyncio
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from web3 import AsyncWeb3, Web3
+from web3.datastructures import AttributeDict
+from web3.middleware import async_geth_poa_middleware
+
+from .node import AsyncNodePoolProvider
+from .node.provider import MAX_BATCH_SIZE
+from .tracers import CallTracer
+from .web3_provider import Web3Provider, format_results, run_requests_async
+from ..models.objects_model import Transaction
+from ..models.w3_model import W3Block, W3CallTree, W3Receipt, W3Transaction
+from ..semantics.standards.eip1969 import read_proxy_implementations
+
+
+class AsyncWeb3Provider:
+    """Asyncio node data provider built on AsyncWeb3. It shares nodes, their pool
+    and tracers with the blocking Web3Provider."""
+
+    def __init__(self, web3provider: Web3Provider, max_blocks: int = 128):
+        self.web3provider = web3provider
+        self.max_blocks = max_blocks
+
+        self._connections: Dict[str, AsyncWeb3] = {}
+        self._blocks: "OrderedDict[Tuple[str, int], asyncio.Future]" = OrderedDict()
+
+    @property
+    def default_chain(self) -> Optional[str]:
+        return self.web3provider.default_chain
+
+    def _get_node_connection(self, chain_id: Optional[str] = None) -> AsyncWeb3:
+        chain_id = chain_id or self.default_chain
+        # validates the chain and its nodes
+        self.web3provider._get_node_connection(chain_id)
+
+        w3 = self._connections.get(chain_id)
+        if w3 is None:
+            pool = self.web3provider._pool
+            w3 = AsyncWeb3(
+                AsyncNodePoolProvider(
+                    pool=pool,
+                    chain=chain_id,
+                    max_batch_size=self.web3provider.nodes[chain_id].get(
+                        "max_batch_size", MAX_BATCH_SIZE
+                    ),
+                )
+            )
+            if any(connection.poa for connection in pool.get_connection(chain_id)):
+                w3.middleware_onion.inject(async_geth_poa_middleware, layer=0)
+            self._connections[chain_id] = w3
+
+        return w3
+
+    async def get_block(
+        self, block_number: int, chain_id: Optional[str] = None
+    ) -> W3Block:
+        return await asyncio.shield(self._get_block_future(block_number, chain_id))
+
+    async def get_transaction(
+        self, tx_hash: str, chain_id: Optional[str] = None
+    ) -> W3Transaction:
+        chain = self._get_node_connection(chain_id)
+        raw_tx = await chain.eth.get_transaction(tx_hash)
+
+        return Web3Provider._create_transaction(raw_tx, chain_id or self.default_chain)
+
+    async def get_receipt(
+        self, tx_hash: str, chain_id: Optional[str] = None
+    ) -> W3Receipt:
+        chain = self._get_node_connection(chain_id)
+        raw_receipt = await chain.eth.get_transaction_receipt(tx_hash)
+
+        return Web3Provider._create_receipt(
+            tx_hash, chain_id or self.default_chain, raw_receipt
+        )
+
+    async def get_calls(
+        self, tx_hash: str, chain_id: Optional[str] = None
+    ) -> W3CallTree:
+        chain_id = chain_id or self.default_chain
+        tracer, result = await self._trace(
+            chain_id, lambda tracer: tracer.transaction_request(tx_hash)
+        )
+
+        return tracer.parse_transaction(tx_hash, chain_id, result)
+
+    async def get_full_transaction(
+        self, tx_hash: str, chain_id: Optional[str] = None
+    ) -> Transaction:
+        chain_id = chain_id or self.default_chain
+
+        # the node traces the transaction while the rest of the data is read
+        calls = asyncio.ensure_future(self.get_calls(tx_hash, chain_id))
+        try:
+            raw_tx, raw_receipt = await self._batch_request(
+                chain_id,
+                [
+                    ("eth_getTransactionByHash", [tx_hash]),
+                    ("eth_getTransactionReceipt", [tx_hash]),
+                ],
+            )
+            w3transaction = Web3Provider._create_transaction(raw_tx, chain_id)
+            w3receipt = Web3Provider._create_receipt(tx_hash, chain_id, raw_receipt)
+
+            # start reading the block, the decoder needs it right after the transaction
+            self._get_block_future(w3transaction.blockNumber, chain_id)
+
+            return Transaction.from_raw(
+                w3transaction=w3transaction,
+                w3receipt=w3receipt,
+                w3calltree=await calls,
+            )
+        except BaseException:
+            # the trace is not awaited by anyone else
+            calls.cancel()
+            raise
+
+    async def get_code_hash(
+        self, contract_address: str, chain_id: Optional[str] = None
+    ) -> str:
+        chain_id = chain_id or self.default_chain
+        address = "0x" + contract_address[-40:].lower()
+        bytecode_store = self.web3provider.bytecode_store
+
+        code = bytecode_store.get(chain_id, address)
+        if code is not None:
+            return code[0]
+
+        chain = self._get_node_connection(chain_id)
+        byte_code = await chain.eth.get_code(Web3.to_checksum_address(address))
+
+        return bytecode_store.put(chain_id, address, byte_code)
+
+    async def get_proxy_implementations(
+        self,
+        proxy_address: str,
+        chain_id: Optional[str] = None,
+        block_number: Optional[int] = None,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Asyncio counterpart of Web3Provider.get_proxy_implementations, sharing
+        its cache."""
+        chain_id = chain_id or self.default_chain
+        key = (chain_id, proxy_address.lower(), block_number)
+        cache = self.web3provider.proxy_implementations
+
+        implementations = cache.get(key)
+        if implementations is not None:
+            return implementations
+
+        implementations = await run_requests_async(
+            read_proxy_implementations(proxy_address, block_number),
+            lambda requests: self._batch_request(chain_id, requests),
+        )
+        if implementations is None:
+            return None, None
+        cache.set(key, implementations)
+
+        return implementations
+
+    async def close(self) -> None:
+        for w3 in self._connections.values():
+            await w3.provider.close()
+
+    def _get_block_future(
+        self, block_number: int, chain_id: Optional[str]
+    ) -> asyncio.Future:
+        chain_id = chain_id or self.default_chain
+        key = (chain_id, block_number)
+
+        # concurrent decodes of one block share a single request
+        block = self._blocks.get(key)
+        # futures are bound to the event loop which created them
+        if block is None or block.get_loop() is not asyncio.get_running_loop():
+            block = asyncio.ensure_future(self._read_block(block_number, chain_id))
+
+            def forget_failed(future: asyncio.Future) -> None:
+                if future.cancelled() or future.exception() is not None:
+                    self._blocks.pop(key, None)
+
+            block.add_done_callback(forget_failed)
+            self._blocks[key] = block
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(key)
+
+        return block
+
+    async def _read_block(self, block_number: int, chain_id: str) -> W3Block:
+        chain = self._get_node_connection(chain_id)
+        raw_block = await chain.eth.get_block(block_number)
+
+        return Web3Provider._create_block(raw_block, chain_id)
+
+    async def _batch_request(
+        self, chain_id: Optional[str], requests: List[Tuple[str, list]]
+    ) -> List[AttributeDict]:
+        provider: AsyncNodePoolProvider = self._get_node_connection(chain_id).provider
+        responses = await provider.make_batch_request(requests)
+
+        return format_results(requests, responses)
+
+    async def _trace(
+        self,
+        chain_id: str,
+        build_request: Callable[[CallTracer], Tuple[str, list]],
+    ) -> Tuple[CallTracer, Any]:
+        """Asyncio counterpart of Web3Provider._trace, sharing its tracers."""
+        provider: AsyncNodePoolProvider = self._get_node_connection(chain_id).provider
+
+        return await run_requests_async(
+            self.web3provider._trace_requests(build_request),
+            lambda request: provider.make_node_request(*request),
+        )
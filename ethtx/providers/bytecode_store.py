@@ -0,0 +1,93 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from web3 import Web3
+
+if TYPE_CHECKING:
+    from .semantic_providers.base import ISemanticsDatabase
+
+BYTECODE_CACHE_SIZE = 1024
+
+
+class BytecodeStore:
+    """Content-addressed contract bytecode, keyed by code hash, with an index of
+    addresses to their code hashes. Bytecode is kept in memory and, when a database
+    is given, persisted across process restarts."""
+
+    def __init__(
+        self,
+        database: Optional["ISemanticsDatabase"] = None,
+        cache_size: int = BYTECODE_CACHE_SIZE,
+    ):
+        self.database = database
+        self.cache_size = cache_size
+
+        self._bytecodes: "OrderedDict[str, bytes]" = OrderedDict()
+        self._code_hashes: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chain_id: str, address: str) -> Optional[Tuple[str, bytes]]:
+        """Code hash and bytecode of an address, if it is known."""
+        code_hash = self._code_hashes.get((chain_id, address.lower()))
+        if code_hash is None:
+            return None
+
+        bytecode = self.get_bytecode(code_hash)
+        if bytecode is None:
+            return None
+
+        return code_hash, bytecode
+
+    def get_bytecode(self, code_hash: str) -> Optional[bytes]:
+        bytecode = self._bytecodes.get(code_hash)
+        if bytecode is None and self.database is not None:
+            bytecode = self.database.get_bytecode(code_hash)
+            if bytecode is not None:
+                self._remember(self._bytecodes, code_hash, bytecode)
+
+        return bytecode
+
+    def put(self, chain_id: str, address: str, bytecode: bytes) -> str:
+        """Store bytecode of an address, returns its code hash."""
+        bytecode = bytes(bytecode)
+        code_hash = Web3.keccak(bytecode).hex()
+
+        if code_hash not in self._bytecodes and self.database is not None:
+            self.database.insert_bytecode(code_hash, bytecode)
+
+        self._remember(self._bytecodes, code_hash, bytecode)
+        self._remember(self._code_hashes, (chain_id, address.lower()), code_hash)
+
+        return code_hash
+
+    def seed(self, chain_id: str, address: str, code_hash: str) -> None:
+        """Index an address with its known code hash, e.g. from stored semantics."""
+        self._remember(self._code_hashes, (chain_id, address.lower()), code_hash)
+
+    def _remember(self, cache: OrderedDict, key, value) -> None:
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+
+
+# bytecode is shared by all the providers which are not given their own store
+default_bytecode_store = BytecodeStore()
@@ -22,7 +22,7 @@ from web3 import Web3
 
 from ethtx.exceptions import InvalidEtherscanReturnCodeException
 from .client import EtherscanClient
-from ...utils.cache_tools import cache
+from ...utils.cache_tools import cached
 
 log = logging.getLogger(__name__)
 
@@ -69,7 +69,7 @@ class EtherscanContract(EtherscanClient):
 
         return dict(name=contract_name, abi=abi), decoded
 
-    @cache
+    @cached("etherscan.abis")
     def _get_contract_abi(self, chain_id, contract_name) -> Dict:
         url_dict = self.contract_dict.copy()
         url_dict[self.ACTION] = "getsourcecode"
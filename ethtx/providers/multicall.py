@@ -0,0 +1,79 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+from typing import List, Optional, Tuple
+
+from eth_abi import decode, encode
+from eth_abi.exceptions import DecodingError
+from web3 import Web3
+
+# Multicall3 is deployed at the same address on most EVM chains
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = bytes.fromhex("82ad56cb")
+
+NAME_SELECTOR = "0x06fdde03"
+SYMBOL_SELECTOR = "0x95d89b41"
+DECIMALS_SELECTOR = "0x313ce567"
+
+TOKEN_FIELDS = {
+    "name": NAME_SELECTOR,
+    "symbol": SYMBOL_SELECTOR,
+    "decimals": DECIMALS_SELECTOR,
+}
+
+
+def encode_aggregate3(calls: List[Tuple[str, str]]) -> str:
+    """Encode (address, call data) pairs as a Multicall3 `aggregate3` call, allowing
+    every call to fail."""
+    encoded = encode(
+        ["(address,bool,bytes)[]"],
+        [
+            [
+                (Web3.to_checksum_address(address), True, Web3.to_bytes(hexstr=data))
+                for address, data in calls
+            ]
+        ],
+    )
+    return Web3.to_hex(AGGREGATE3_SELECTOR + encoded)
+
+
+def decode_aggregate3(data: bytes) -> List[Optional[bytes]]:
+    """Decode `aggregate3` results, failed calls are returned as None."""
+    (results,) = decode(["(bool,bytes)[]"], bytes(data))
+    return [return_data if success else None for success, return_data in results]
+
+
+def decode_text(data: Optional[bytes]) -> Optional[str]:
+    """Decode a `string` result, or a `bytes32` one used by some older tokens."""
+    if not data:
+        return None
+
+    if len(data) == 32:
+        return data.rstrip(b"\x00").decode("utf-8", errors="ignore")
+
+    try:
+        (text,) = decode(["string"], bytes(data))
+        return text
+    except (DecodingError, OverflowError, UnicodeDecodeError):
+        return None
+
+
+def decode_decimals(data: Optional[bytes]) -> Optional[int]:
+    if not data or len(data) < 32:
+        return None
+
+    decimals = int.from_bytes(data[:32], "big")
+    return decimals if decimals <= 255 else None
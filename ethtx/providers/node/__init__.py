@@ -14,4 +14,6 @@
 # not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
 # the trademark and/or other branding elements.
 
+from .async_provider import AsyncNodePoolProvider
 from .pool import NodeConnectionPool
+from .provider import NodePoolProvider
@@ -0,0 +1,157 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .connection_base import NodeConnection
+from .pool import NodeConnectionPool
+from .provider import (
+    MAX_BATCH_SIZE,
+    encode_batch,
+    order_batch_responses,
+    split_batch,
+    _is_sampled,
+)
+from ...exceptions import NodeConnectionException
+
+log = logging.getLogger(__name__)
+
+NODE_FAILURES = (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+class AsyncNodePoolProvider(AsyncJSONBaseProvider):
+    """Asyncio counterpart of NodePoolProvider, sharing its pool of nodes. Each event
+    loop sending requests has its own HTTP session."""
+
+    def __init__(
+        self,
+        pool: NodeConnectionPool,
+        chain: str,
+        request_kwargs: Dict[str, Any] = None,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        super().__init__()
+        self.pool = pool
+        self.chain = chain
+        self.request_kwargs = request_kwargs or {
+            "timeout": aiohttp.ClientTimeout(total=600)
+        }
+        self.max_batch_size = max_batch_size
+
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+
+    def __str__(self) -> str:
+        return f"<AsyncNodePoolProvider: {self.chain}>"
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request_data = self.encode_rpc_request(method, params)
+        _, raw_response = await self._send(
+            lambda _: request_data, sample_latency=_is_sampled(method)
+        )
+
+        return self.decode_rpc_response(raw_response)
+
+    async def make_batch_request(
+        self, requests_: List[Tuple[RPCEndpoint, Any]]
+    ) -> List[RPCResponse]:
+        chunks = await asyncio.gather(
+            *(
+                self._send_batch(chunk)
+                for chunk in split_batch(requests_, self.max_batch_size)
+            )
+        )
+
+        return [response for chunk in chunks for response in chunk]
+
+    async def _send_batch(
+        self, requests_: List[Tuple[RPCEndpoint, Any]]
+    ) -> List[RPCResponse]:
+        batch, request_data = encode_batch(self.request_counter, requests_)
+        _, raw_response = await self._send(
+            lambda _: request_data,
+            sample_latency=all(_is_sampled(method) for method, _ in requests_),
+        )
+
+        return order_batch_responses(batch, self.decode_rpc_response(raw_response))
+
+    async def make_node_request(
+        self,
+        build_request: Callable[[NodeConnection], Tuple[RPCEndpoint, Any]],
+        connection: Optional[NodeConnection] = None,
+    ) -> Tuple[NodeConnection, RPCResponse]:
+        def encode(node: NodeConnection) -> bytes:
+            return self.encode_rpc_request(*build_request(node))
+
+        node, raw_response = await self._send(
+            encode,
+            sample_latency=False,
+            connections=[connection] if connection else None,
+        )
+
+        return node, self.decode_rpc_response(raw_response)
+
+    async def close(self) -> None:
+        """Close the session of the running event loop."""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    async def _send(
+        self,
+        encode: Callable[[NodeConnection], bytes],
+        sample_latency: bool,
+        connections: Optional[List[NodeConnection]] = None,
+    ) -> Tuple[NodeConnection, bytes]:
+        for connection in connections or self.pool.get_connection(self.chain):
+            try:
+                with self.pool.track(connection, sample_latency=sample_latency):
+                    return connection, await self._post(connection, encode(connection))
+            except NODE_FAILURES as e:
+                log.warning("Request to %s failed: %s", connection, e)
+
+        raise NodeConnectionException
+
+    async def _post(self, connection: NodeConnection, request_data: bytes) -> bytes:
+        async with self._get_session().post(
+            connection.url,
+            data=request_data,
+            headers={"Content-Type": "application/json"},
+            **self.request_kwargs,
+        ) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            # sessions of closed loops, e.g. of former `asyncio.run` calls, are dropped
+            for closed_loop in [loop for loop in self._sessions if loop.is_closed()]:
+                del self._sessions[closed_loop]
+
+            # one session keeps HTTP connections alive to all the chain nodes
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=64)
+            )
+            self._sessions[loop] = session
+
+        return session
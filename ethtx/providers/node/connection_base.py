@@ -15,6 +15,7 @@
 # the trademark and/or other branding elements.
 
 from dataclasses import dataclass
+from typing import Optional
 
 
 @dataclass
@@ -22,6 +23,7 @@ class NodeConnection:
     chain: str
     url: str
     poa: bool
+    tracer: Optional[str] = None
 
     def __repr__(self) -> str:
         return f"<Chain: {self.chain}, Node: {self.url}, Poa: {self.poa}>"
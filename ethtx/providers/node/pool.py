@@ -14,14 +14,58 @@
 # not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
 # the trademark and/or other branding elements.
 
-from typing import Dict, List
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 from .connection_base import NodeConnection
 
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+@dataclass
+class NodeStats:
+    """Balancing and circuit breaker state of a single node."""
+
+    latency: Optional[float] = None
+    outstanding: int = 0
+    failures: int = 0
+    state: str = CLOSED
+    opened_at: float = 0.0
+    sampled_at: float = 0.0
+
+    def score(self, now: float, probe_interval: float) -> float:
+        """Expected wait for a new request. Nodes without a latency sample, or an idle node
+        whose sample is older than `probe_interval`, score 0 and are probed first."""
+        if self.latency is None or (
+            not self.outstanding and now - self.sampled_at >= probe_interval
+        ):
+            return 0.0
+        return (self.outstanding + 1) * self.latency
+
 
 class NodeConnectionPool:
-    def __init__(self, nodes: Dict[str, dict]):
+    def __init__(
+        self,
+        nodes: Dict[str, dict],
+        ewma_alpha: float = 0.3,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        probe_interval: float = 60.0,
+    ):
         self._connections: List[NodeConnection] = []
+        self._stats: Dict[Tuple[str, str], NodeStats] = {}
+        self._lock = threading.Lock()
+
+        self.ewma_alpha = ewma_alpha
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.probe_interval = probe_interval
 
         self._set_connections(nodes)
 
@@ -37,17 +81,112 @@ class NodeConnectionPool:
             raise ValueError("Value is not instance of NodeBase")
 
         self._connections.append(connection)
+        self._stats[self._key(connection)] = NodeStats()
 
     def get_connection(self, chain: str) -> List[NodeConnection]:
-        return [
-            connection for connection in self._connections if connection.chain == chain
+        """Return chain connections ordered by preference. Nodes are drawn at random with
+        a weight inverse to their score, so slower nodes still get a share of requests and
+        keep their latency fresh. Nodes with an open circuit are skipped, unless there is
+        nothing else to try."""
+        now = time.monotonic()
+        available, tripped = [], []
+
+        with self._lock:
+            for connection in self._connections:
+                if connection.chain != chain:
+                    continue
+
+                stats = self._stats[self._key(connection)]
+                if stats.state == CLOSED or (
+                    stats.state == OPEN and now - stats.opened_at >= self.reset_timeout
+                ):
+                    # exponential race: a node wins with probability proportional to 1/score
+                    available.append(
+                        (
+                            random.expovariate(1.0)
+                            * stats.score(now, self.probe_interval),
+                            random.random(),
+                            connection,
+                        )
+                    )
+                else:
+                    tripped.append((stats.opened_at, random.random(), connection))
+
+        return [connection for *_, connection in sorted(available)] + [
+            connection for *_, connection in sorted(tripped)
         ]
 
+    def get_stats(self, connection: NodeConnection) -> NodeStats:
+        return self._stats[self._key(connection)]
+
+    @contextmanager
+    def track(self, connection: NodeConnection, sample_latency: bool = True):
+        """Track a single request sent to the node."""
+        key = self._key(connection)
+
+        with self._lock:
+            stats = self._stats[key]
+            if (
+                stats.state == OPEN
+                and time.monotonic() - stats.opened_at >= self.reset_timeout
+            ):
+                # let a single probe request through
+                stats.state = HALF_OPEN
+            stats.outstanding += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        except Exception:
+            self.record_failure(connection)
+            raise
+        else:
+            self.record_success(
+                connection, time.monotonic() - start if sample_latency else None
+            )
+        finally:
+            with self._lock:
+                stats.outstanding -= 1
+
+    def record_success(
+        self, connection: NodeConnection, latency: Optional[float] = None
+    ) -> None:
+        with self._lock:
+            stats = self._stats[self._key(connection)]
+            stats.failures = 0
+            stats.state = CLOSED
+
+            if latency is not None:
+                stats.sampled_at = time.monotonic()
+                stats.latency = (
+                    latency
+                    if stats.latency is None
+                    else self.ewma_alpha * latency
+                    + (1 - self.ewma_alpha) * stats.latency
+                )
+
+    def record_failure(self, connection: NodeConnection) -> None:
+        with self._lock:
+            stats = self._stats[self._key(connection)]
+            stats.failures += 1
+
+            if stats.state == HALF_OPEN or stats.failures >= self.failure_threshold:
+                stats.state = OPEN
+                stats.opened_at = time.monotonic()
+
+    @staticmethod
+    def _key(connection: NodeConnection) -> Tuple[str, str]:
+        return connection.chain, connection.url
+
     def _set_connections(self, nodes) -> None:
         for chain, node_params in nodes.items():
-            nodes: List[str] = list(node_params.values())[0].split(",")
-            poa: bool = list(node_params.values())[1]
+            nodes: List[str] = node_params["hook"].split(",")
+            poa: bool = node_params["poa"]
+            # one tracer for all chain nodes, or a mapping of node url to tracer
+            tracers = node_params.get("tracer")
             for url in nodes:
+                url = url.strip()
+                tracer = tracers.get(url) if isinstance(tracers, dict) else tracers
                 self.add_connection(
-                    NodeConnection(chain=chain, url=url.strip(), poa=poa)
+                    NodeConnection(chain=chain, url=url, poa=poa, tracer=tracer)
                 )
@@ -0,0 +1,192 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from eth_utils import to_bytes
+from requests.adapters import HTTPAdapter
+from web3._utils.encoding import FriendlyJsonSerde, Web3JsonEncoder
+from web3.providers.base import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from .connection_base import NodeConnection
+from .pool import NodeConnectionPool
+from ...exceptions import NodeConnectionException
+
+log = logging.getLogger(__name__)
+
+# tracing time depends on the transaction, not on the node
+UNSAMPLED_METHODS = ("debug_", "trace_")
+NODE_FAILURES = (requests.ConnectionError, requests.Timeout, requests.HTTPError)
+# node providers commonly cap the size of JSON-RPC batches
+MAX_BATCH_SIZE = 100
+
+
+class NodePoolProvider(JSONBaseProvider):
+    """HTTP provider balancing requests over all the nodes configured for a chain."""
+
+    def __init__(
+        self,
+        pool: NodeConnectionPool,
+        chain: str,
+        request_kwargs: Dict[str, Any] = None,
+        max_batch_size: int = MAX_BATCH_SIZE,
+    ):
+        super().__init__()
+        self.pool = pool
+        self.chain = chain
+        self.request_kwargs = request_kwargs or {"timeout": 600}
+        self.max_batch_size = max_batch_size
+
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def __str__(self) -> str:
+        return f"<NodePoolProvider: {self.chain}>"
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request_data = self.encode_rpc_request(method, params)
+        _, raw_response = self._send(
+            lambda _: request_data, sample_latency=_is_sampled(method)
+        )
+
+        return self.decode_rpc_response(raw_response)
+
+    def make_node_request(
+        self,
+        build_request: Callable[[NodeConnection], Tuple[RPCEndpoint, Any]],
+        connection: Optional[NodeConnection] = None,
+    ) -> Tuple[NodeConnection, RPCResponse]:
+        """Send a request built for the node serving it, for APIs which differ between
+        node clients. The request goes only to `connection`, when given."""
+
+        def encode(node: NodeConnection) -> bytes:
+            return self.encode_rpc_request(*build_request(node))
+
+        # requests built per node are node specific APIs, e.g. tracing
+        node, raw_response = self._send(
+            encode,
+            sample_latency=False,
+            connections=[connection] if connection else None,
+        )
+
+        return node, self.decode_rpc_response(raw_response)
+
+    def make_batch_request(
+        self, requests_: List[Tuple[RPCEndpoint, Any]]
+    ) -> List[RPCResponse]:
+        """Send the requests as JSON-RPC batches of at most `max_batch_size` requests,
+        responses are returned in the order of requests."""
+        responses = []
+        for chunk in split_batch(requests_, self.max_batch_size):
+            batch, request_data = encode_batch(self.request_counter, chunk)
+            _, raw_response = self._send(
+                lambda _: request_data,
+                sample_latency=all(_is_sampled(method) for method, _ in chunk),
+            )
+            responses.extend(
+                order_batch_responses(batch, self.decode_rpc_response(raw_response))
+            )
+
+        return responses
+
+    def _send(
+        self,
+        encode: Callable[[NodeConnection], bytes],
+        sample_latency: bool,
+        connections: Optional[List[NodeConnection]] = None,
+    ) -> Tuple[NodeConnection, bytes]:
+        for connection in connections or self.pool.get_connection(self.chain):
+            try:
+                with self.pool.track(connection, sample_latency=sample_latency):
+                    return connection, self._post(connection, encode(connection))
+            except NODE_FAILURES as e:
+                log.warning("Request to %s failed: %s", connection, e)
+
+        raise NodeConnectionException
+
+    def _post(self, connection: NodeConnection, request_data: bytes) -> bytes:
+        response = self._get_session(connection.url).post(
+            connection.url,
+            data=request_data,
+            headers={"Content-Type": "application/json"},
+            **self.request_kwargs,
+        )
+        response.raise_for_status()
+
+        return response.content
+
+    def _get_session(self, url: str) -> requests.Session:
+        session = self._sessions.get(url)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(url)
+                if session is None:
+                    # a shared session keeps HTTP connections alive between requests
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._sessions[url] = session
+
+        return session
+
+
+def split_batch(
+    requests_: List[Tuple[RPCEndpoint, Any]], max_batch_size: int
+) -> List[List[Tuple[RPCEndpoint, Any]]]:
+    return [
+        requests_[i : i + max_batch_size]
+        for i in range(0, len(requests_), max_batch_size)
+    ]
+
+
+def encode_batch(
+    request_counter: Iterator[int], requests_: List[Tuple[RPCEndpoint, Any]]
+) -> Tuple[List[dict], bytes]:
+    batch = [
+        {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or [],
+            "id": next(request_counter),
+        }
+        for method, params in requests_
+    ]
+    request_data = to_bytes(
+        text=FriendlyJsonSerde().json_encode(batch, Web3JsonEncoder)
+    )
+
+    return batch, request_data
+
+
+def order_batch_responses(
+    batch: List[dict], responses: List[RPCResponse]
+) -> List[RPCResponse]:
+    # a node rejecting the whole batch, e.g. a too large one, responds with a single error
+    if not isinstance(responses, list):
+        raise ValueError(responses.get("error", responses))
+
+    # batch responses may come in any order
+    responses_by_id = {response["id"]: response for response in responses}
+    return [responses_by_id[request["id"]] for request in batch]
+
+
+def _is_sampled(method: str) -> bool:
+    return not method.startswith(UNSAMPLED_METHODS)
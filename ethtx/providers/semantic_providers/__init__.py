@@ -17,3 +17,11 @@
 from .base import ISemanticsDatabase
 from .database import MongoSemanticsDatabase
 from .repository import SemanticsRepository
+from .shared_cache import (
+    InProcessSharedCache,
+    RedisSharedCache,
+    SharedCache,
+    SharedCacheSemanticsDatabase,
+)
+from .sqlite import SQLiteSemanticsDatabase
+from .write_behind import WriteBehindQueue
@@ -26,12 +26,39 @@ class ISemanticsDatabase(ABC):
     def get_address_semantics(self, chain_id: str, address: str) -> Optional[Dict]:
         ...
 
+    def get_addresses_semantics(
+        self, chain_id: str, addresses: List[str]
+    ) -> List[Dict]:
+        ...
+
     def get_contract_semantics(self, code_hash: str) -> Optional[Dict]:
         ...
 
+    def get_contract_semantics_fields(
+        self, code_hash: str, fields: List[str]
+    ) -> Optional[Dict]:
+        """Contract with its name and only the given fields, e.g. `functions.0x...`."""
+        ...
+
+    def get_contracts_semantics(
+        self, code_hashes: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        ...
+
     def get_signature_semantics(self, signature_hash: str) -> Optional[List[Dict]]:
         ...
 
+    def get_most_used_signature(self, signature_hash: str) -> Optional[Dict]:
+        ...
+
+    def get_most_used_signatures(self, limit: int) -> List[Dict]:
+        """The most used signature of each hash, for the hashes used the most."""
+        ...
+
+    def upsert_signature(self, signature: dict) -> Any:
+        """Insert a signature, or count one more use of it."""
+        ...
+
     def insert_contract(self, contract: dict, update_if_exist: bool = False) -> Any:
         ...
 
@@ -41,5 +68,34 @@ class ISemanticsDatabase(ABC):
     def insert_signature(self, signature, update_if_exist: bool = False) -> Any:
         ...
 
+    def get_bytecode(self, code_hash: str) -> Optional[bytes]:
+        ...
+
+    def insert_bytecode(self, code_hash: str, bytecode: bytes) -> Any:
+        ...
+
     def delete_semantics_by_address(self, chain_id: str, address: str) -> None:
         ...
+
+    def record_usage(self, usage: List[Dict]) -> None:
+        """Count uses of addresses, given as `chain_id`, `address`, `count` and
+        `last_used` (a timestamp)."""
+        ...
+
+    def get_most_used(
+        self, limit: Optional[int] = None, since: Optional[int] = None
+    ) -> List[Dict]:
+        """Usage of the most used addresses, used last at or after `since`."""
+        ...
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        """Take a lease of the key for `ttl` seconds, unless another owner holds it.
+        Databases without leases let every owner take them."""
+        return True
+
+    def release_lease(self, key: str, owner: str) -> None:
+        ...
+
+    def flush(self) -> None:
+        """Write all the pending (write-behind) changes."""
+        ...
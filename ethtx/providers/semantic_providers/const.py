@@ -21,3 +21,10 @@ class MongoCollections(str, Enum):
     ADDRESSES = "addresses"
     CONTRACTS = "contracts"
     SIGNATURES = "signatures"
+    BYTECODES = "bytecodes"
+    USAGE = "usage"
+    LEASES = "leases"
+
+
+# parts of contract semantics with their entries keyed by signature
+CONTRACT_PARTS = ("events", "functions", "transformations")
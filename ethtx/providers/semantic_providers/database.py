@@ -15,19 +15,70 @@
 # the trademark and/or other branding elements.
 
 import logging
-from typing import Dict, Optional
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
 from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, DeleteMany, IndexModel, ReplaceOne, UpdateOne
 from pymongo.collection import Collection
 from pymongo.cursor import Cursor
 from pymongo.database import Database as MongoDatabase
+from pymongo.errors import DuplicateKeyError, OperationFailure
 
 from .base import ISemanticsDatabase
 from .const import MongoCollections
-from ...utils.cache_tools import cache
+from .shared_cache import project_contract
+from .write_behind import WriteBehindQueue
+from ...utils.cache_tools import cached
 
 log = logging.getLogger(__name__)
 
+# signatures are identified by their hash, name and argument types
+SIGNATURE_KEY = ("signature_hash", "name", "arg_types")
+
+# indexes of all the lookups, required to keep them from scanning whole collections
+INDEXES: Dict[MongoCollections, List[IndexModel]] = {
+    MongoCollections.ADDRESSES: [
+        IndexModel(
+            [("chain_id", ASCENDING), ("address", ASCENDING)],
+            name="address_key",
+            unique=True,
+        ),
+    ],
+    MongoCollections.CONTRACTS: [
+        IndexModel([("code_hash", ASCENDING)], name="code_hash_key", unique=True),
+    ],
+    MongoCollections.SIGNATURES: [
+        IndexModel(
+            [(field, ASCENDING) for field in SIGNATURE_KEY],
+            name="signature_key",
+            unique=True,
+        ),
+        IndexModel(
+            [("signature_hash", ASCENDING), ("count", DESCENDING)],
+            name="signature_count",
+        ),
+    ],
+    MongoCollections.BYTECODES: [
+        IndexModel([("code_hash", ASCENDING)], name="code_hash_key", unique=True),
+    ],
+    MongoCollections.USAGE: [
+        IndexModel(
+            [("chain_id", ASCENDING), ("address", ASCENDING)],
+            name="address_key",
+            unique=True,
+        ),
+        IndexModel([("count", DESCENDING)], name="usage_count"),
+        IndexModel([("last_used", DESCENDING)], name="usage_last_used"),
+    ],
+    MongoCollections.LEASES: [
+        # expired leases are removed by the server
+        IndexModel(
+            [("expires_at", ASCENDING)], name="lease_expiry", expireAfterSeconds=0
+        ),
+    ],
+}
+
 
 class MongoSemanticsDatabase(ISemanticsDatabase):
     _db: MongoDatabase
@@ -35,29 +86,139 @@ class MongoSemanticsDatabase(ISemanticsDatabase):
     _addresses: Collection
     _contracts: Collection
     _signatures: Collection
+    _bytecodes: Collection
+    _usage: Collection
+    _leases: Collection
 
-    def __init__(self, db: MongoDatabase):
+    def __init__(
+        self, db: MongoDatabase, write_behind: Optional[WriteBehindQueue] = None
+    ):
         self._db = db
+        self._write_behind = write_behind
 
         self._addresses = None
         self._contracts = None
         self._signatures = None
+        self._bytecodes = None
+        self._usage = None
+        self._leases = None
 
         self._init_collections()
 
     def get_collection_count(self) -> int:
         return len(self._db.list_collection_names())
 
-    @cache
+    def flush(self) -> None:
+        if self._write_behind is not None:
+            self._write_behind.flush()
+
+    def close(self) -> None:
+        if self._write_behind is not None:
+            self._write_behind.close()
+
+    # addresses and contracts not stored yet may be created by another process
+    @cached("semantics.addresses", cache_none=False)
     def get_address_semantics(self, chain_id: str, address: str) -> Dict:
+        pending = self._get_pending(self._addresses, (chain_id, address))
+        if pending is not None:
+            return pending
+
         return self._addresses.find_one({"chain_id": chain_id, "address": address})
 
+    def get_addresses_semantics(
+        self, chain_id: str, addresses: List[str]
+    ) -> List[Dict]:
+        pending = self._get_pending_many(
+            self._addresses, {(chain_id, address): address for address in addresses}
+        )
+        stored = [address for address in addresses if address not in pending]
+        if not stored:
+            return list(pending.values())
+
+        return list(
+            self._addresses.find({"chain_id": chain_id, "address": {"$in": stored}})
+        ) + list(pending.values())
+
+    # signature counts and usage are written with increments which are not coalesced,
+    # they are read once the queue writes them
     def get_signature_semantics(self, signature_hash: str) -> Cursor:
         return self._signatures.find({"signature_hash": signature_hash})
 
+    def get_most_used_signature(self, signature_hash: str) -> Optional[Dict]:
+        return self._signatures.find_one(
+            {"signature_hash": signature_hash}, sort=[("count", -1)]
+        )
+
+    def get_most_used_signatures(self, limit: int) -> List[Dict]:
+        return list(
+            self._signatures.aggregate(
+                [
+                    {"$sort": {"count": -1}},
+                    {
+                        "$group": {
+                            "_id": "$signature_hash",
+                            "signature": {"$first": "$$ROOT"},
+                        }
+                    },
+                    {"$replaceRoot": {"newRoot": "$signature"}},
+                    {"$sort": {"count": -1}},
+                    {"$limit": limit},
+                    {"$project": {"_id": 0}},
+                ]
+            )
+        )
+
+    def upsert_signature(self, signature: Dict) -> None:
+        key = {
+            "signature_hash": signature["signature_hash"],
+            "name": signature["name"],
+            "arg_types": get_arg_types(signature["args"]),
+        }
+
+        operations = []
+        if not signature.get("guessed"):
+            # argument names guessed from an external source give way to real ones
+            operations.append(
+                UpdateOne(
+                    {**key, "guessed": True},
+                    {"$set": {"args": signature["args"], "guessed": False}},
+                )
+            )
+        operations.append(
+            UpdateOne(
+                key,
+                {
+                    "$inc": {"count": 1},
+                    "$setOnInsert": {
+                        **key,
+                        "args": signature["args"],
+                        "tuple": signature.get("tuple", False),
+                        "guessed": signature.get("guessed", False),
+                    },
+                },
+                upsert=True,
+            )
+        )
+
+        if self._write_behind is not None:
+            for operation in operations:
+                self._write_behind.add(self._signatures, operation)
+        else:
+            self._signatures.bulk_write(operations)
+
     def insert_signature(
         self, signature: dict, update_if_exist: Optional[bool] = False
     ) -> Optional[ObjectId]:
+        if self._write_behind is not None:
+            if not update_if_exist:
+                signature = {"_id": ObjectId(), **signature}
+            self._write_behind.add(
+                self._signatures,
+                ReplaceOne({"_id": signature["_id"]}, signature, upsert=True),
+                signature["_id"],
+            )
+            return None if update_if_exist else signature["_id"]
+
         if update_if_exist:
             updated_signature = self._signatures.replace_one(
                 {"_id": signature["_id"]}, signature, upsert=True
@@ -71,15 +232,58 @@ class MongoSemanticsDatabase(ISemanticsDatabase):
         inserted_signature = self._signatures.insert_one(signature)
         return inserted_signature.inserted_id
 
-    @cache
+    @cached("semantics.contracts", cache_none=False)
     def get_contract_semantics(self, code_hash: str) -> Dict:
         """Contract hashes are always the same, no mather what chain we use, so there is no need
         to use chain_id"""
+        pending = self._get_pending(self._contracts, code_hash)
+        if pending is not None:
+            return pending
+
         return self._contracts.find_one({"code_hash": code_hash})
 
+    def get_contract_semantics_fields(
+        self, code_hash: str, fields: List[str]
+    ) -> Optional[Dict]:
+        pending = self._get_pending(self._contracts, code_hash)
+        if pending is not None:
+            return project_contract(pending, fields)
+
+        return self._contracts.find_one(
+            {"code_hash": code_hash}, get_contract_projection(fields)
+        )
+
+    def get_contracts_semantics(
+        self, code_hashes: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        pending = self._get_pending_many(
+            self._contracts, {code_hash: code_hash for code_hash in code_hashes}
+        )
+        stored = [code_hash for code_hash in code_hashes if code_hash not in pending]
+        pending = [
+            project_contract(contract, fields) if fields is not None else contract
+            for contract in pending.values()
+        ]
+        if not stored:
+            return pending
+
+        return (
+            list(
+                self._contracts.find(
+                    {"code_hash": {"$in": stored}},
+                    get_contract_projection(fields) if fields is not None else None,
+                )
+            )
+            + pending
+        )
+
     def insert_contract(
         self, contract: Dict, update_if_exist: Optional[bool] = False
     ) -> Optional[ObjectId]:
+        self.get_contract_semantics.invalidate(contract["code_hash"])
+        if self._write_behind is not None:
+            return self._queue_contract(contract, update_if_exist)
+
         if update_if_exist:
             updated_contract = self._contracts.replace_one(
                 {"code_hash": contract["code_hash"]}, contract, upsert=True
@@ -97,6 +301,22 @@ class MongoSemanticsDatabase(ISemanticsDatabase):
     def insert_address(
         self, address: Dict, update_if_exist: Optional[bool] = False
     ) -> Optional[ObjectId]:
+        self.get_address_semantics.invalidate(address["chain_id"], address["address"])
+        if self._write_behind is not None:
+            if not update_if_exist:
+                address = {"_id": ObjectId(), **address}
+            self._write_behind.add(
+                self._addresses,
+                ReplaceOne(
+                    {"chain_id": address["chain_id"], "address": address["address"]},
+                    address,
+                    upsert=True,
+                ),
+                (address["chain_id"], address["address"]),
+                address,
+            )
+            return None if update_if_exist else address["_id"]
+
         if update_if_exist:
             updated_address = self._addresses.replace_one(
                 {"chain_id": address["chain_id"], "address": address["address"]},
@@ -110,11 +330,243 @@ class MongoSemanticsDatabase(ISemanticsDatabase):
         inserted_address = self._addresses.insert_one(address)
         return inserted_address.inserted_id
 
+    def get_bytecode(self, code_hash: str) -> Optional[bytes]:
+        bytecode = self._get_pending(self._bytecodes, code_hash)
+        if bytecode is None:
+            bytecode = self._bytecodes.find_one({"code_hash": code_hash})
+        return bytes(bytecode["bytecode"]) if bytecode else None
+
+    def insert_bytecode(self, code_hash: str, bytecode: bytes) -> None:
+        # bytecode is content-addressed, an existing document never changes
+        document = {"code_hash": code_hash, "bytecode": bytecode}
+        operation = UpdateOne(
+            {"code_hash": code_hash}, {"$setOnInsert": document}, upsert=True
+        )
+        if self._write_behind is not None:
+            self._write_behind.add(self._bytecodes, operation, code_hash, document)
+        else:
+            self._bytecodes.bulk_write([operation])
+
+    def record_usage(self, usage: List[Dict]) -> None:
+        operations = [
+            UpdateOne(
+                {"chain_id": use["chain_id"], "address": use["address"]},
+                {
+                    "$inc": {"count": use["count"]},
+                    "$max": {"last_used": use["last_used"]},
+                },
+                upsert=True,
+            )
+            for use in usage
+        ]
+        if not operations:
+            return
+
+        if self._write_behind is not None:
+            for operation in operations:
+                self._write_behind.add(self._usage, operation)
+        else:
+            self._usage.bulk_write(operations, ordered=False)
+
+    def get_most_used(
+        self, limit: Optional[int] = None, since: Optional[int] = None
+    ) -> List[Dict]:
+        cursor = self._usage.find(
+            {"last_used": {"$gte": since}} if since is not None else {},
+            {"_id": 0},
+            sort=[("count", DESCENDING)],
+        )
+        return list(cursor.limit(limit) if limit else cursor)
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        now = datetime.utcnow()
+        lease = {"owner": owner, "expires_at": now + timedelta(seconds=ttl)}
+        try:
+            self._leases.insert_one({"_id": key, **lease})
+            return True
+        except DuplicateKeyError:
+            # an expired lease is taken over
+            taken = self._leases.update_one(
+                {"_id": key, "expires_at": {"$lt": now}}, {"$set": lease}
+            )
+            return taken.modified_count == 1
+
+    def release_lease(self, key: str, owner: str) -> None:
+        self._leases.delete_one({"_id": key, "owner": owner})
+
+    def _queue_contract(
+        self, contract: Dict, update_if_exist: bool
+    ) -> Optional[ObjectId]:
+        code_hash = contract["code_hash"]
+
+        if not update_if_exist:
+            # a stored contract is kept, without failing the batch on the unique index
+            contract = {"_id": ObjectId(), **contract}
+            self._write_behind.add(
+                self._contracts,
+                UpdateOne(
+                    {"code_hash": code_hash}, {"$setOnInsert": contract}, upsert=True
+                ),
+                code_hash,
+                contract,
+            )
+            return contract["_id"]
+
+        # callers insert signatures of new contracts only, so they are told apart
+        # with an indexed read instead of waiting for the write
+        is_new = (
+            not self._write_behind.is_pending(self._contracts, code_hash)
+            and self._contracts.find_one({"code_hash": code_hash}, {"_id": 1}) is None
+        )
+        if is_new:
+            contract = {"_id": ObjectId(), **contract}
+
+        self._write_behind.add(
+            self._contracts,
+            ReplaceOne({"code_hash": code_hash}, contract, upsert=True),
+            code_hash,
+            contract,
+        )
+        return contract["_id"] if is_new else None
+
+    def _get_pending(self, collection: Collection, key) -> Optional[Dict]:
+        # documents of queued writes are read from the queue until they are stored
+        if self._write_behind is None:
+            return None
+
+        return self._write_behind.get_pending(collection, key)
+
+    def _get_pending_many(self, collection: Collection, keys: Dict) -> Dict:
+        """Pending documents of the keys, by the values they are mapped to."""
+        pending = {}
+        for key, value in keys.items():
+            document = self._get_pending(collection, key)
+            if document is not None:
+                pending[value] = document
+
+        return pending
+
+    def create_indexes(self) -> None:
+        """Create the required indexes, existing ones are left as they are."""
+        # signatures stored before they had a key are migrated once, before the key
+        # index is created
+        if "signature_key" not in self._signatures.index_information():
+            self._migrate_legacy_signatures()
+
+        for collection, indexes in INDEXES.items():
+            for index in indexes:
+                try:
+                    self._db[collection].create_indexes([index])
+                except OperationFailure as e:
+                    # e.g. duplicates in a collection given a unique index
+                    log.error(
+                        "Creating index %s of %s failed: %s",
+                        index.document["name"],
+                        collection.value,
+                        e,
+                    )
+
+        missing = self.get_missing_indexes()
+        if missing:
+            log.warning("Semantics collections miss indexes: %s", missing)
+
+    def _migrate_legacy_signatures(self) -> None:
+        """Give signatures stored before they had a key one, and merge the ones
+        sharing a key into one document with the sum of their counts."""
+        legacy_signatures = [
+            UpdateOne(
+                {"_id": signature["_id"]},
+                {"$set": {"arg_types": get_arg_types(signature["args"])}},
+            )
+            for signature in self._signatures.find(
+                {"arg_types": {"$exists": False}}, {"args": 1}
+            )
+        ]
+        if legacy_signatures:
+            self._signatures.bulk_write(legacy_signatures)
+
+        duplicates = self._signatures.aggregate(
+            [
+                {
+                    "$group": {
+                        "_id": {field: f"${field}" for field in SIGNATURE_KEY},
+                        "signatures": {
+                            "$push": {
+                                "_id": "$_id",
+                                "count": {"$ifNull": ["$count", 0]},
+                                "guessed": {"$ifNull": ["$guessed", False]},
+                            }
+                        },
+                    }
+                },
+                {"$match": {"signatures.1": {"$exists": True}}},
+            ],
+            allowDiskUse=True,
+        )
+        operations = []
+        for duplicate in duplicates:
+            # the signature with real argument names is kept
+            signatures = sorted(
+                duplicate["signatures"],
+                key=lambda signature: (signature["guessed"], -signature["count"]),
+            )
+            operations.append(
+                UpdateOne(
+                    {"_id": signatures[0]["_id"]},
+                    {
+                        "$set": {
+                            "count": sum(signature["count"] for signature in signatures)
+                        }
+                    },
+                )
+            )
+            operations.append(
+                DeleteMany(
+                    {"_id": {"$in": [signature["_id"] for signature in signatures[1:]]}}
+                )
+            )
+        if operations:
+            log.info("Merging %d duplicated signatures.", len(operations) // 2)
+            self._signatures.bulk_write(operations)
+
+    def get_missing_indexes(self) -> Dict[str, List[str]]:
+        """Names of the required indexes which do not exist, by collection."""
+        missing = {}
+        for collection, indexes in INDEXES.items():
+            existing = {
+                tuple(tuple(field) for field in index["key"])
+                for index in self._db[collection].index_information().values()
+            }
+            names = [
+                index.document["name"]
+                for index in indexes
+                if tuple(index.document["key"].items()) not in existing
+            ]
+            if names:
+                missing[collection.value] = names
+
+        return missing
+
+    def get_index_usage(self) -> Dict[str, Dict[str, int]]:
+        """Number of operations which used each index since the server started."""
+        usage = {}
+        for collection in INDEXES:
+            try:
+                stats = self._db[collection].aggregate([{"$indexStats": {}}])
+                usage[collection.value] = {
+                    index["name"]: index["accesses"]["ops"] for index in stats
+                }
+            except (OperationFailure, NotImplementedError) as e:
+                log.warning("Index usage of %s unavailable: %s", collection.value, e)
+
+        return usage
+
     def _init_collections(self) -> None:
         for mongo_collection in MongoCollections:
             self.__setattr__(f"_{mongo_collection}", self._db[mongo_collection])
 
     def delete_semantics_by_address(self, chain_id: str, address: str) -> None:
+        self.flush()
         address_semantics = self.get_address_semantics(chain_id, address)
 
         if not address_semantics:
@@ -126,5 +578,21 @@ class MongoSemanticsDatabase(ISemanticsDatabase):
         self._addresses.delete_one({"chain_id": chain_id, "address": address})
         self._contracts.delete_one({"code_hash": codehash})
 
-        self.get_contract_semantics.cache_clear()
-        self.get_address_semantics.cache_clear()
+        self.get_contract_semantics.invalidate(codehash)
+        self.get_address_semantics.invalidate(chain_id, address)
+
+
+def get_arg_types(args: List[Dict]) -> str:
+    return ",".join(arg["type"] for arg in args)
+
+
+def get_contract_projection(fields: List[str]) -> Dict[str, int]:
+    """Projection of a contract to its name and the fields, e.g. `functions.0x...`."""
+    projection = {"_id": 0, "code_hash": 1, "name": 1}
+    for field in fields:
+        part = field.split(".", 1)[0]
+        # entries of a part read as a whole collide with it
+        if field == part or part not in fields:
+            projection[field] = 1
+
+    return projection
@@ -14,13 +14,22 @@
 # not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
 # the trademark and/or other branding elements.
 
-from typing import Optional, List, Dict, Tuple
-
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Optional, List, Dict, Iterable, Tuple
+
+from ethtx.decoders.decode_context import (
+    DecodeContext,
+    end_decode,
+    get_decode_context,
+    start_decode,
+)
 from ethtx.decoders.decoders.semantics import decode_events_and_functions
 from ethtx.models.semantics_model import (
     AddressSemantics,
     ContractSemantics,
-    ParameterSemantics,
     ERC20Semantics,
     TransformationSemantics,
     FunctionSemantics,
@@ -29,12 +38,23 @@ from ethtx.models.semantics_model import (
     SignatureArg,
 )
 from ethtx.providers import EtherscanProvider, ENSProvider
+from ethtx.providers.semantic_providers.const import CONTRACT_PARTS
 from ethtx.providers.semantic_providers.database import ISemanticsDatabase
+from ethtx.providers.semantic_providers.snapshot import read_snapshot
 from ethtx.providers.web3_provider import NodeDataProvider
 from ethtx.semantics.protocols_router import amend_contract_semantics
 from ethtx.semantics.solidity.precompiles import precompiles
 from ethtx.semantics.standards.erc20 import ERC20_FUNCTIONS, ERC20_EVENTS
 from ethtx.semantics.standards.erc721 import ERC721_FUNCTIONS, ERC721_EVENTS
+from ethtx.utils.cache_tools import TTLCache
+
+log = logging.getLogger(__name__)
+
+SEMANTICS_CACHE_SIZE = 2048
+# usage of addresses is written at most this often, in seconds
+USAGE_FLUSH_INTERVAL = 60
+# how often semantics created by another process are looked for, in seconds
+LEASE_POLL_INTERVAL = 0.25
 
 
 class SemanticsRepository:
@@ -45,24 +65,188 @@ class SemanticsRepository:
         web3provider: NodeDataProvider,
         ens_provider: ENSProvider,
         refresh_ens: bool = True,
+        semantics_cache_size: int = SEMANTICS_CACHE_SIZE,
+        creation_lease_ttl: Optional[float] = None,
     ):
         self.database = database_connection
         self.etherscan = etherscan_provider
         self._web3provider = web3provider
         self._ens_provider = ens_provider
         self.refresh_ens = refresh_ens
+        # semantics of an address are created by one process at a time when set
+        self.creation_lease_ttl = creation_lease_ttl
+        self._lease_owner = uuid.uuid4().hex
+
+        # hydrated and amended semantics, shared by all the lookups of an address
+        self._semantics = TTLCache(
+            maxsize=semantics_cache_size, name="semantics.hydrated"
+        )
+        self._signatures = TTLCache(
+            maxsize=semantics_cache_size, name="semantics.signatures"
+        )
+        # semantics and signatures of a snapshot, kept for the life of the process
+        self._snapshot = TTLCache(maxsize=0, ttl=None, name="semantics.snapshot")
+        self._snapshot_signatures = TTLCache(
+            maxsize=0, ttl=None, name="semantics.snapshot_signatures"
+        )
 
-        self._records: Optional[List] = None
+        # uses of addresses not written yet
+        self._usage: Dict[Tuple[str, str], int] = {}
+        self._usage_flushed = time.monotonic()
+        self._usage_lock = threading.Lock()
 
     def record(self) -> None:
-        """Records is an array used to hold semantics used in tx decing process.
-        This recording is used just for logging"""
-        self._records = []
+        """Start a decode context in the current thread, recording the semantics
+        used by the decode, see `decoders.decode_context`."""
+        start_decode()
+
+    def end_record(self) -> Optional[List]:
+        """End the decode context, returns addresses of the semantics it used."""
+        context = get_decode_context()
+        if context is None:
+            return None
+
+        end_decode(context)
+        self.count_usage(context)
+
+        return context.addresses
+
+    def count_usage(self, context: DecodeContext) -> None:
+        """Count uses of the semantics used by a decode, see `flush_usage`."""
+        with self._usage_lock:
+            for used in context.used:
+                self._usage[used] = self._usage.get(used, 0) + 1
+            flush = time.monotonic() - self._usage_flushed >= USAGE_FLUSH_INTERVAL
+
+        if flush:
+            self.flush_usage()
+
+    def flush_usage(self) -> None:
+        """Write usage of addresses counted since the last flush."""
+        with self._usage_lock:
+            usage, self._usage = self._usage, {}
+            self._usage_flushed = time.monotonic()
+        if not usage:
+            return
+
+        last_used = int(time.time())
+        try:
+            self.database.record_usage(
+                [
+                    {
+                        "chain_id": chain_id,
+                        "address": address,
+                        "count": count,
+                        "last_used": last_used,
+                    }
+                    for (chain_id, address), count in usage.items()
+                ]
+            )
+        except Exception as e:
+            log.warning("Writing semantics usage failed: %s", e)
+
+    def load_snapshot(self, path: str) -> int:
+        """Load semantics and signatures of a snapshot, see `snapshot.export_snapshot`.
+        They are kept in caches of their own, sized to the snapshot and without a TTL,
+        until they are invalidated. Returns the number of loaded addresses."""
+        snapshot = read_snapshot(path)
+        contracts = {
+            contract["code_hash"]: contract for contract in snapshot["contracts"]
+        }
+
+        self._snapshot_signatures = TTLCache(
+            maxsize=len(snapshot["signatures"]),
+            ttl=None,
+            name="semantics.snapshot_signatures",
+        )
+        for signature in snapshot["signatures"]:
+            self._snapshot_signatures.set(signature["signature_hash"], signature)
+
+        self._snapshot = TTLCache(
+            maxsize=len(snapshot["addresses"]), ttl=None, name="semantics.snapshot"
+        )
+        for raw_address in snapshot["addresses"]:
+            chain_id, address = raw_address["chain_id"], raw_address["address"]
+            address_semantics = self._hydrate_semantics(
+                raw_address,
+                chain_id,
+                contracts.get(raw_address["contract"]),
+                refresh_ens=False,
+            )
+            # amend semantics with locally stored updates
+            amend_contract_semantics(address_semantics.contract)
+            address_semantics.contract.reset_indexes()
+            self._snapshot.set((chain_id, address), address_semantics)
+
+        log.info("Loaded %d semantics from %s.", len(snapshot["addresses"]), path)
+        return len(snapshot["addresses"])
+
+    def prefetch_semantics(
+        self,
+        chain_id: str,
+        addresses: Iterable[str],
+        contracts: Optional[Iterable[str]] = None,
+        fields: Optional[Iterable[str]] = None,
+    ) -> None:
+        """Read stored semantics of all the addresses with two bulk queries, and token
+        metadata of the contracts without them at once, before they are used one by one.
+        Given contract `fields` (e.g. `functions.0x...`), only they are read and the
+        rest of the contracts is filled in when needed.
+        """
+        fields = list(fields) if fields is not None else None
+
+        # cached contracts read partially by former decodes get the missing fields
+        # with one query, as new addresses do
+        new_addresses, partial_contracts = set(), {}
+        for address in addresses:
+            if not address:
+                continue
+            address_semantics = self._semantics.get(
+                (chain_id, address)
+            ) or self._snapshot.get((chain_id, address))
+            if address_semantics is None:
+                new_addresses.add(address)
+            elif fields and not address_semantics.contract.is_complete:
+                contract = address_semantics.contract
+                partial_contracts[id(contract)] = contract
+        if partial_contracts:
+            self._load_contracts_fields(list(partial_contracts.values()), fields)
+
+        addresses = new_addresses
+        if not addresses:
+            return
+
+        raw_addresses = self.database.get_addresses_semantics(chain_id, list(addresses))
+        raw_contracts = {
+            raw_contract["code_hash"]: raw_contract
+            for raw_contract in self.database.get_contracts_semantics(
+                list({raw_address["contract"] for raw_address in raw_addresses}), fields
+            )
+        }
+
+        for raw_address in raw_addresses:
+            address = raw_address["address"]
+            address_semantics = self._hydrate_semantics(
+                raw_address,
+                chain_id,
+                raw_contracts.get(raw_address["contract"]),
+                fields,
+            )
+            self._cache_semantics(chain_id, address, address_semantics)
+            addresses.discard(address)
+
+        unknown = [
+            address
+            for address in (addresses if contracts is None else contracts)
+            if address in addresses
+        ]
+        if not unknown:
+            return
 
-    def end_record(self) -> List:
-        tmp_records = self._records
-        self._records = None
-        return tmp_records
+        try:
+            self._web3provider.get_tokens_metadata(unknown, chain_id)
+        except Exception as e:
+            log.warning("Token metadata prefetch failed: %s", e)
 
     def _read_stored_semantics(
         self, address: str, chain_id: str
@@ -75,12 +259,30 @@ class SemanticsRepository:
         if not raw_address_semantics:
             return None
 
+        # contract entries are read when they are looked up
+        return self._hydrate_semantics(raw_address_semantics, chain_id, fields=[])
+
+    def _hydrate_semantics(
+        self,
+        raw_address_semantics: Dict,
+        chain_id: str,
+        raw_contract_semantics: Optional[Dict] = None,
+        fields: Optional[List[str]] = None,
+        refresh_ens: bool = True,
+    ) -> AddressSemantics:
+        address = raw_address_semantics["address"]
         address_semantics = AddressSemantics.from_mongo_record(
-            raw_address_semantics, self.database
+            raw_address_semantics, self.database, raw_contract_semantics, fields
         )
 
+        # bytecode of known contracts can be found by their code hash
+        bytecode_store = getattr(self._web3provider, "bytecode_store", None)
+        if bytecode_store and address_semantics.is_contract:
+            bytecode_store.seed(chain_id, address, address_semantics.contract.code_hash)
+
         if (
-            self.refresh_ens
+            refresh_ens
+            and self.refresh_ens
             and address_semantics.name == address_semantics.address
             and not raw_address_semantics["is_contract"]
         ):
@@ -104,15 +306,32 @@ class SemanticsRepository:
         code_hash = provider.get_code_hash(address, chain_id)
 
         if code_hash != ZERO_HASH:
-            # smart contract
-            raw_semantics, decoded = self.etherscan.contract.get_contract_abi(
-                chain_id, address
-            )
-            if decoded and raw_semantics:
-                # raw semantics received from Etherscan
-                events, functions = decode_events_and_functions(raw_semantics["abi"])
+            # smart contract, its bytecode may be known from another address, e.g.
+            # a clone or the same deployment on another chain
+            contract_semantics = self._read_decoded_contract(code_hash)
+            if contract_semantics is None:
+                raw_semantics, decoded = self.etherscan.contract.get_contract_abi(
+                    chain_id, address
+                )
+                if decoded and raw_semantics:
+                    # raw semantics received from Etherscan
+                    events, functions = decode_events_and_functions(
+                        raw_semantics["abi"]
+                    )
+                    contract_semantics = ContractSemantics(
+                        code_hash=code_hash,
+                        name=raw_semantics["name"],
+                        events=events,
+                        functions=functions,
+                        transformations={},
+                    )
+
+            if contract_semantics is not None:
                 standard, standard_semantics = self._decode_standard_semantics(
-                    address, raw_semantics["name"], events, functions
+                    address,
+                    contract_semantics.name,
+                    contract_semantics.events,
+                    contract_semantics.functions,
                 )
                 if standard == "ERC20":
                     erc20_semantics = standard_semantics
@@ -122,17 +341,10 @@ class SemanticsRepository:
                         erc20_semantics = ERC20Semantics(**proxy_erc20)
                     else:
                         erc20_semantics = None
-                contract_semantics = ContractSemantics(
-                    code_hash=code_hash,
-                    name=raw_semantics["name"],
-                    events=events,
-                    functions=functions,
-                    transformations={},
-                )
                 address_semantics = AddressSemantics(
                     chain_id=chain_id,
                     address=address,
-                    name=raw_semantics["name"],
+                    name=contract_semantics.name,
                     is_contract=True,
                     contract=contract_semantics,
                     standard=standard,
@@ -185,23 +397,176 @@ class SemanticsRepository:
 
         return address_semantics
 
+    def _read_decoded_contract(self, code_hash: str) -> Optional[ContractSemantics]:
+        """Stored semantics of a contract with a decoded ABI, contracts stored
+        without one are looked up again."""
+        raw_contract = self.database.get_contract_semantics(code_hash)
+        if not raw_contract or not (
+            raw_contract.get("functions") or raw_contract.get("events")
+        ):
+            return None
+
+        return ContractSemantics.from_mongo_record(raw_contract)
+
     def get_semantics(self, chain_id: str, address: str) -> Optional[AddressSemantics]:
+        """Semantics of an address with its complete contract."""
+        address_semantics = self._get_semantics(chain_id, address)
+        if address_semantics:
+            self._load_contract_fields(address_semantics.contract)
+
+        return address_semantics
+
+    def _get_semantics(self, chain_id: str, address: str) -> Optional[AddressSemantics]:
+        """Semantics of an address, its contract may be read partially."""
         if not address:
             return None
 
+        # concurrent lookups of an address wait for the one reading or creating it
+        address_semantics = self._semantics.get_or_load(
+            (chain_id, address), lambda: self._load_semantics(chain_id, address)
+        )
+
+        context = get_decode_context()
+        if context is not None:
+            context.use(chain_id, address)
+
+        return address_semantics
+
+    def _load_semantics(self, chain_id: str, address: str) -> AddressSemantics:
+        address_semantics = self._snapshot.get((chain_id, address))
+        if address_semantics is not None:
+            return address_semantics
+
         address_semantics = self._read_stored_semantics(address, chain_id)
         if not address_semantics:
-            address_semantics = self._create_address_semantics(chain_id, address)
-            self.update_semantics(address_semantics)
+            if self.creation_lease_ttl is None:
+                address_semantics = self._create_semantics(chain_id, address)
+            else:
+                address_semantics = self._create_semantics_leased(chain_id, address)
 
         # amend semantics with locally stored updates
         amend_contract_semantics(address_semantics.contract)
+        address_semantics.contract.reset_indexes()
+        return address_semantics
 
-        if self._records is not None:
-            self._records.append(address)
+    def _create_semantics(self, chain_id: str, address: str) -> AddressSemantics:
+        address_semantics = self._create_address_semantics(chain_id, address)
+        self.update_semantics(address_semantics)
+        return address_semantics
+
+    def _create_semantics_leased(self, chain_id: str, address: str) -> AddressSemantics:
+        lease = f"semantics:{chain_id}:{address}"
+        while not self.database.acquire_lease(
+            lease, self._lease_owner, self.creation_lease_ttl
+        ):
+            # another process creates the semantics, they are read when stored
+            time.sleep(LEASE_POLL_INTERVAL)
+            address_semantics = self._read_stored_semantics(address, chain_id)
+            if address_semantics:
+                return address_semantics
+
+        try:
+            # the previous owner may have stored them before releasing the lease
+            address_semantics = self._read_stored_semantics(address, chain_id)
+            if not address_semantics:
+                address_semantics = self._create_semantics(chain_id, address)
+                # written before other processes are let in
+                self.database.flush()
+        finally:
+            self.database.release_lease(lease, self._lease_owner)
 
         return address_semantics
 
+    def _get_contract_entry(
+        self, contract: ContractSemantics, part: str, signature: str
+    ):
+        entries = getattr(contract, part)
+        if (
+            signature not in entries
+            and not contract.is_complete
+            and part not in contract._fields
+            and f"{part}.{signature}" not in contract._fields
+        ):
+            self._load_contract_fields(contract, [f"{part}.{signature}"])
+
+        return entries.get(signature)
+
+    def _load_contract_fields(
+        self, contract: ContractSemantics, fields: Optional[List[str]] = None
+    ) -> None:
+        """Fill a partially read contract with the fields, or all of them."""
+        if contract.is_complete:
+            return
+
+        if fields is None:
+            raw_contract = self.database.get_contract_semantics(contract.code_hash)
+        else:
+            raw_contract = self.database.get_contract_semantics_fields(
+                contract.code_hash, fields
+            )
+
+        self._merge_contract_fields(contract, raw_contract, fields)
+
+    def _load_contracts_fields(
+        self, contracts: List[ContractSemantics], fields: List[str]
+    ) -> None:
+        """Fill partially read contracts with the fields they miss, in one query."""
+        missing = {
+            contract.code_hash: [
+                field
+                for field in fields
+                if field not in contract._fields
+                and field.split(".", 1)[0] not in contract._fields
+            ]
+            for contract in contracts
+            if not contract.is_complete
+        }
+        missing_fields = sorted(set().union(*missing.values()))
+        if not missing_fields:
+            return
+
+        raw_contracts = {
+            raw_contract["code_hash"]: raw_contract
+            for raw_contract in self.database.get_contracts_semantics(
+                [code_hash for code_hash, fields_ in missing.items() if fields_],
+                missing_fields,
+            )
+        }
+        for contract in contracts:
+            if missing.get(contract.code_hash):
+                self._merge_contract_fields(
+                    contract, raw_contracts.get(contract.code_hash), missing_fields
+                )
+
+    @staticmethod
+    def _merge_contract_fields(
+        contract: ContractSemantics,
+        raw_contract: Optional[Dict],
+        fields: Optional[List[str]],
+    ) -> None:
+        if raw_contract:
+            loaded = ContractSemantics.from_mongo_record(raw_contract)
+            contract.name = loaded.name
+            for part in CONTRACT_PARTS:
+                entries = getattr(contract, part)
+                # entries amended with local updates are kept
+                for signature, entry in getattr(loaded, part).items():
+                    entries.setdefault(signature, entry)
+            contract.reset_indexes()
+
+        if fields is None:
+            contract._fields = None
+        else:
+            contract._fields.update(fields)
+
+    def _cache_semantics(
+        self, chain_id: str, address: str, address_semantics: AddressSemantics
+    ) -> None:
+        # amend semantics with locally stored updates
+        amend_contract_semantics(address_semantics.contract)
+        address_semantics.contract.reset_indexes()
+        self._semantics.set((chain_id, address), address_semantics)
+
     def _decode_standard_semantics(
         self, address, name, events, functions: Dict[str, FunctionSemantics]
     ) -> Tuple[Optional[str], Optional[ERC20Semantics]]:
@@ -237,8 +602,10 @@ class SemanticsRepository:
         if not address:
             return None
 
-        semantics = self.get_semantics(chain_id, address)
-        event_semantics = semantics.contract.events.get(signature)
+        semantics = self._get_semantics(chain_id, address)
+        event_semantics = self._get_contract_entry(
+            semantics.contract, "events", signature
+        )
 
         return event_semantics
 
@@ -248,8 +615,10 @@ class SemanticsRepository:
         if not address:
             return None
 
-        semantics = self.get_semantics(chain_id, address)
-        transformations = semantics.contract.transformations.get(signature)
+        semantics = self._get_semantics(chain_id, address)
+        transformations = self._get_contract_entry(
+            semantics.contract, "transformations", signature
+        )
 
         return transformations
 
@@ -257,19 +626,11 @@ class SemanticsRepository:
         if not address:
             return None
 
-        semantics = self.get_semantics(chain_id, address)
-        event_semantics = None
-
-        anonymous_events = {
-            signature
-            for signature, event in semantics.contract.events.items()
-            if event.anonymous
-        }
-        if len(anonymous_events) == 1:
-            event_signature = anonymous_events.pop()
-            event_semantics = semantics.contract.events[event_signature]
+        semantics = self._get_semantics(chain_id, address)
+        if not semantics.contract.is_complete:
+            self._load_contract_fields(semantics.contract, ["events"])
 
-        return event_semantics
+        return semantics.contract.anonymous_event
 
     def get_function_abi(
         self, chain_id, address, signature
@@ -277,8 +638,10 @@ class SemanticsRepository:
         if not address:
             return None
 
-        semantics = self.get_semantics(chain_id, address)
-        function_semantics = semantics.contract.functions.get(signature)
+        semantics = self._get_semantics(chain_id, address)
+        function_semantics = self._get_contract_entry(
+            semantics.contract, "functions", signature
+        )
 
         return function_semantics
 
@@ -286,34 +649,32 @@ class SemanticsRepository:
         if not address:
             return None
 
-        semantics = self.get_semantics(chain_id, address)
-        constructor_semantics = semantics.contract.functions.get("constructor")
+        semantics = self._get_semantics(chain_id, address)
+        self._get_contract_entry(semantics.contract, "functions", "constructor")
 
-        if constructor_semantics:
-            constructor_semantics.outputs.append(
-                ParameterSemantics(
-                    parameter_name="__create_output__",
-                    parameter_type="ignore",
-                    indexed=False,
-                    dynamic=True,
-                )
-            )
-
-        return constructor_semantics
+        return semantics.contract.constructor_abi
 
-    # do not cache with lru - uses unhashable arguments
+    # labels, contract checks, standards and token data are looked up many times by
+    # one decode, they are memoized in its context
     def get_address_label(self, chain_id, address, proxies=None) -> str:
         if not address:
             return ""
 
+        proxy = proxies.get(address) if proxies else None
+        return self._memoize(
+            ("label", chain_id, address, proxy.name if proxy else None),
+            lambda: self._get_address_label(chain_id, address, proxy),
+        )
+
+    def _get_address_label(self, chain_id, address, proxy) -> str:
         if int(address, 16) in precompiles:
             contract_label = "Precompiled"
         else:
-            semantics = self.get_semantics(chain_id, address)
+            semantics = self._get_semantics(chain_id, address)
             if semantics.erc20:
                 contract_label = semantics.erc20.symbol
-            elif proxies and address in proxies:
-                contract_label = proxies[address].name
+            elif proxy:
+                contract_label = proxy.name
             else:
                 contract_label = (
                     semantics.name if semantics and semantics.name else address
@@ -325,17 +686,20 @@ class SemanticsRepository:
         if not address:
             return False
 
-        semantics = self.get_semantics(chain_id, address)
-        is_contract = semantics is not None and semantics.is_contract
+        def is_contract() -> bool:
+            semantics = self._get_semantics(chain_id, address)
+            return semantics is not None and semantics.is_contract
 
-        return is_contract
+        return self._memoize(("is_contract", chain_id, address), is_contract)
 
     def get_standard(self, chain_id, address) -> Optional[str]:
         if not address:
             return None
 
-        semantics = self.get_semantics(chain_id, address)
-        return semantics.standard
+        return self._memoize(
+            ("standard", chain_id, address),
+            lambda: self._get_semantics(chain_id, address).standard,
+        )
 
     def get_token_data(
         self, chain_id, address, proxies=None
@@ -343,15 +707,30 @@ class SemanticsRepository:
         if not address:
             return None, None, None, None
 
-        semantics = self.get_semantics(chain_id, address)
+        proxy = proxies.get(address) if proxies else None
+        token = proxy.token if proxy else None
+        return self._memoize(
+            (
+                "token",
+                chain_id,
+                address,
+                (token.name, token.symbol, token.decimals) if token else None,
+            ),
+            lambda: self._get_token_data(chain_id, address, token),
+        )
+
+    def _get_token_data(
+        self, chain_id, address, proxy_token
+    ) -> Tuple[Optional[str], Optional[str], Optional[int], Optional[str]]:
+        semantics = self._get_semantics(chain_id, address)
         if semantics.erc20:
             token_name = semantics.erc20.name if semantics.erc20 else address
             token_symbol = semantics.erc20.symbol if semantics.erc20 else "Unknown"
             token_decimals = semantics.erc20.decimals if semantics.erc20 else 18
-        elif proxies and address in proxies and proxies[address].token:
-            token_name = proxies[address].token.name
-            token_symbol = proxies[address].token.symbol
-            token_decimals = proxies[address].token.decimals
+        elif proxy_token:
+            token_name = proxy_token.name
+            token_symbol = proxy_token.symbol
+            token_decimals = proxy_token.decimals
         else:
             token_name = address
             token_symbol = "Unknown"
@@ -359,9 +738,15 @@ class SemanticsRepository:
 
         return token_name, token_symbol, token_decimals, "ERC20"
 
+    @staticmethod
+    def _memoize(key: Tuple, load: Callable[[], Any]) -> Any:
+        context = get_decode_context()
+        return context.memoize(key, load) if context is not None else load()
+
     def update_address(self, chain_id, address, contract) -> Dict:
         updated_address = {"network": chain_id, "address": address, **contract}
         self.database.insert_address(address=updated_address, update_if_exist=True)
+        self.invalidate_semantics(chain_id, address)
 
         return updated_address
 
@@ -369,6 +754,10 @@ class SemanticsRepository:
         if not semantics:
             return
 
+        self.invalidate_semantics(semantics.chain_id, semantics.address)
+        # a partially read contract would replace the stored one
+        self._load_contract_fields(semantics.contract)
+
         contract_id = self.database.insert_contract(
             contract=semantics.contract.dict(), update_if_exist=True
         )
@@ -413,12 +802,17 @@ class SemanticsRepository:
             self.update_or_insert_signature(new_signature)
 
     def get_most_used_signature(self, signature_hash: str) -> Optional[Signature]:
-        signatures = list(
-            self.database.get_signature_semantics(signature_hash=signature_hash)
-        )
+        most_common_signature = self._signatures.get(
+            signature_hash
+        ) or self._snapshot_signatures.get(signature_hash)
+        if most_common_signature is None:
+            most_common_signature = self.database.get_most_used_signature(
+                signature_hash
+            )
+            if most_common_signature:
+                self._signatures.set(signature_hash, most_common_signature)
 
-        if signatures:
-            most_common_signature = max(signatures, key=lambda x: x["count"])
+        if most_common_signature:
             signature = Signature(
                 signature_hash=most_common_signature["signature_hash"],
                 name=most_common_signature["name"],
@@ -433,30 +827,27 @@ class SemanticsRepository:
         return None
 
     def update_or_insert_signature(self, signature: Signature) -> None:
-        signatures = self.database.get_signature_semantics(
-            signature_hash=signature.signature_hash
-        )
-        for sig in signatures:
-            if (
-                signature.name == sig["name"]
-                and signature.signature_hash == sig["signature_hash"]
-                and len(signature.args) == len(sig["args"])
-            ):
-                if signature.args and any(
-                    arg for arg in list(sig["args"][0].values()) if "arg" in arg
-                ):
-                    sig["guessed"] = signature.guessed
-                    for index, argument in enumerate(sig["args"]):
-                        argument["name"] = signature.args[index].name
-                        argument["type"] = signature.args[index].type
-
-                sig["count"] += 1
-                self.database.insert_signature(signature=sig, update_if_exist=True)
-                break
-
-        else:
-            self.database.insert_signature(signature=signature.dict())
+        self.database.upsert_signature(signature.dict())
+        self._signatures.pop(signature.signature_hash)
+        self._snapshot_signatures.pop(signature.signature_hash)
 
     def delete_semantics(self, chain_id: str, addresses: List[str]):
         for address in addresses:
             self.database.delete_semantics_by_address(chain_id, address)
+            self.invalidate_semantics(chain_id, address)
+
+    def invalidate_semantics(
+        self, chain_id: Optional[str] = None, address: Optional[str] = None
+    ) -> None:
+        """Drop cached semantics of an address, or all of them without an address."""
+        # lookups memoized by the running decode may be based on them
+        context = get_decode_context()
+        if context is not None:
+            context.memo.clear()
+
+        if address is None:
+            self._semantics.clear()
+            self._snapshot.clear()
+        else:
+            self._semantics.pop((chain_id, address))
+            self._snapshot.pop((chain_id, address))
@@ -0,0 +1,418 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import json
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Union
+
+from .base import ISemanticsDatabase
+
+# bumped whenever the format of stored semantics changes, so processes running
+# different versions do not read each other's entries
+SHARED_CACHE_VERSION = 1
+SHARED_CACHE_TTL = 24 * 60 * 60
+
+# a hash field holding a whole contract record
+WHOLE_CONTRACT = "*"
+
+Value = Union[bytes, str]
+
+
+class SharedCache(ABC):
+    """Key-value store shared by decoder processes, entries written by one process
+    are read by the others."""
+
+    @abstractmethod
+    def get(self, keys: List[str]) -> List[Optional[Value]]:
+        ...
+
+    @abstractmethod
+    def set(self, items: Dict[str, Value]) -> None:
+        ...
+
+    @abstractmethod
+    def get_fields(
+        self, keys: Dict[str, List[str]]
+    ) -> Dict[str, List[Optional[Value]]]:
+        """Values of the given fields of each hash key."""
+        ...
+
+    @abstractmethod
+    def set_fields(self, items: Dict[str, Dict[str, Value]]) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, keys: List[str]) -> None:
+        ...
+
+
+class InProcessSharedCache(SharedCache):
+    """SharedCache kept in memory of one process, e.g. for tests or a single
+    worker."""
+
+    def __init__(self, ttl: Optional[int] = SHARED_CACHE_TTL):
+        self.ttl = ttl
+
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, keys: List[str]) -> List[Optional[Value]]:
+        with self._lock:
+            return [self._get(key) for key in keys]
+
+    def set(self, items: Dict[str, Value]) -> None:
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (self._expires(), value)
+
+    def get_fields(
+        self, keys: Dict[str, List[str]]
+    ) -> Dict[str, List[Optional[Value]]]:
+        with self._lock:
+            values = {}
+            for key, fields in keys.items():
+                entry = self._get(key) or {}
+                values[key] = [entry.get(field) for field in fields]
+
+            return values
+
+    def set_fields(self, items: Dict[str, Dict[str, Value]]) -> None:
+        with self._lock:
+            for key, fields in items.items():
+                entry = {**(self._get(key) or {}), **fields}
+                self._entries[key] = (self._expires(), entry)
+
+    def delete(self, keys: List[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires, value = entry
+        if expires is not None and expires <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        return value
+
+    def _expires(self) -> Optional[float]:
+        return time.monotonic() + self.ttl if self.ttl is not None else None
+
+
+class RedisSharedCache(SharedCache):
+    """SharedCache on a server speaking the Redis protocol (Redis, KeyDB, Valkey, ...),
+    given a `redis.Redis` compatible client."""
+
+    def __init__(self, client, ttl: Optional[int] = SHARED_CACHE_TTL):
+        self.client = client
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, ttl: Optional[int] = SHARED_CACHE_TTL):
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError(
+                "The `redis` package is required by the shared semantics cache."
+            ) from e
+
+        return cls(redis.Redis.from_url(url), ttl)
+
+    def get(self, keys: List[str]) -> List[Optional[Value]]:
+        return self.client.mget(keys) if keys else []
+
+    def set(self, items: Dict[str, Value]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipeline.set(key, value, ex=self.ttl)
+        pipeline.execute()
+
+    def get_fields(
+        self, keys: Dict[str, List[str]]
+    ) -> Dict[str, List[Optional[Value]]]:
+        pipeline = self.client.pipeline(transaction=False)
+        for key, fields in keys.items():
+            pipeline.hmget(key, fields)
+
+        return dict(zip(keys, pipeline.execute()))
+
+    def set_fields(self, items: Dict[str, Dict[str, Value]]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        for key, fields in items.items():
+            pipeline.hset(key, mapping=fields)
+            if self.ttl is not None:
+                pipeline.expire(key, self.ttl)
+        pipeline.execute()
+
+    def delete(self, keys: List[str]) -> None:
+        if keys:
+            self.client.delete(*keys)
+
+
+class SharedCacheSemanticsDatabase(ISemanticsDatabase):
+    """Semantics database read through a cache shared by processes, so a new
+    process reads semantics already read by the others without querying the
+    database. Stored records are cached serialized, contracts field by field
+    as they are projected; written semantics replace the cached ones."""
+
+    def __init__(self, database: ISemanticsDatabase, cache: SharedCache):
+        self.database = database
+        self.cache = cache
+
+    def __getattr__(self, name: str) -> Any:
+        # methods specific to the wrapped database, e.g. create_indexes
+        if name == "database":
+            raise AttributeError(name)
+        return getattr(self.database, name)
+
+    def get_address_semantics(self, chain_id: str, address: str) -> Optional[Dict]:
+        return next(iter(self.get_addresses_semantics(chain_id, [address])), None)
+
+    def get_addresses_semantics(
+        self, chain_id: str, addresses: List[str]
+    ) -> List[Dict]:
+        keys = [address_key(chain_id, address) for address in addresses]
+        records = [dumped for dumped in self.cache.get(keys) if dumped is not None]
+        records = [json.loads(record) for record in records]
+
+        cached = {record["address"] for record in records}
+        missing = [address for address in addresses if address not in cached]
+        if missing:
+            if len(missing) == 1:
+                record = self.database.get_address_semantics(chain_id, missing[0])
+                read = [record] if record else []
+            else:
+                read = self.database.get_addresses_semantics(chain_id, missing)
+
+            read = [strip_id(record) for record in read]
+            self.cache.set(
+                {
+                    address_key(chain_id, record["address"]): json.dumps(record)
+                    for record in read
+                }
+            )
+            records.extend(read)
+
+        return records
+
+    def get_contract_semantics(self, code_hash: str) -> Optional[Dict]:
+        return next(iter(self.get_contracts_semantics([code_hash])), None)
+
+    def get_contract_semantics_fields(
+        self, code_hash: str, fields: List[str]
+    ) -> Optional[Dict]:
+        return next(iter(self.get_contracts_semantics([code_hash], fields)), None)
+
+    def get_contracts_semantics(
+        self, code_hashes: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        # a whole contract serves projections of it too
+        requested = [WHOLE_CONTRACT] + (["name", *fields] if fields is not None else [])
+        cached = self.cache.get_fields(
+            {contract_key(code_hash): requested for code_hash in code_hashes}
+        )
+
+        contracts, missing = [], []
+        for code_hash in code_hashes:
+            whole, *values = cached[contract_key(code_hash)]
+            if whole is not None:
+                contract = json.loads(whole)
+                contracts.append(
+                    project_contract(contract, fields)
+                    if fields is not None
+                    else contract
+                )
+            elif values and None not in values:
+                name, *entries = [json.loads(value) for value in values]
+                contracts.append(
+                    build_contract(code_hash, name, dict(zip(fields, entries)))
+                )
+            else:
+                missing.append(code_hash)
+
+        if missing:
+            read = self._read_contracts(missing, fields)
+            contracts.extend(read)
+            self.cache.set_fields(
+                {
+                    contract_key(contract["code_hash"]): dump_contract(contract, fields)
+                    for contract in read
+                }
+            )
+
+        return contracts
+
+    def get_signature_semantics(self, signature_hash: str) -> Optional[List[Dict]]:
+        return self.database.get_signature_semantics(signature_hash)
+
+    def get_most_used_signature(self, signature_hash: str) -> Optional[Dict]:
+        return self.database.get_most_used_signature(signature_hash)
+
+    def get_most_used_signatures(self, limit: int) -> List[Dict]:
+        return self.database.get_most_used_signatures(limit)
+
+    def upsert_signature(self, signature: dict) -> Any:
+        return self.database.upsert_signature(signature)
+
+    def insert_signature(self, signature, update_if_exist: bool = False) -> Any:
+        return self.database.insert_signature(signature, update_if_exist)
+
+    def insert_contract(self, contract: dict, update_if_exist: bool = False) -> Any:
+        inserted = self.database.insert_contract(contract, update_if_exist)
+
+        # written through, queued (write-behind) writes are not read from the database
+        key = contract_key(contract["code_hash"])
+        self.cache.delete([key])
+        self.cache.set_fields({key: dump_contract(strip_id(contract), None)})
+
+        return inserted
+
+    def insert_address(self, address: dict, update_if_exist: bool = False) -> Any:
+        inserted = self.database.insert_address(address, update_if_exist)
+        self.cache.set(
+            {
+                address_key(address["chain_id"], address["address"]): json.dumps(
+                    strip_id(address)
+                )
+            }
+        )
+
+        return inserted
+
+    def get_bytecode(self, code_hash: str) -> Optional[bytes]:
+        # bytecode never changes, it is cached as it is
+        (bytecode,) = self.cache.get([bytecode_key(code_hash)])
+        if bytecode is None:
+            bytecode = self.database.get_bytecode(code_hash)
+            if bytecode is not None:
+                self.cache.set({bytecode_key(code_hash): bytecode})
+
+        return bytecode
+
+    def insert_bytecode(self, code_hash: str, bytecode: bytes) -> Any:
+        return self.database.insert_bytecode(code_hash, bytecode)
+
+    def delete_semantics_by_address(self, chain_id: str, address: str) -> None:
+        record = self.database.get_address_semantics(chain_id, address)
+        self.database.delete_semantics_by_address(chain_id, address)
+
+        keys = [address_key(chain_id, address)]
+        if record and record.get("contract"):
+            keys.append(contract_key(record["contract"]))
+        self.cache.delete(keys)
+
+    def record_usage(self, usage: List[Dict]) -> None:
+        self.database.record_usage(usage)
+
+    def get_most_used(
+        self, limit: Optional[int] = None, since: Optional[int] = None
+    ) -> List[Dict]:
+        return self.database.get_most_used(limit, since)
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        return self.database.acquire_lease(key, owner, ttl)
+
+    def release_lease(self, key: str, owner: str) -> None:
+        self.database.release_lease(key, owner)
+
+    def flush(self) -> None:
+        self.database.flush()
+
+    def _read_contracts(
+        self, code_hashes: List[str], fields: Optional[List[str]]
+    ) -> List[Dict]:
+        if len(code_hashes) > 1:
+            read = self.database.get_contracts_semantics(code_hashes, fields)
+        else:
+            (code_hash,) = code_hashes
+            record = (
+                self.database.get_contract_semantics_fields(code_hash, fields)
+                if fields is not None
+                else self.database.get_contract_semantics(code_hash)
+            )
+            read = [record] if record else []
+
+        return [strip_id(record) for record in read]
+
+
+def address_key(chain_id: str, address: str) -> str:
+    return f"ethtx:v{SHARED_CACHE_VERSION}:address:{chain_id}:{address}"
+
+
+def contract_key(code_hash: str) -> str:
+    return f"ethtx:v{SHARED_CACHE_VERSION}:contract:{code_hash}"
+
+
+def bytecode_key(code_hash: str) -> str:
+    return f"ethtx:v{SHARED_CACHE_VERSION}:bytecode:{code_hash}"
+
+
+def strip_id(record: Dict) -> Dict:
+    return {key: value for key, value in record.items() if key != "_id"}
+
+
+def get_contract_entry(contract: Dict, field: str) -> Any:
+    part, _, signature = field.partition(".")
+    entry = contract.get(part)
+    if signature:
+        entry = (entry or {}).get(signature)
+
+    return entry
+
+
+def build_contract(code_hash: str, name: str, entries: Dict[str, Any]) -> Dict:
+    """Contract record with the given entries, as projected by the database."""
+    contract = {"code_hash": code_hash, "name": name}
+    for field, entry in entries.items():
+        if entry is None:
+            continue
+
+        part, _, signature = field.partition(".")
+        if signature:
+            contract.setdefault(part, {})[signature] = entry
+        else:
+            contract[part] = entry
+
+    return contract
+
+
+def project_contract(contract: Dict, fields: List[str]) -> Dict:
+    return build_contract(
+        contract["code_hash"],
+        contract.get("name"),
+        {field: get_contract_entry(contract, field) for field in fields},
+    )
+
+
+def dump_contract(contract: Dict, fields: Optional[List[str]]) -> Dict[str, str]:
+    """Hash fields of a contract read with the given projection, entries which
+    do not exist are cached too."""
+    if fields is None:
+        return {WHOLE_CONTRACT: json.dumps(contract)}
+
+    return {
+        "name": json.dumps(contract.get("name")),
+        **{field: json.dumps(get_contract_entry(contract, field)) for field in fields},
+    }
@@ -0,0 +1,112 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import gzip
+import json
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from .base import ISemanticsDatabase
+from .shared_cache import strip_id
+from ...exceptions import InvalidSnapshotException
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# bumped whenever the format of snapshots or of the semantics in them changes
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SIGNATURES = 10000
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def export_snapshot(
+    database: ISemanticsDatabase,
+    path: str,
+    limit: Optional[int] = None,
+    days: Optional[int] = None,
+    signatures: int = SNAPSHOT_SIGNATURES,
+) -> Dict[str, int]:
+    """Write semantics of the `limit` most used addresses, or those used in the
+    last `days`, with their contracts and the most used signatures to a snapshot
+    file. Returns the number of exported records by kind."""
+    since = int(time.time()) - days * 24 * 60 * 60 if days is not None else None
+
+    used = defaultdict(list)
+    for usage in database.get_most_used(limit, since):
+        used[usage["chain_id"]].append(usage["address"])
+
+    addresses = [
+        strip_id(address)
+        for chain_id, chain_addresses in used.items()
+        for address in database.get_addresses_semantics(chain_id, chain_addresses)
+    ]
+    code_hashes = list({address["contract"] for address in addresses})
+    contracts = [
+        strip_id(contract)
+        for contract in database.get_contracts_semantics(code_hashes)
+        if contract
+    ]
+
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "created": int(time.time()),
+        "addresses": addresses,
+        "contracts": contracts,
+        "signatures": [
+            strip_id(signature)
+            for signature in database.get_most_used_signatures(signatures)
+        ],
+    }
+    write_snapshot(path, snapshot)
+
+    return {
+        kind: len(snapshot[kind]) for kind in ("addresses", "contracts", "signatures")
+    }
+
+
+def write_snapshot(path: str, snapshot: Dict) -> None:
+    """Snapshots are packed with msgpack when it is installed, otherwise they are
+    gzipped JSON."""
+    if msgpack is not None:
+        data = msgpack.packb(snapshot, use_bin_type=True)
+    else:
+        data = gzip.compress(json.dumps(snapshot).encode())
+
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def read_snapshot(path: str) -> Dict:
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if data.startswith(GZIP_MAGIC):
+        snapshot = json.loads(gzip.decompress(data))
+    elif msgpack is not None:
+        snapshot = msgpack.unpackb(data, raw=False)
+    else:
+        raise InvalidSnapshotException(f"{path} requires the `msgpack` package")
+
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        raise InvalidSnapshotException(
+            f"{path} is not a version {SNAPSHOT_VERSION} snapshot"
+        )
+
+    return snapshot
@@ -0,0 +1,653 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, urlparse
+
+from .base import ISemanticsDatabase
+from .const import CONTRACT_PARTS
+from .database import get_arg_types
+
+log = logging.getLogger(__name__)
+
+# reads of a database up to this size are served from memory mapped pages
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+IMPORT_BATCH_SIZE = 1000
+# values bound to one query stay under SQLITE_MAX_VARIABLE_NUMBER, 999 before SQLite 3.32
+QUERY_BATCH_SIZE = 250
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS addresses (
+    chain_id TEXT NOT NULL,
+    address TEXT NOT NULL,
+    record TEXT NOT NULL,
+    PRIMARY KEY (chain_id, address)
+);
+CREATE TABLE IF NOT EXISTS contracts (
+    id INTEGER PRIMARY KEY,
+    code_hash TEXT NOT NULL UNIQUE,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS contract_entries (
+    code_hash TEXT NOT NULL,
+    part TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    entry TEXT NOT NULL,
+    PRIMARY KEY (code_hash, part, signature)
+);
+CREATE TABLE IF NOT EXISTS signatures (
+    id INTEGER PRIMARY KEY,
+    signature_hash TEXT NOT NULL,
+    name TEXT NOT NULL,
+    arg_types TEXT NOT NULL,
+    args TEXT NOT NULL,
+    tuple INTEGER NOT NULL DEFAULT 0,
+    guessed INTEGER NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 1,
+    UNIQUE (signature_hash, name, arg_types)
+);
+CREATE TABLE IF NOT EXISTS bytecodes (
+    code_hash TEXT PRIMARY KEY,
+    bytecode BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS usage (
+    chain_id TEXT NOT NULL,
+    address TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (chain_id, address)
+);
+"""
+
+# indexes besides the primary and unique keys of the tables
+INDEXES = {
+    "signature_count": "CREATE INDEX IF NOT EXISTS signature_count "
+    "ON signatures (signature_hash, count DESC)",
+    "usage_count": "CREATE INDEX IF NOT EXISTS usage_count ON usage (count DESC)",
+    "usage_last_used": "CREATE INDEX IF NOT EXISTS usage_last_used "
+    "ON usage (last_used DESC)",
+}
+
+SIGNATURE_COLUMNS = "signature_hash, name, arg_types, args, tuple, guessed, count"
+
+
+class SQLiteSemanticsDatabase(ISemanticsDatabase):
+    """Semantics database embedded in a SQLite file, for deployments without
+    MongoDB. Contract entries are stored row by row, so field projections read
+    only the requested ones. A read-only database, e.g. a file shipped with batch
+    workers, ignores writes."""
+
+    def __init__(
+        self,
+        path: str,
+        read_only: bool = False,
+        mmap_size: int = SQLITE_MMAP_SIZE,
+    ):
+        self.path = path
+        self.read_only = read_only
+        self.mmap_size = mmap_size
+
+        # connections are not shared by threads
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+        if not read_only:
+            self._connection.executescript(SCHEMA)
+            self.create_indexes()
+
+    @classmethod
+    def from_url(cls, url: str) -> "SQLiteSemanticsDatabase":
+        """Database of a `sqlite:///relative/path` or `sqlite:////absolute/path`
+        connection string, `?mode=ro` opens it read-only."""
+        parsed = urlparse(url)
+        query = parse_qs(parsed.query)
+
+        return cls(path=parsed.path[1:], read_only=query.get("mode") == ["ro"])
+
+    def create_indexes(self) -> None:
+        if self._is_read_only("index creation"):
+            return
+
+        with self._connection as connection:
+            for index in INDEXES.values():
+                connection.execute(index)
+
+    def flush(self) -> None:
+        # every write is committed right away
+        pass
+
+    def pack(self) -> None:
+        """Leave the write-ahead log and compact the file, so it is self-contained
+        and can be opened read-only, e.g. after a bulk import."""
+        connection = self._connection
+        connection.execute("PRAGMA journal_mode = DELETE")
+        connection.execute("VACUUM")
+        connection.execute("ANALYZE")
+
+    def close(self) -> None:
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def get_address_semantics(self, chain_id: str, address: str) -> Optional[Dict]:
+        row = self._connection.execute(
+            "SELECT record FROM addresses WHERE chain_id = ? AND address = ?",
+            (chain_id, address),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_addresses_semantics(
+        self, chain_id: str, addresses: List[str]
+    ) -> List[Dict]:
+        records = []
+        for batch in batches(dict.fromkeys(addresses), QUERY_BATCH_SIZE):
+            rows = self._connection.execute(
+                "SELECT record FROM addresses WHERE chain_id = ? "
+                f"AND address IN ({placeholders(batch)})",
+                (chain_id, *batch),
+            )
+            records.extend(json.loads(record) for record, in rows)
+
+        return records
+
+    def get_contract_semantics(self, code_hash: str) -> Optional[Dict]:
+        return next(iter(self.get_contracts_semantics([code_hash])), None)
+
+    def get_contract_semantics_fields(
+        self, code_hash: str, fields: List[str]
+    ) -> Optional[Dict]:
+        return next(iter(self.get_contracts_semantics([code_hash], fields)), None)
+
+    def get_contracts_semantics(
+        self, code_hashes: List[str], fields: Optional[List[str]] = None
+    ) -> List[Dict]:
+        connection = self._connection
+        contracts = {}
+        for batch in batches(dict.fromkeys(code_hashes), QUERY_BATCH_SIZE):
+            for code_hash, record in connection.execute(
+                "SELECT code_hash, record FROM contracts "
+                f"WHERE code_hash IN ({placeholders(batch)})",
+                batch,
+            ):
+                record = json.loads(record)
+                if fields is None:
+                    contracts[code_hash] = {
+                        **record,
+                        **{part: {} for part in CONTRACT_PARTS},
+                    }
+                else:
+                    contracts[code_hash] = {
+                        "code_hash": code_hash,
+                        "name": record.get("name"),
+                        **{part: {} for part in fields if part in CONTRACT_PARTS},
+                    }
+
+        if not contracts:
+            return []
+
+        parts, entries = [], []
+        if fields is not None:
+            parts = [field for field in fields if field in CONTRACT_PARTS]
+            entries = [
+                tuple(field.split(".", 1))
+                for field in fields
+                if "." in field and field.split(".", 1)[0] not in parts
+            ]
+            if not parts and not entries:
+                return list(contracts.values())
+
+        for batch in batches(contracts, QUERY_BATCH_SIZE):
+            # whole parts are read with the first batch of entries
+            for i, entries_batch in enumerate(
+                batches(entries, QUERY_BATCH_SIZE) if entries else [[]]
+            ):
+                query = (
+                    "SELECT code_hash, part, signature, entry FROM contract_entries "
+                    f"WHERE code_hash IN ({placeholders(batch)})"
+                )
+                parameters = list(batch)
+                if fields is not None:
+                    conditions = []
+                    if parts and i == 0:
+                        conditions.append(f"part IN ({placeholders(parts)})")
+                        parameters.extend(parts)
+                    if entries_batch:
+                        conditions.append(
+                            "(part, signature) IN (VALUES "
+                            + ", ".join("(?, ?)" for _ in entries_batch)
+                            + ")"
+                        )
+                        parameters.extend(
+                            value for entry in entries_batch for value in entry
+                        )
+                    query += f" AND ({' OR '.join(conditions)})"
+
+                for code_hash, part, signature, entry in connection.execute(
+                    query + " ORDER BY rowid", parameters
+                ):
+                    contracts[code_hash].setdefault(part, {})[signature] = json.loads(
+                        entry
+                    )
+
+        return list(contracts.values())
+
+    def get_signature_semantics(self, signature_hash: str) -> List[Dict]:
+        rows = self._connection.execute(
+            f"SELECT {SIGNATURE_COLUMNS} FROM signatures WHERE signature_hash = ?",
+            (signature_hash,),
+        )
+        return [signature_record(row) for row in rows]
+
+    def get_most_used_signature(self, signature_hash: str) -> Optional[Dict]:
+        row = self._connection.execute(
+            f"SELECT {SIGNATURE_COLUMNS} FROM signatures WHERE signature_hash = ? "
+            "ORDER BY count DESC LIMIT 1",
+            (signature_hash,),
+        ).fetchone()
+        return signature_record(row) if row else None
+
+    def get_most_used_signatures(self, limit: int) -> List[Dict]:
+        # the bare columns are taken from the row with the maximum count
+        rows = self._connection.execute(
+            "SELECT signature_hash, name, arg_types, args, tuple, guessed, MAX(count) "
+            "FROM signatures GROUP BY signature_hash ORDER BY MAX(count) DESC LIMIT ?",
+            (limit,),
+        )
+        return [signature_record(row) for row in rows]
+
+    def upsert_signature(self, signature: Dict) -> None:
+        if self._is_read_only("signature"):
+            return
+
+        key = (
+            signature["signature_hash"],
+            signature["name"],
+            get_arg_types(signature["args"]),
+        )
+        args = json.dumps(signature["args"])
+
+        with self._connection as connection:
+            if not signature.get("guessed"):
+                # argument names guessed from an external source give way to real ones
+                connection.execute(
+                    "UPDATE signatures SET args = ?, guessed = 0 WHERE signature_hash = ? "
+                    "AND name = ? AND arg_types = ? AND guessed = 1",
+                    (args, *key),
+                )
+            connection.execute(
+                f"INSERT INTO signatures ({SIGNATURE_COLUMNS}) "
+                "VALUES (?, ?, ?, ?, ?, ?, 1) "
+                "ON CONFLICT (signature_hash, name, arg_types) "
+                "DO UPDATE SET count = count + 1",
+                (
+                    *key,
+                    args,
+                    signature.get("tuple", False),
+                    signature.get("guessed", False),
+                ),
+            )
+
+    def insert_signature(
+        self, signature: Dict, update_if_exist: bool = False
+    ) -> Optional[int]:
+        if self._is_read_only("signature"):
+            return None
+
+        row = signature_row(signature)
+        statement = (
+            f"INSERT INTO signatures ({SIGNATURE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)"
+        )
+        if update_if_exist:
+            statement += (
+                " ON CONFLICT (signature_hash, name, arg_types) DO UPDATE SET "
+                "args = excluded.args, tuple = excluded.tuple, "
+                "guessed = excluded.guessed, count = excluded.count"
+            )
+
+        with self._connection as connection:
+            exists = connection.execute(
+                "SELECT 1 FROM signatures WHERE signature_hash = ? AND name = ? "
+                "AND arg_types = ?",
+                row[:3],
+            ).fetchone()
+            inserted = connection.execute(statement, row)
+
+        return None if exists else inserted.lastrowid
+
+    def insert_contract(
+        self, contract: Dict, update_if_exist: bool = False
+    ) -> Optional[int]:
+        if self._is_read_only("contract"):
+            return None
+
+        code_hash = contract["code_hash"]
+        with self._connection as connection:
+            row = connection.execute(
+                "SELECT id FROM contracts WHERE code_hash = ?", (code_hash,)
+            ).fetchone()
+            if row and update_if_exist:
+                connection.execute(
+                    "UPDATE contracts SET record = ? WHERE id = ?",
+                    (contract_record(contract), row[0]),
+                )
+                connection.execute(
+                    "DELETE FROM contract_entries WHERE code_hash = ?", (code_hash,)
+                )
+                inserted = None
+            else:
+                # a duplicate raises IntegrityError, as the unique index of MongoDB
+                inserted = connection.execute(
+                    "INSERT INTO contracts (code_hash, record) VALUES (?, ?)",
+                    (code_hash, contract_record(contract)),
+                ).lastrowid
+            connection.executemany(
+                "INSERT INTO contract_entries (code_hash, part, signature, entry) "
+                "VALUES (?, ?, ?, ?)",
+                contract_entries(contract),
+            )
+
+        return inserted
+
+    def insert_address(
+        self, address: Dict, update_if_exist: bool = False
+    ) -> Optional[int]:
+        if self._is_read_only("address"):
+            return None
+
+        key = (address["chain_id"], address["address"])
+        record = address_record(address)
+        with self._connection as connection:
+            if update_if_exist:
+                updated = connection.execute(
+                    "UPDATE addresses SET record = ? WHERE chain_id = ? AND address = ?",
+                    (record, *key),
+                )
+                if updated.rowcount:
+                    return None
+
+            return connection.execute(
+                "INSERT INTO addresses (chain_id, address, record) VALUES (?, ?, ?)",
+                (*key, record),
+            ).lastrowid
+
+    def record_usage(self, usage: List[Dict]) -> None:
+        if self._is_read_only("usage"):
+            return
+
+        with self._connection as connection:
+            connection.executemany(
+                "INSERT INTO usage (chain_id, address, count, last_used) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (chain_id, address) DO UPDATE SET "
+                "count = count + excluded.count, "
+                "last_used = MAX(last_used, excluded.last_used)",
+                [
+                    (use["chain_id"], use["address"], use["count"], use["last_used"])
+                    for use in usage
+                ],
+            )
+
+    def get_most_used(
+        self, limit: Optional[int] = None, since: Optional[int] = None
+    ) -> List[Dict]:
+        rows = self._connection.execute(
+            "SELECT chain_id, address, count, last_used FROM usage "
+            "WHERE last_used >= ? ORDER BY count DESC LIMIT ?",
+            (since if since is not None else 0, limit or -1),
+        )
+        return [
+            {
+                "chain_id": chain_id,
+                "address": address,
+                "count": count,
+                "last_used": last_used,
+            }
+            for chain_id, address, count, last_used in rows
+        ]
+
+    def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+        if self._is_read_only("lease"):
+            return True
+
+        now = time.time()
+        with self._connection as connection:
+            # an expired lease is taken over
+            taken = connection.execute(
+                "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET owner = excluded.owner, "
+                "expires_at = excluded.expires_at WHERE leases.expires_at < ?",
+                (key, owner, now + ttl, now),
+            )
+            return taken.rowcount == 1
+
+    def release_lease(self, key: str, owner: str) -> None:
+        if self._is_read_only("lease"):
+            return
+
+        with self._connection as connection:
+            connection.execute(
+                "DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner)
+            )
+
+    def get_bytecode(self, code_hash: str) -> Optional[bytes]:
+        row = self._connection.execute(
+            "SELECT bytecode FROM bytecodes WHERE code_hash = ?", (code_hash,)
+        ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def insert_bytecode(self, code_hash: str, bytecode: bytes) -> None:
+        if self._is_read_only("bytecode"):
+            return
+
+        # bytecode is content-addressed, an existing row never changes
+        with self._connection as connection:
+            connection.execute(
+                "INSERT OR IGNORE INTO bytecodes (code_hash, bytecode) VALUES (?, ?)",
+                (code_hash, bytes(bytecode)),
+            )
+
+    def delete_semantics_by_address(self, chain_id: str, address: str) -> None:
+        if self._is_read_only("deletion"):
+            return
+
+        address_semantics = self.get_address_semantics(chain_id, address)
+        if not address_semantics:
+            return
+
+        code_hash = address_semantics["contract"]
+        with self._connection as connection:
+            connection.execute(
+                "DELETE FROM addresses WHERE chain_id = ? AND address = ?",
+                (chain_id, address),
+            )
+            connection.execute(
+                "DELETE FROM contracts WHERE code_hash = ?", (code_hash,)
+            )
+            connection.execute(
+                "DELETE FROM contract_entries WHERE code_hash = ?", (code_hash,)
+            )
+
+    def bulk_import(
+        self,
+        addresses: Iterable[Dict] = (),
+        contracts: Iterable[Dict] = (),
+        signatures: Iterable[Dict] = (),
+        bytecodes: Iterable[Dict] = (),
+    ) -> None:
+        """Write records, e.g. read from MongoDB collections, in batches of one
+        transaction each. Existing records are replaced."""
+        connection = self._connection
+
+        for batch in batches(addresses):
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO addresses (chain_id, address, record) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (
+                            address["chain_id"],
+                            address["address"],
+                            address_record(address),
+                        )
+                        for address in batch
+                    ],
+                )
+
+        for batch in batches(contracts):
+            with connection:
+                connection.executemany(
+                    "DELETE FROM contract_entries WHERE code_hash = ?",
+                    [(contract["code_hash"],) for contract in batch],
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO contracts (code_hash, record) VALUES (?, ?)",
+                    [
+                        (contract["code_hash"], contract_record(contract))
+                        for contract in batch
+                    ],
+                )
+                connection.executemany(
+                    "INSERT INTO contract_entries (code_hash, part, signature, entry) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        entry
+                        for contract in batch
+                        for entry in contract_entries(contract)
+                    ],
+                )
+
+        for batch in batches(signatures):
+            with connection:
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO signatures ({SIGNATURE_COLUMNS}) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [signature_row(signature) for signature in batch],
+                )
+
+        for batch in batches(bytecodes):
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO bytecodes (code_hash, bytecode) VALUES (?, ?)",
+                    [
+                        (bytecode["code_hash"], bytes(bytecode["bytecode"]))
+                        for bytecode in batch
+                    ],
+                )
+
+    @property
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+
+        return connection
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            connection = sqlite3.connect(
+                f"file:{quote(self.path)}?mode=ro", uri=True, check_same_thread=False
+            )
+        else:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            # readers are not blocked by a writer
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+
+        return connection
+
+    def _is_read_only(self, write: str) -> bool:
+        if self.read_only:
+            log.debug("Read-only semantics database %s, %s skipped.", self.path, write)
+
+        return self.read_only
+
+
+def placeholders(values: Iterable) -> str:
+    return ", ".join("?" for _ in values)
+
+
+def batches(records: Iterable[Any], size: int = IMPORT_BATCH_SIZE) -> Iterator[List]:
+    records = iter(records)
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+
+def address_record(address: Dict) -> str:
+    return json.dumps({key: value for key, value in address.items() if key != "_id"})
+
+
+def contract_record(contract: Dict) -> str:
+    # entries are stored in their own rows
+    return json.dumps(
+        {
+            key: value
+            for key, value in contract.items()
+            if key != "_id" and key not in CONTRACT_PARTS
+        }
+    )
+
+
+def contract_entries(contract: Dict) -> List[Tuple[str, str, str, str]]:
+    return [
+        (contract["code_hash"], part, signature, json.dumps(entry))
+        for part in CONTRACT_PARTS
+        for signature, entry in (contract.get(part) or {}).items()
+    ]
+
+
+def signature_row(signature: Dict) -> Tuple:
+    return (
+        signature["signature_hash"],
+        signature["name"],
+        get_arg_types(signature["args"]),
+        json.dumps(signature["args"]),
+        signature.get("tuple", False),
+        signature.get("guessed", False),
+        signature.get("count", 1),
+    )
+
+
+def signature_record(row: Tuple) -> Dict:
+    signature_hash, name, arg_types, args, is_tuple, guessed, count = row
+    return {
+        "signature_hash": signature_hash,
+        "name": name,
+        "arg_types": arg_types,
+        "args": json.loads(args),
+        "tuple": bool(is_tuple),
+        "guessed": bool(guessed),
+        "count": count,
+    }
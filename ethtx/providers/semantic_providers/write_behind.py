@@ -0,0 +1,257 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, PyMongoError
+
+log = logging.getLogger(__name__)
+
+WRITE_BEHIND_SIZE = 500
+WRITE_BEHIND_INTERVAL = 1.0
+WRITE_BEHIND_MAX_RETRIES = 5
+WRITE_BEHIND_MAX_BACKOFF = 60.0
+
+
+class WriteBehindQueue:
+    """Buffers writes to Mongo collections and sends them with one `bulk_write` per
+    collection when `flush_size` writes are pending, every `flush_interval` seconds
+    and on close. Pending writes of one document are coalesced to the last one, and
+    the document written is served by `get_pending` until it is stored.
+
+    Writes failing on a Mongo error are queued again and retried with an exponential
+    backoff, up to `max_retries` times. Writes which are rejected by the server (e.g.
+    invalid documents) or out of retries are dropped, counted in `dropped` and passed
+    to `on_drop` with the error."""
+
+    def __init__(
+        self,
+        flush_size: int = WRITE_BEHIND_SIZE,
+        flush_interval: float = WRITE_BEHIND_INTERVAL,
+        max_retries: int = WRITE_BEHIND_MAX_RETRIES,
+        on_drop: Optional[Callable[[Collection, List, Exception], None]] = None,
+    ):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.on_drop = on_drop
+
+        self.retried = 0
+        self.dropped = 0
+        self._failures = 0
+        self._retry_at = 0.0
+
+        # (operation, document, attempts) entries by collection name and key
+        self._pending: Dict[str, Tuple[Collection, "OrderedDict[Hashable, tuple]"]] = {}
+        # batches taken by a flush, readable until they are written
+        self._writing: Dict[str, "OrderedDict[Hashable, tuple]"] = {}
+        self._size = 0
+        self._closed = False
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+        self._thread = threading.Thread(
+            target=self._run, name="ethtx-write-behind", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(
+        self,
+        collection: Collection,
+        operation,
+        key: Optional[Hashable] = None,
+        document: Optional[Dict] = None,
+    ) -> None:
+        """Queue a write of the `document` identified by `key` in the collection, writes
+        without a key (e.g. increments) are never coalesced."""
+        if self._closed:
+            failed, error = self._write(collection, [operation])
+            if failed:
+                self._drop(collection, [operation], error)
+            return
+
+        with self._lock:
+            _, operations = self._pending.setdefault(
+                collection.full_name, (collection, OrderedDict())
+            )
+            if key is None:
+                key = object()
+            if operations.pop(key, None) is None:
+                self._size += 1
+            operations[key] = (operation, document, 0)
+
+            if self._size >= self.flush_size:
+                self._wakeup.set()
+
+    def is_pending(self, collection: Collection, key: Hashable) -> bool:
+        with self._lock:
+            return self._find(collection, key) is not None
+
+    def get_pending(self, collection: Collection, key: Hashable) -> Optional[Dict]:
+        """Document of the last write of the key which is not stored yet."""
+        with self._lock:
+            entry = self._find(collection, key)
+            return entry[1] if entry is not None else None
+
+    def flush(self, collection: Optional[Collection] = None) -> None:
+        """Write pending operations of one collection, or of all of them."""
+        with self._flush_lock:
+            with self._lock:
+                if collection is None:
+                    batches = list(self._pending.values())
+                    self._pending.clear()
+                elif collection.full_name in self._pending:
+                    batches = [self._pending.pop(collection.full_name)]
+                else:
+                    return
+                self._size -= sum(len(operations) for _, operations in batches)
+                for collection_, operations in batches:
+                    self._writing[collection_.full_name] = operations
+
+            failed = False
+            try:
+                for collection_, operations in batches:
+                    entries = list(operations.items())
+                    failed_indexes, error = self._write(
+                        collection_, [entry[0] for _, entry in entries]
+                    )
+                    if failed_indexes:
+                        failed = True
+                        self._retry(
+                            collection_, [entries[i] for i in failed_indexes], error
+                        )
+            finally:
+                with self._lock:
+                    self._writing.clear()
+
+            self._failures = self._failures + 1 if failed else 0
+            if failed:
+                # consecutive failures double the wait, e.g. while Mongo is unreachable
+                self._retry_at = time.monotonic() + min(
+                    self.flush_interval * 2**self._failures, WRITE_BEHIND_MAX_BACKOFF
+                )
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._wakeup.set()
+            self._thread.join()
+        self.flush()
+
+        # writes which failed on close have no later flush to be retried in
+        with self._lock:
+            batches = list(self._pending.values())
+            self._pending.clear()
+            self._size = 0
+        for collection, operations in batches:
+            self._drop(
+                collection,
+                [entry[0] for entry in operations.values()],
+                PyMongoError("write-behind queue closed"),
+            )
+
+    def _find(self, collection: Collection, key: Hashable) -> Optional[tuple]:
+        pending = self._pending.get(collection.full_name)
+        if pending is not None and key in pending[1]:
+            return pending[1][key]
+
+        writing = self._writing.get(collection.full_name)
+        if writing is not None and key in writing:
+            return writing[key]
+
+        return None
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if time.monotonic() >= self._retry_at:
+                self.flush()
+
+    def _retry(
+        self,
+        collection: Collection,
+        entries: List[Tuple[Hashable, tuple]],
+        error: Exception,
+    ) -> None:
+        dropped = []
+        with self._lock:
+            _, operations = self._pending.setdefault(
+                collection.full_name, (collection, OrderedDict())
+            )
+            for key, (operation, document, attempts) in entries:
+                if attempts >= self.max_retries:
+                    dropped.append(operation)
+                elif key not in operations:
+                    # a write queued meanwhile supersedes the failed one
+                    operations[key] = (operation, document, attempts + 1)
+                    operations.move_to_end(key, last=False)
+                    self._size += 1
+                    self.retried += 1
+
+        if dropped:
+            self._drop(collection, dropped, error)
+
+    def _drop(self, collection: Collection, operations: List, error: Exception) -> None:
+        if not operations:
+            return
+
+        self.dropped += len(operations)
+        log.error(
+            "Dropped %d operations writing to %s: %s",
+            len(operations),
+            collection.full_name,
+            error,
+        )
+        if self.on_drop is not None:
+            self.on_drop(collection, operations, error)
+
+    def _write(
+        self, collection: Collection, operations: List
+    ) -> Tuple[List[int], Optional[Exception]]:
+        """Indexes of the operations to retry, and the error they failed with."""
+        try:
+            # coalesced operations are independent of each other
+            collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # operations rejected by the server fail the same way when retried
+            self._drop(
+                collection,
+                [operations[error["index"]] for error in e.details["writeErrors"]],
+                e,
+            )
+        except PyMongoError as e:
+            log.warning(
+                "Writing %d operations to %s failed, retrying: %s",
+                len(operations),
+                collection.full_name,
+                e,
+            )
+            return list(range(len(operations))), e
+
+        return [], None
@@ -0,0 +1,285 @@
+# Copyright 2021 DAI FOUNDATION (the original version https://github.com/daifoundation/ethtx_ce)
+# Copyright 2021-2022 Token Flow Insights SA (modifications to the original software as recorded
+# in the changelog https://github.com/EthTx/ethtx/blob/master/CHANGELOG.md)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at: http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under the License is distributed
+# on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and limitations under the License.
+#
+# The product contains trademarks and other branding elements of Token Flow Insights SA which are
+# not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
+# the trademark and/or other branding elements.
+
+import os
+from functools import lru_cache
+from typing import Dict, List, Mapping, Optional, Tuple, Type
+
+from ..exceptions import ProcessingException
+from ..models.w3_model import W3CallTree
+
+TRACE_TIMEOUT = "60s"
+
+# precompiled contracts are skipped by the JS tracer, native tracers report them
+PRECOMPILES_RANGE = range(0x01, 0x12)
+
+
+@lru_cache(maxsize=1)
+def read_js_tracer() -> str:
+    with open(os.path.join(os.path.dirname(__file__), "static/tracer.js")) as f:
+        return f.read()
+
+
+def build_call_tree(
+    tx_hash: str, chain_id: str, raw_call: Mapping, skip_precompiles: bool = False
+) -> W3CallTree:
+    """Convert a nested geth call frame into W3CallTree."""
+
+    def prep_raw_dict(dct: Mapping):
+        dct = dict(dct)
+        dct["from_address"] = dct.pop("from", None)
+        dct["to_address"] = dct.pop("to", None)
+        dct["input"] = dct.pop("input", "0x")
+        dct["output"] = dct.pop("output", None) or "0x"
+        calls = dct.pop("calls", None) or []
+        if skip_precompiles:
+            calls = [call for call in calls if not is_precompile_call(call)]
+        return dct, calls
+
+    w3input, main_parent_calls = prep_raw_dict(raw_call)
+    main_parent = W3CallTree(tx_hash=tx_hash, chain_id=chain_id, **w3input)
+
+    tmp_call_tree = [{"parent": main_parent, "children": main_parent_calls}]
+    while len(tmp_call_tree) != 0:
+        new_call_tree = []
+
+        for pair in tmp_call_tree:
+            parent_call: W3CallTree = pair["parent"]
+            for child_call in pair["children"]:
+                w3input, child_child_calls = prep_raw_dict(child_call)
+                child = W3CallTree(tx_hash=tx_hash, chain_id=chain_id, **w3input)
+                parent_call.calls.append(child)
+
+                if child_child_calls:
+                    new_call_tree.append(
+                        {"parent": child, "children": child_child_calls}
+                    )
+
+        tmp_call_tree = new_call_tree
+
+    return main_parent
+
+
+def is_precompile_call(call: Mapping) -> bool:
+    to_address = call.get("to")
+    if not to_address or call.get("type", "").upper().startswith("CREATE"):
+        return False
+
+    return int(to_address, 16) in PRECOMPILES_RANGE
+
+
+class CallTracer:
+    """Source of call trees, builds node requests and parses their results."""
+
+    name: str
+
+    def transaction_request(self, tx_hash: str) -> Tuple[str, list]:
+        ...
+
+    def block_request(self, block_number: int) -> Tuple[str, list]:
+        ...
+
+    def parse_transaction(self, tx_hash: str, chain_id: str, result) -> W3CallTree:
+        ...
+
+    def parse_block(
+        self, tx_hashes: List[str], chain_id: str, result
+    ) -> List[W3CallTree]:
+        ...
+
+
+class DebugCallTracer(CallTracer):
+    """Base of tracers running through the geth `debug_` namespace."""
+
+    skip_precompiles: bool = False
+
+    def __init__(self, timeout: str = TRACE_TIMEOUT):
+        self.timeout = timeout
+
+    def tracer_options(self) -> dict:
+        ...
+
+    def transaction_request(self, tx_hash: str) -> Tuple[str, list]:
+        return "debug_traceTransaction", [tx_hash, self.tracer_options()]
+
+    def block_request(self, block_number: int) -> Tuple[str, list]:
+        return "debug_traceBlockByNumber", [hex(block_number), self.tracer_options()]
+
+    def parse_transaction(self, tx_hash: str, chain_id: str, result) -> W3CallTree:
+        return build_call_tree(tx_hash, chain_id, result, self.skip_precompiles)
+
+    def parse_block(
+        self, tx_hashes: List[str], chain_id: str, result
+    ) -> List[W3CallTree]:
+        if len(result) != len(tx_hashes):
+            raise ProcessingException(
+                f"block trace has {len(result)} results for {len(tx_hashes)} transactions"
+            )
+
+        calls = []
+        for tx_hash, trace in zip(tx_hashes, result):
+            if trace.get("error"):
+                raise ProcessingException(
+                    f"tracing of {tx_hash} failed: {trace['error']}"
+                )
+            calls.append(self.parse_transaction(tx_hash, chain_id, trace["result"]))
+
+        return calls
+
+
+class JSCallTracer(DebugCallTracer):
+    """The bundled JavaScript tracer, slow but supported by every geth version."""
+
+    name = "js"
+
+    def tracer_options(self) -> dict:
+        return {"tracer": read_js_tracer(), "timeout": self.timeout}
+
+
+class NativeCallTracer(DebugCallTracer):
+    """Geth's built-in `callTracer`, implemented in Go."""
+
+    name = "callTracer"
+
+    def __init__(self, timeout: str = TRACE_TIMEOUT, skip_precompiles: bool = True):
+        super().__init__(timeout)
+        self.skip_precompiles = skip_precompiles
+
+    def tracer_options(self) -> dict:
+        return {"tracer": "callTracer", "timeout": self.timeout}
+
+
+class ParityCallTracer(CallTracer):
+    """The `trace_` namespace of Erigon, Nethermind and OpenEthereum. Call trees
+    are rebuilt from flat traces using their `traceAddress`."""
+
+    name = "parity"
+
+    def __init__(self, skip_precompiles: bool = True):
+        self.skip_precompiles = skip_precompiles
+
+    def transaction_request(self, tx_hash: str) -> Tuple[str, list]:
+        return "trace_transaction", [tx_hash]
+
+    def block_request(self, block_number: int) -> Tuple[str, list]:
+        return "trace_block", [hex(block_number)]
+
+    def parse_transaction(self, tx_hash: str, chain_id: str, result) -> W3CallTree:
+        calls: Dict[tuple, W3CallTree] = {}
+
+        for trace in result:
+            raw_call = self._to_call_frame(trace)
+            trace_address = tuple(trace["traceAddress"])
+            if trace_address and self.skip_precompiles and is_precompile_call(raw_call):
+                continue
+
+            call = build_call_tree(tx_hash, chain_id, raw_call)
+            calls[trace_address] = call
+
+            if trace_address:
+                parent = calls.get(trace_address[:-1])
+                if parent is None:
+                    raise ProcessingException(
+                        f"missing parent of trace {list(trace_address)} in {tx_hash}"
+                    )
+                parent.calls.append(call)
+
+        if () not in calls:
+            raise ProcessingException(f"missing root trace of {tx_hash}")
+
+        return calls[()]
+
+    def parse_block(
+        self, tx_hashes: List[str], chain_id: str, result
+    ) -> List[W3CallTree]:
+        # block traces are flat and ordered by transaction, rewards have no hash
+        tx_traces: Dict[str, list] = {tx_hash.lower(): [] for tx_hash in tx_hashes}
+        for trace in result:
+            tx_hash = (trace.get("transactionHash") or "").lower()
+            if tx_hash in tx_traces:
+                tx_traces[tx_hash].append(trace)
+
+        return [
+            self.parse_transaction(tx_hash, chain_id, tx_traces[tx_hash.lower()])
+            for tx_hash in tx_hashes
+        ]
+
+    @staticmethod
+    def _to_call_frame(trace: Mapping) -> dict:
+        """Translate a flat trace into the geth call frame format."""
+        action = trace["action"]
+        result = trace.get("result") or {}
+
+        if trace["type"] == "create":
+            frame = {
+                "type": (action.get("creationMethod") or "create").upper(),
+                "from": action["from"],
+                "to": result.get("address"),
+                "value": action.get("value"),
+                "gas": action.get("gas"),
+                "input": action.get("init", "0x"),
+                "output": result.get("code"),
+            }
+        elif trace["type"] == "suicide":
+            frame = {
+                "type": "SELFDESTRUCT",
+                "from": action["address"],
+                "to": action.get("refundAddress"),
+                "value": action.get("balance"),
+                "input": "0x",
+            }
+        else:
+            frame = {
+                "type": action.get("callType", "call").upper(),
+                "from": action["from"],
+                "to": action.get("to"),
+                "value": action.get("value"),
+                "gas": action.get("gas"),
+                "input": action.get("input", "0x"),
+                "output": result.get("output"),
+            }
+
+        frame["gasUsed"] = result.get("gasUsed")
+        if trace.get("error"):
+            # geth reports reverts as "execution reverted"
+            frame["error"] = (
+                "execution reverted" if trace["error"] == "Reverted" else trace["error"]
+            )
+
+        return frame
+
+
+TRACERS: Dict[str, Type[CallTracer]] = {
+    JSCallTracer.name: JSCallTracer,
+    NativeCallTracer.name: NativeCallTracer,
+    ParityCallTracer.name: ParityCallTracer,
+}
+
+# supported by every geth version, faster tracers are opted in per node
+DEFAULT_TRACER = JSCallTracer.name
+
+
+def get_tracer(name: Optional[str] = None, **options) -> CallTracer:
+    name = name or DEFAULT_TRACER
+    if name not in TRACERS:
+        raise ProcessingException(
+            f"unknown tracer {name}, available: {', '.join(TRACERS)}"
+        )
+
+    try:
+        return TRACERS[name](**options)
+    except TypeError as e:
+        raise ProcessingException(f"invalid options of tracer {name}: {e}") from e
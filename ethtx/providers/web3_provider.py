@@ -15,24 +15,113 @@
 # the trademark and/or other branding elements.
 
 import logging
-import os
-from typing import List, Dict, Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Generator, List, Dict, Optional, Set, Tuple
 
+from eth_abi.exceptions import DecodingError
+from eth_utils.curried import apply_formatter_to_array
+from hexbytes import HexBytes
 from web3 import Web3
 from web3.datastructures import AttributeDict
+from web3._utils.method_formatters import PYTHONIC_RESULT_FORMATTERS
 from web3.middleware import geth_poa_middleware
 from web3.types import BlockData, TxData, TxReceipt, HexStr
 
-from .node import NodeConnectionPool
+from .node import NodeConnectionPool, NodePoolProvider
+from .node.provider import MAX_BATCH_SIZE
+from .bytecode_store import BytecodeStore, default_bytecode_store
+from .multicall import (
+    MULTICALL3_ADDRESS,
+    TOKEN_FIELDS,
+    decode_aggregate3,
+    decode_decimals,
+    decode_text,
+    encode_aggregate3,
+)
+from .node.connection_base import NodeConnection
+from .tracers import CallTracer, JSCallTracer, DEFAULT_TRACER, get_tracer
 from ..exceptions import NodeConnectionException, ProcessingException
-from ..models.objects_model import Transaction, BlockMetadata, TransactionMetadata, Call
+from ..models.objects_model import (
+    Transaction,
+    Block,
+    BlockMetadata,
+    TransactionMetadata,
+    Call,
+)
 from ..models.semantics_model import FunctionSemantics
 from ..models.w3_model import W3Block, W3Transaction, W3Receipt, W3CallTree, W3Log
 from ..semantics.standards import erc20
-from ..utils.cache_tools import cache
+from ..semantics.standards.eip1969 import read_proxy_implementations
+from ..utils.cache_tools import TTLCache, cached
 
 log = logging.getLogger(__name__)
 
+TOKEN_METADATA_CACHE_SIZE = 4096
+# node requests sent in the background, e.g. traces of a block
+NODE_MAX_WORKERS = 16
+
+RESULT_FORMATTERS = {
+    **PYTHONIC_RESULT_FORMATTERS,
+    "eth_getBlockReceipts": apply_formatter_to_array(
+        PYTHONIC_RESULT_FORMATTERS["eth_getTransactionReceipt"]
+    ),
+}
+
+
+def format_results(
+    requests: List[Tuple[str, list]], responses: List[dict]
+) -> List[AttributeDict]:
+    """Format JSON-RPC results the same way web3 formats them."""
+    results = []
+    for (method, params), response in zip(requests, responses):
+        if "error" in response:
+            raise ValueError(response["error"])
+        if response.get("result") is None:
+            raise ProcessingException(f"{method} returned no result for {params}")
+
+        formatter = RESULT_FORMATTERS.get(method)
+        result = response["result"]
+        results.append(
+            AttributeDict.recursive(formatter(result) if formatter else result)
+        )
+
+    return results
+
+
+def run_requests(steps: Generator, send: Callable[[Any], Any]) -> Any:
+    """Run a flow of node requests: each request it yields is sent and the flow is
+    resumed with its response, or the error raised by sending it. The blocking and
+    asyncio providers share flows and differ only in sending."""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = send(request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+async def run_requests_async(
+    steps: Generator, send: Callable[[Any], Awaitable[Any]]
+) -> Any:
+    """Asyncio counterpart of `run_requests`."""
+    try:
+        request = next(steps)
+        while True:
+            try:
+                response = await send(request)
+            except Exception as e:
+                request = steps.throw(e)
+            else:
+                request = steps.send(response)
+    except StopIteration as stop:
+        return stop.value
+
 
 def connect_chain(
     http_hook: str = None, ipc_hook: str = None, ws_hook: str = None, poa: bool = False
@@ -80,6 +169,11 @@ class NodeDataProvider:
     ) -> Transaction:
         ...
 
+    def get_full_block(
+        self, block_number: int, chain_id: Optional[str] = None
+    ) -> Block:
+        ...
+
     def get_calls(self, tx_hash: str, chain_id: Optional[str] = None) -> Call:
         ...
 
@@ -88,6 +182,22 @@ class NodeDataProvider:
     ) -> str:
         ...
 
+    def get_code(self, contract_address: str, chain_id: Optional[str] = None) -> bytes:
+        ...
+
+    def get_proxy_implementations(
+        self,
+        proxy_address: str,
+        chain_id: Optional[str] = None,
+        block_number: Optional[int] = None,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        ...
+
+    def get_tokens_metadata(
+        self, addresses: List[str], chain_id: Optional[str] = None
+    ) -> Dict[str, dict]:
+        ...
+
     def get_erc20_token(
         self,
         token_address: str,
@@ -110,9 +220,46 @@ class NodeDataProvider:
 class Web3Provider(NodeDataProvider):
     chain: Web3
 
-    def __init__(self, nodes: Dict[str, dict], default_chain=None):
+    def __init__(
+        self,
+        nodes: Dict[str, dict],
+        default_chain=None,
+        bytecode_store: Optional[BytecodeStore] = None,
+        max_workers: int = NODE_MAX_WORKERS,
+    ):
         super().__init__(default_chain)
         self.nodes = nodes
+        self.bytecode_store = bytecode_store or default_bytecode_store
+
+        # misconfigured tracers fail here instead of on the first trace
+        for node_params in nodes.values():
+            for name, options in node_params.get("tracer_options", {}).items():
+                get_tracer(name, **options)
+
+        self._pool = NodeConnectionPool(nodes=nodes)
+        self._connections: Dict[str, Web3] = {}
+        self._connections_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ethtx-node"
+        )
+        self._tracers: Dict[Tuple[str, str], CallTracer] = {}
+        # token metadata does not change, it is kept until evicted
+        self._token_metadata = TTLCache(
+            maxsize=TOKEN_METADATA_CACHE_SIZE, ttl=None, name="web3.token_metadata"
+        )
+        self._no_multicall: Set[str] = set()
+        # keyed by (chain_id, proxy, block), "latest" reads expire with the TTL
+        self.proxy_implementations = TTLCache(name="web3.proxy_implementations")
+
+    def __enter__(self) -> "Web3Provider":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Stop the threads sending node requests in the background."""
+        self._executor.shutdown(wait=True)
 
     def _get_node_connection(self, chain_id: Optional[str] = None) -> Web3:
         chain_id = chain_id or self.default_chain
@@ -127,150 +274,174 @@ class Web3Provider(NodeDataProvider):
                 "unknown chain_id, it must be defined in the EthTxConfig object"
             )
 
-        for connection in NodeConnectionPool(nodes=self.nodes).get_connection(
-            chain=chain_id
-        ):
-            w3 = connect_chain(http_hook=connection.url, poa=connection.poa)
+        w3 = self._connections.get(chain_id)
+        if w3 is not None:
+            return w3
+
+        with self._connections_lock:
+            w3 = self._connections.get(chain_id)
+            if w3 is None:
+                w3 = self._connect(chain_id)
+                self._connections[chain_id] = w3
+
+        return w3
+
+    def _connect(self, chain_id: str) -> Web3:
+        connections = self._pool.get_connection(chain=chain_id)
+        if not connections:
+            raise NodeConnectionException
+
+        # requests are balanced over all chain nodes, failing nodes are
+        # taken out of rotation by their circuit breakers
+        w3 = Web3(
+            NodePoolProvider(
+                pool=self._pool,
+                chain=chain_id,
+                max_batch_size=self.nodes[chain_id].get(
+                    "max_batch_size", MAX_BATCH_SIZE
+                ),
+            )
+        )
 
-            try:
-                if w3.is_connected():
-                    log.info(
-                        "Connected to: %s with latest block %s.",
-                        connection,
-                        w3.eth.block_number,
-                    )
-                    return w3
-                else:
-                    log.warning("Connection failed to: %s", connection)
-            except AssertionError:
-                log.warning(
-                    "Node is available, but RPC connection failed: %s", connection
-                )
+        # middleware injection for POA chains
+        if any(connection.poa for connection in connections):
+            w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+        log.info("Connected to: %s.", ", ".join(map(repr, connections)))
 
-        raise NodeConnectionException
+        return w3
 
     # get the raw block data from the node
-    @cache
+    @cached("web3.blocks")
     def get_block(self, block_number: int, chain_id: Optional[str] = None) -> W3Block:
         chain = self._get_node_connection(chain_id)
         raw_block: BlockData = chain.eth.get_block(block_number)
-        block = W3Block(
-            chain_id=chain_id or self.default_chain,
-            difficulty=raw_block.difficulty,
-            extraData=raw_block.get("extraData", None),
-            gasLimit=raw_block.gasLimit,
-            gasUsed=raw_block.gasUsed,
-            hash=raw_block.hash,
-            logsBloom=raw_block.logsBloom,
-            miner=raw_block.miner,
-            nonce=raw_block.get("nonce", 0),
-            number=raw_block.number,
-            parentHash=raw_block.parentHash,
-            receiptsRoot=raw_block.receiptsRoot,
-            sha3Uncles=raw_block.sha3Uncles,
-            size=raw_block.size,
-            stateRoot=raw_block.stateRoot,
-            timestamp=raw_block.timestamp,
-            totalDifficulty=raw_block.totalDifficulty,
-            transactions=raw_block.transactions,
-            transactionsRoot=raw_block.transactionsRoot,
-            uncles=raw_block.uncles,
-        )
 
-        return block
+        return self._create_block(raw_block, chain_id or self.default_chain)
 
     # get the raw transaction data from the node
-    @cache
+    @cached("web3.transactions")
     def get_transaction(
         self, tx_hash: str, chain_id: Optional[str] = None
     ) -> W3Transaction:
         chain = self._get_node_connection(chain_id)
         raw_tx: TxData = chain.eth.get_transaction(HexStr(tx_hash))
-        transaction = W3Transaction(
-            chain_id=chain_id or self.default_chain,
-            blockHash=raw_tx.blockHash,
-            blockNumber=raw_tx.blockNumber,
-            from_address=raw_tx["from"],
-            gas=raw_tx.gas,
-            gasPrice=raw_tx.gasPrice,
-            hash=raw_tx.hash,
-            input=raw_tx.input,
-            nonce=raw_tx.nonce,
-            r=raw_tx.r,
-            s=raw_tx.s,
-            to=raw_tx.to,
-            transactionIndex=raw_tx.transactionIndex,
-            v=raw_tx.v,
-            value=raw_tx.value,
-        )
 
-        return transaction
+        return self._create_transaction(raw_tx, chain_id or self.default_chain)
 
-    @cache
+    @cached("web3.receipts")
     def get_receipt(self, tx_hash: str, chain_id: Optional[str] = None) -> W3Receipt:
         chain = self._get_node_connection(chain_id)
         raw_receipt: TxReceipt = chain.eth.get_transaction_receipt(tx_hash)
-        _root = raw_receipt.root if hasattr(raw_receipt, "root") else None
-
-        _logs = [
-            W3Log(
-                tx_hash=tx_hash,
-                chain_id=chain_id or self.default_chain,
-                address=_log.address,
-                blockHash=_log.blockHash,
-                blockNumber=_log.blockNumber,
-                data=Web3.to_hex(_log.data),
-                logIndex=_log.logIndex,
-                removed=_log.removed,
-                topics=_log.topics,
-                transactionHash=_log.transactionHash,
-                transactionIndex=_log.transactionIndex,
-            )
-            for _log in raw_receipt.logs
-        ]
 
-        receipt = W3Receipt(
-            tx_hash=tx_hash,
-            chain_id=chain_id or self.default_chain,
-            blockHash=raw_receipt.blockHash,
-            blockNumber=raw_receipt.blockNumber,
-            contractAddress=raw_receipt.contractAddress,
-            cumulativeGasUsed=raw_receipt.cumulativeGasUsed,
-            from_address=raw_receipt["from"],
-            gasUsed=raw_receipt.gasUsed,
-            logs=_logs,
-            logsBloom=raw_receipt.logsBloom,
-            root=_root,
-            status=raw_receipt.get("status", True),
-            to_address=raw_receipt.to,
-            transactionHash=raw_receipt.transactionHash,
-            transactionIndex=raw_receipt.transactionIndex,
+        return self._create_receipt(
+            tx_hash, chain_id or self.default_chain, raw_receipt
         )
 
-        return receipt
-
     def get_calls(self, tx_hash: str, chain_id: Optional[str] = None) -> W3CallTree:
-        # tracer is a temporary fixed implementation of geth tracer
-        chain = self._get_node_connection(chain_id)
-        tracer = self._get_custom_calls_tracer()
-        response = chain.manager.request_blocking(
-            "debug_traceTransaction", [tx_hash, {"tracer": tracer, "timeout": "60s"}]
+        chain_id = chain_id or self.default_chain
+        tracer, result = self._trace(
+            chain_id, lambda tracer: tracer.transaction_request(tx_hash)
         )
 
-        return self._create_call_from_debug_trace_tx(
-            tx_hash, chain_id or self.default_chain, response
-        )
+        return tracer.parse_transaction(tx_hash, chain_id, result)
 
     # get the contract bytecode hash from the node
-    @cache
+    @cached("web3.code_hashes")
     def get_code_hash(
         self, contract_address: str, chain_id: Optional[str] = None
     ) -> str:
-        chain = self._get_node_connection(chain_id)
-        byte_code = chain.eth.get_code(Web3.to_checksum_address(contract_address[-40:]))
-        code_hash = Web3.keccak(byte_code).hex()
+        code_hash, _ = self._read_code(contract_address, chain_id)
         return code_hash
 
+    # get the contract bytecode, read from the node once for every purpose
+    def get_code(self, contract_address: str, chain_id: Optional[str] = None) -> bytes:
+        _, byte_code = self._read_code(contract_address, chain_id)
+        return byte_code
+
+    def _read_code(
+        self, contract_address: str, chain_id: Optional[str] = None
+    ) -> Tuple[str, bytes]:
+        chain_id = chain_id or self.default_chain
+        address = "0x" + contract_address[-40:].lower()
+
+        code = self.bytecode_store.get(chain_id, address)
+        if code is not None:
+            return code
+
+        chain = self._get_node_connection(chain_id)
+        byte_code = bytes(chain.eth.get_code(Web3.to_checksum_address(address)))
+        code_hash = self.bytecode_store.put(chain_id, address, byte_code)
+
+        return code_hash, byte_code
+
+    # get implementations of an EIP-1967 proxy: stored in its slot and returned by its beacon,
+    # none when the slots cannot be read
+    def get_proxy_implementations(
+        self,
+        proxy_address: str,
+        chain_id: Optional[str] = None,
+        block_number: Optional[int] = None,
+    ) -> Tuple[Optional[str], Optional[str]]:
+        chain_id = chain_id or self.default_chain
+        key = (chain_id, proxy_address.lower(), block_number)
+
+        implementations = self.proxy_implementations.get(key)
+        if implementations is None:
+            implementations = self._read_proxy_implementations(
+                proxy_address, chain_id, block_number
+            )
+            if implementations is None:
+                # failed reads are not cached
+                return None, None
+            self.proxy_implementations.set(key, implementations)
+
+        return implementations
+
+    def _read_proxy_implementations(
+        self, proxy_address: str, chain_id: str, block_number: Optional[int]
+    ) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        return run_requests(
+            read_proxy_implementations(proxy_address, block_number),
+            lambda requests: self._batch_request(chain_id, requests),
+        )
+
+    # read name, symbol and decimals of many tokens with a single call
+    def get_tokens_metadata(
+        self, addresses: List[str], chain_id: Optional[str] = None
+    ) -> Dict[str, dict]:
+        chain_id = chain_id or self.default_chain
+
+        metadata = {}
+        missing = []
+        for address in dict.fromkeys(addresses):
+            cached = self._token_metadata.get((chain_id, address))
+            if cached is None:
+                missing.append(address)
+            else:
+                metadata[address] = cached
+
+        if missing:
+            calls = [
+                (address, selector)
+                for address in missing
+                for selector in TOKEN_FIELDS.values()
+            ]
+            results, failed = self._call_many(chain_id, calls)
+            for i, address in enumerate(missing):
+                name, symbol, decimals = results[3 * i : 3 * i + 3]
+                metadata[address] = dict(
+                    name=decode_text(name),
+                    symbol=decode_text(symbol),
+                    decimals=decode_decimals(decimals),
+                )
+                # results of calls failed on a node error are not known, only cached
+                # metadata is read from calls which returned or reverted
+                if failed.isdisjoint(range(3 * i, 3 * i + 3)):
+                    self._token_metadata.set((chain_id, address), metadata[address])
+
+        return metadata
+
     # get the erc20 token data from the node
     def get_erc20_token(
         self,
@@ -279,74 +450,35 @@ class Web3Provider(NodeDataProvider):
         functions: Dict[str, FunctionSemantics],
         chain_id: Optional[str] = None,
     ):
-        name_abi = symbol_abi = decimals_abi = ""
-
-        if functions:
-            for function in functions.values():
-                if (
-                    function.name == "name"
-                    and len(function.inputs) == 0
-                    and len(function.outputs) == 1
-                ):
-                    name_type = function.outputs[0].parameter_type
-                    name_abi = (
-                        '{"name":"name", "constant":true, "payable":false, "type":"function", '
-                        ' "inputs":[], "outputs":[{"name":"","type":"%s"}]}' % name_type
-                    )
-
-                elif (
-                    function.name == "symbol"
-                    and len(function.inputs) == 0
-                    and len(function.outputs) == 1
-                ):
-                    symbol_type = function.outputs[0].parameter_type
-                    symbol_abi = (
-                        '{"name":"symbol", "constant":true, "payable":false,"type":"function", '
-                        ' "inputs":[], "outputs":[{"name":"","type":"%s"}]}'
-                        % symbol_type
-                    )
-
-                elif (
-                    function.name in ["decimals", "dec"]
-                    and len(function.inputs) == 0
-                    and len(function.outputs) == 1
-                ):
-                    decimals_type = function.outputs[0].parameter_type
-                    decimals_abi = (
-                        '{"name":"decimals", "constant":true, "payable":false,"type":"function", '
-                        ' "inputs":[], "outputs":[{"name":"","type":"%s"}]}'
-                        % decimals_type
-                    )
-
-        abi = f'[{",".join([name_abi, symbol_abi, decimals_abi])}]'
-
-        try:
-            chain = self._get_node_connection(chain_id)
-            token = chain.eth.contract(
-                address=Web3.to_checksum_address(token_address), abi=abi
+        def has_getter(*names: str) -> bool:
+            return any(
+                function.name in names
+                and len(function.inputs) == 0
+                and len(function.outputs) == 1
+                for function in (functions or {}).values()
             )
-            name = token.functions.name().call() if name_abi else contract_name
-            if isinstance(name, bytes):
-                name = name.decode("utf-8").replace("\x00", "")
-
-            symbol = token.functions.symbol().call() if symbol_abi else contract_name
-            if isinstance(symbol, bytes):
-                symbol = symbol.decode("utf-8").replace("\x00", "")
 
-            decimals = token.functions.decimals().call() if decimals_abi else 18
+        try:
+            metadata = self.get_tokens_metadata([token_address], chain_id)[
+                token_address
+            ]
         except Exception:
-            name = symbol = contract_name
-            decimals = 18
+            metadata = dict(name=None, symbol=None, decimals=None)
+
+        name = metadata["name"] if has_getter("name") else None
+        symbol = metadata["symbol"] if has_getter("symbol") else None
+        decimals = metadata["decimals"] if has_getter("decimals", "dec") else None
 
-        return dict(address=token_address, symbol=symbol, name=name, decimals=decimals)
+        return dict(
+            address=token_address,
+            symbol=symbol if symbol is not None else contract_name,
+            name=name if name is not None else contract_name,
+            decimals=decimals if decimals is not None else 18,
+        )
 
     # guess if the contract is and erc20 token and get the data
     def guess_erc20_token(self, contract_address, chain_id: Optional[str] = None):
-        chain = self._get_node_connection(chain_id)
-
-        byte_code = chain.eth.get_code(
-            Web3.to_checksum_address(contract_address[-40:])
-        ).hex()
+        byte_code = self.get_code(contract_address, chain_id).hex()
 
         if all(
             "63" + signature[2:] in byte_code
@@ -362,168 +494,353 @@ class Web3Provider(NodeDataProvider):
                 erc20.erc20_approval_event.signature,
             )
         ):
-            name_abi = (
-                '{"name":"name", "constant":true, "payable":false,'
-                ' "type":"function", "inputs":[], "outputs":[{"name":"","type":"string"}]}'
-            )
-            symbol_abi = (
-                '{"name":"symbol", "constant":true, "payable":false,'
-                '"type":"function", "inputs":[], "outputs":[{"name":"","type":"string"}]}'
-            )
-            decimals_abi = (
-                '{"name":"decimals", "constant":true, "payable":false,'
-                '"type":"function",  "inputs":[], "outputs":[{"name":"","type":"uint8"}]}'
+            metadata = self._get_token_metadata(
+                contract_address, chain_id, ("name", "symbol", "decimals")
             )
-
-            abi = f'[{",".join([name_abi, symbol_abi, decimals_abi])}]'
-
-            try:
-                token = chain.eth.contract(
-                    address=Web3.to_checksum_address(contract_address), abi=abi
-                )
-                name = token.functions.name().call()
-                symbol = token.functions.symbol().call()
-                decimals = token.functions.decimals().call()
-
-                return dict(
-                    address=contract_address,
-                    symbol=symbol,
-                    name=name,
-                    decimals=decimals,
-                )
-
-            except Exception:
-                pass
+            if metadata:
+                return dict(address=contract_address, **metadata)
 
         return None
 
     # guess if the contract is and erc20 token proxy and get the data
-    @cache
+    @cached("web3.erc20_proxies")
     def guess_erc20_proxy(self, contract_address, chain_id: Optional[str] = None):
-        chain = self._get_node_connection(chain_id)
+        return self._get_token_metadata(
+            contract_address, chain_id, ("name", "symbol", "decimals")
+        )
+
+    # guess if the contract is and erc721 token proxy and get the data
+    @cached("web3.erc721_proxies")
+    def guess_erc721_proxy(self, contract_address, chain_id: Optional[str] = None):
+        return self._get_token_metadata(contract_address, chain_id, ("name", "symbol"))
+
+    def _get_token_metadata(
+        self, contract_address: str, chain_id: Optional[str], fields: Tuple[str, ...]
+    ) -> Optional[dict]:
+        """Token metadata, when the contract implements all the fields."""
+        try:
+            metadata = self.get_tokens_metadata([contract_address], chain_id)[
+                contract_address
+            ]
+        except Exception:
+            return None
+
+        if any(metadata[field] is None for field in fields):
+            return None
 
-        name_abi = (
-            '{"name":"name", "constant":true, "payable":false,'
-            ' "type":"function", "inputs":[], "outputs":[{"name":"","type":"string"}]}'
+        return {field: metadata[field] for field in fields}
+
+    @cached("web3.full_transactions")
+    def get_full_transaction(self, tx_hash: str, chain_id: Optional[str] = None):
+        # the node traces the transaction while the rest of the data is read
+        w3calltree = self._executor.submit(self.get_calls, tx_hash, chain_id)
+
+        raw_tx, raw_receipt = self._batch_request(
+            chain_id,
+            [
+                ("eth_getTransactionByHash", [tx_hash]),
+                ("eth_getTransactionReceipt", [tx_hash]),
+            ],
         )
-        symbol_abi = (
-            '{"name":"symbol", "constant":true, "payable":false,'
-            '"type":"function", "inputs":[], "outputs":[{"name":"","type":"string"}]}'
+        w3transaction = self._create_transaction(raw_tx, chain_id or self.default_chain)
+        w3receipt = self._create_receipt(
+            tx_hash, chain_id or self.default_chain, raw_receipt
         )
-        decimals_abi = (
-            '{"name":"decimals", "constant":true, "payable":false,'
-            '"type":"function",  "inputs":[], "outputs":[{"name":"","type":"uint8"}]}'
+
+        # warm up the block cache, the decoder reads the block right after the transaction
+        self.get_block(w3transaction.blockNumber, chain_id)
+
+        return Transaction.from_raw(
+            w3transaction=w3transaction,
+            w3receipt=w3receipt,
+            w3calltree=w3calltree.result(),
         )
 
-        abi = f'[{",".join([name_abi, symbol_abi, decimals_abi])}]'
+    def get_full_block(
+        self, block_number: int, chain_id: Optional[str] = None
+    ) -> Block:
+        chain_id = chain_id or self.default_chain
+
+        # the node traces the whole block while the rest of the data is read
+        traces = self._executor.submit(
+            self._trace, chain_id, lambda tracer: tracer.block_request(block_number)
+        )
 
+        get_block = ("eth_getBlockByNumber", [hex(block_number), True])
         try:
-            token = chain.eth.contract(
-                address=Web3.to_checksum_address(contract_address), abi=abi
+            raw_block, raw_receipts = self._batch_request(
+                chain_id, [get_block, ("eth_getBlockReceipts", [hex(block_number)])]
+            )
+        except (ValueError, ProcessingException):
+            # eth_getBlockReceipts is not supported by every node, receipts of the
+            # transactions are then read in batches of at most `max_batch_size` requests
+            (raw_block,) = self._batch_request(chain_id, [get_block])
+            raw_receipts = self._batch_request(
+                chain_id,
+                [
+                    ("eth_getTransactionReceipt", [raw_tx.hash.hex()])
+                    for raw_tx in raw_block.transactions
+                ],
             )
-            name = token.functions.name().call()
-            symbol = token.functions.symbol().call()
-            decimals = token.functions.decimals().call()
 
-            return dict(symbol=symbol, name=name, decimals=decimals)
+        w3block = self._create_block(
+            AttributeDict(
+                {
+                    **raw_block,
+                    "transactions": [raw_tx.hash for raw_tx in raw_block.transactions],
+                }
+            ),
+            chain_id,
+        )
 
-        except Exception:
-            pass
+        tx_hashes = [raw_tx.hash.hex() for raw_tx in raw_block.transactions]
+        tracer, result = traces.result()
+        w3calltrees = tracer.parse_block(tx_hashes, chain_id, result)
 
-        return None
+        w3transactions = [
+            (
+                self._create_transaction(raw_tx, chain_id),
+                self._create_receipt(tx_hash, chain_id, raw_receipt),
+                w3calltree,
+            )
+            for raw_tx, tx_hash, raw_receipt, w3calltree in zip(
+                raw_block.transactions, tx_hashes, raw_receipts, w3calltrees
+            )
+        ]
 
-    # guess if the contract is and erc721 token proxy and get the data
-    @cache
-    def guess_erc721_proxy(self, contract_address, chain_id: Optional[str] = None):
-        chain = self._get_node_connection(chain_id)
+        return Block.from_raw(
+            chain_id=chain_id, w3block=w3block, w3transactions=w3transactions
+        )
+
+    def _get_tracer(self, connection: NodeConnection) -> CallTracer:
+        key = (connection.chain, connection.url)
+        tracer = self._tracers.get(key)
+        if tracer is None:
+            # options are given per tracer name, e.g. {"parity": {"skip_precompiles": False}}
+            name = connection.tracer or DEFAULT_TRACER
+            tracer_options = self.nodes[connection.chain].get("tracer_options", {})
+            tracer = get_tracer(name, **tracer_options.get(name, {}))
+            self._tracers[key] = tracer
 
-        name_abi = (
-            '{"name":"name", "constant":true, "payable":false,'
-            ' "type":"function", "inputs":[], "outputs":[{"name":"","type":"string"}]}'
+        return tracer
+
+    def _trace(
+        self,
+        chain_id: str,
+        build_request: Callable[[CallTracer], Tuple[str, list]],
+    ) -> Tuple[CallTracer, Any]:
+        """Send a trace request built by the tracer of the node serving it."""
+        provider: NodePoolProvider = self._get_node_connection(chain_id).provider
+
+        return run_requests(
+            self._trace_requests(build_request),
+            lambda request: provider.make_node_request(*request),
         )
-        symbol_abi = (
-            '{"name":"symbol", "constant":true, "payable":false,'
-            '"type":"function", "inputs":[], "outputs":[{"name":"","type":"string"}]}'
+
+    def _trace_requests(
+        self, build_request: Callable[[CallTracer], Tuple[str, list]]
+    ) -> Generator:
+        """Flow of a trace, yields (request builder, node) pairs for `make_node_request`.
+        Nodes rejecting their configured tracer are switched to the bundled JS tracer.
+        """
+        connection, response = yield (
+            lambda node: build_request(self._get_tracer(node)),
+            None,
         )
+        tracer = self._get_tracer(connection)
 
-        abi = f'[{",".join([name_abi, symbol_abi])}]'
+        if "error" in response:
+            if isinstance(tracer, JSCallTracer):
+                raise ValueError(response["error"])
 
-        try:
-            token = chain.eth.contract(
-                address=Web3.to_checksum_address(contract_address), abi=abi
+            log.warning(
+                "%s tracer failed on %s (%s), falling back to the JS tracer.",
+                tracer.name,
+                connection,
+                response["error"],
             )
-            name = token.functions.name().call()
-            symbol = token.functions.symbol().call()
+            tracer = JSCallTracer()
+            _, response = yield lambda _: build_request(tracer), connection
+            if "error" in response:
+                raise ValueError(response["error"])
+            self._tracers[(connection.chain, connection.url)] = tracer
+
+        return tracer, response["result"]
+
+    def _call_many(
+        self, chain_id: str, calls: List[Tuple[str, str]]
+    ) -> Tuple[List[Optional[bytes]], Set[int]]:
+        """Results of (address, call data) calls, aggregated into a single Multicall3
+        call. Failed calls are returned as None, with the indexes of the calls which
+        failed on a node error instead of reverting."""
+        if chain_id not in self._no_multicall:
+            multicall_address = self.nodes[chain_id].get(
+                "multicall", MULTICALL3_ADDRESS
+            )
+            request = {"to": multicall_address, "data": encode_aggregate3(calls)}
+            try:
+                (result,) = self._batch_request(
+                    chain_id, [("eth_call", [request, "latest"])]
+                )
+                return decode_aggregate3(result), set()
+            except (ValueError, ProcessingException, DecodingError) as e:
+                # only a missing contract disables it, other errors may be transient
+                if self._is_multicall_missing(e):
+                    log.info(
+                        "Multicall3 is not available on %s (%s), calls are batched.",
+                        chain_id,
+                        e,
+                    )
+                    self._no_multicall.add(chain_id)
+                else:
+                    log.warning(
+                        "Multicall3 call failed on %s (%s), calls are batched.",
+                        chain_id,
+                        e,
+                    )
 
-            return dict(symbol=symbol, name=name)
+        # without Multicall3 all the calls still go in one JSON-RPC batch
+        provider: NodePoolProvider = self._get_node_connection(chain_id).provider
+        responses = provider.make_batch_request(
+            [
+                ("eth_call", [{"to": address, "data": data}, "latest"])
+                for address, data in calls
+            ]
+        )
 
-        except Exception:
-            pass
+        failed = {
+            i
+            for i, response in enumerate(responses)
+            if "error" in response and not self._is_revert(response["error"])
+        }
+        results = [
+            HexBytes(response["result"])
+            if response.get("result") not in (None, "0x")
+            else None
+            for response in responses
+        ]
 
-        return None
+        return results, failed
 
-    @cache
-    def get_full_transaction(self, tx_hash: str, chain_id: Optional[str] = None):
-        w3transaction = self.get_transaction(tx_hash, chain_id)
-        w3receipt = self.get_receipt(tx_hash, chain_id)
-        w3calltree = self.get_calls(tx_hash, chain_id)
+    @staticmethod
+    def _is_revert(error: Any) -> bool:
+        # geth reports reverts with code 3, other nodes only in the message
+        if isinstance(error, dict):
+            return (
+                error.get("code") == 3 or "revert" in str(error.get("message")).lower()
+            )
+        return "revert" in str(error).lower()
 
-        return Transaction.from_raw(
-            w3transaction=w3transaction, w3receipt=w3receipt, w3calltree=w3calltree
-        )
+    @staticmethod
+    def _is_multicall_missing(error: Exception) -> bool:
+        """A call to an address without code returns no data, and one to a contract
+        without `aggregate3` reverts."""
+        if isinstance(error, DecodingError):
+            return True
 
-    def _get_custom_calls_tracer(self):
-        return open(os.path.join(os.path.dirname(__file__), "static/tracer.js")).read()
-
-    def _create_call_from_debug_trace_tx(
-        self, tx_hash: str, chain_id: str, input_rpc: AttributeDict
-    ) -> W3CallTree:
-        def prep_raw_dict(dct: [AttributeDict, Dict]):
-            if not isinstance(dct, dict):
-                dct = dct.__dict__
-            dct["from_address"] = dct.pop("from", None)
-            dct["to_address"] = dct.pop("to", None)
-            dct["input"] = dct.pop("input", "0x")
-            dct["output"] = dct.pop("output", "0x")
-            calls = dct.pop("calls", [])
-            return dct, calls
-
-        obj = input_rpc.__dict__
-        tmp_call_tree = []
-
-        w3input, main_parent_calls = prep_raw_dict(obj)
-        main_parent = W3CallTree(tx_hash=tx_hash, chain_id=chain_id, **w3input)
-        for main_parent_call in main_parent_calls:
-            w3input, main_parent_calls = prep_raw_dict(main_parent_call)
-            main_parent_child = W3CallTree(
-                tx_hash=tx_hash, chain_id=chain_id, **w3input
-            )
-            main_parent.calls.append(main_parent_child)
-            if len(main_parent_calls) > 0:
-                tmp_call_tree.append(
-                    {"parent": main_parent_child, "children": main_parent_calls}
-                )
+        return isinstance(error, ValueError) and "revert" in str(error).lower()
+
+    def _batch_request(
+        self, chain_id: Optional[str], requests: List[Tuple[str, list]]
+    ) -> List[AttributeDict]:
+        """Send requests as a single JSON-RPC batch, when the node provider supports it."""
+        if not requests:
+            return []
+
+        chain = self._get_node_connection(chain_id)
 
-        while len(tmp_call_tree) != 0:
-            new_call_tree = []
+        if isinstance(chain.provider, NodePoolProvider):
+            responses = chain.provider.make_batch_request(requests)
+        else:
+            responses = [
+                chain.provider.make_request(method, params)
+                for method, params in requests
+            ]
 
-            for pair in tmp_call_tree:
-                parent_call: W3CallTree = pair["parent"]
-                child_calls: List = pair["children"]
+        return format_results(requests, responses)
 
-                if child_calls is not None:
-                    for child_call in child_calls:
-                        w3input, child_child_call = prep_raw_dict(child_call)
-                        child = W3CallTree(
-                            tx_hash=tx_hash, chain_id=chain_id, **w3input
-                        )
-                        parent_call.calls.append(child)
+    @staticmethod
+    def _create_block(raw_block: BlockData, chain_id: str) -> W3Block:
+        return W3Block(
+            chain_id=chain_id,
+            difficulty=raw_block.difficulty,
+            extraData=raw_block.get("extraData", None),
+            gasLimit=raw_block.gasLimit,
+            gasUsed=raw_block.gasUsed,
+            hash=raw_block.hash,
+            logsBloom=raw_block.logsBloom,
+            miner=raw_block.miner,
+            nonce=raw_block.get("nonce", 0),
+            number=raw_block.number,
+            parentHash=raw_block.parentHash,
+            receiptsRoot=raw_block.receiptsRoot,
+            sha3Uncles=raw_block.sha3Uncles,
+            size=raw_block.size,
+            stateRoot=raw_block.stateRoot,
+            timestamp=raw_block.timestamp,
+            totalDifficulty=raw_block.totalDifficulty,
+            transactions=raw_block.transactions,
+            transactionsRoot=raw_block.transactionsRoot,
+            uncles=raw_block.uncles,
+        )
 
-                        if len(child_call) > 0:
-                            new_call_tree.append(
-                                {"parent": child, "children": child_child_call}
-                            )
+    @staticmethod
+    def _create_transaction(raw_tx: TxData, chain_id: str) -> W3Transaction:
+        return W3Transaction(
+            chain_id=chain_id,
+            blockHash=raw_tx.blockHash,
+            blockNumber=raw_tx.blockNumber,
+            from_address=raw_tx["from"],
+            gas=raw_tx.gas,
+            gasPrice=raw_tx.gasPrice,
+            hash=raw_tx.hash,
+            input=raw_tx.input,
+            nonce=raw_tx.nonce,
+            r=raw_tx.r,
+            s=raw_tx.s,
+            to=raw_tx.to,
+            transactionIndex=raw_tx.transactionIndex,
+            v=raw_tx.v,
+            value=raw_tx.value,
+        )
 
-            tmp_call_tree = new_call_tree
+    @staticmethod
+    def _create_receipt(
+        tx_hash: str, chain_id: str, raw_receipt: TxReceipt
+    ) -> W3Receipt:
+        _root = raw_receipt.root if hasattr(raw_receipt, "root") else None
 
-        return main_parent
+        _logs = [
+            W3Log(
+                tx_hash=tx_hash,
+                chain_id=chain_id,
+                address=_log.address,
+                blockHash=_log.blockHash,
+                blockNumber=_log.blockNumber,
+                data=Web3.to_hex(_log.data),
+                logIndex=_log.logIndex,
+                removed=_log.removed,
+                topics=_log.topics,
+                transactionHash=_log.transactionHash,
+                transactionIndex=_log.transactionIndex,
+            )
+            for _log in raw_receipt.logs
+        ]
+
+        return W3Receipt(
+            tx_hash=tx_hash,
+            chain_id=chain_id,
+            blockHash=raw_receipt.blockHash,
+            blockNumber=raw_receipt.blockNumber,
+            contractAddress=raw_receipt.contractAddress,
+            cumulativeGasUsed=raw_receipt.cumulativeGasUsed,
+            from_address=raw_receipt["from"],
+            gasUsed=raw_receipt.gasUsed,
+            logs=_logs,
+            logsBloom=raw_receipt.logsBloom,
+            root=_root,
+            status=raw_receipt.get("status", True),
+            to_address=raw_receipt.to,
+            transactionHash=raw_receipt.transactionHash,
+            transactionIndex=raw_receipt.transactionIndex,
+        )
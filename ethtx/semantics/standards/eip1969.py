@@ -14,58 +14,73 @@
 # not licensed under the Apache 2.0 license. When using or reproducing the code, please remove
 # the trademark and/or other branding elements.
 
+import logging
+from typing import Generator, List, Optional, Tuple
+
 from web3 import Web3
 
-from ethtx.utils.cache_tools import cache
+from ethtx.exceptions import NodeConnectionException, ProcessingException
 
+log = logging.getLogger(__name__)
 
-@cache
-def is_eip1969_proxy(chain, delegator, delegate):
-    implementation_slot = hex(
-        int(Web3.keccak(text="eip1967.proxy.implementation").hex(), 16) - 1
-    )
-    try:
-        implementation = (
-            "0x"
-            + chain.eth.get_storage_at(
-                Web3.to_checksum_address(delegator), implementation_slot
-            ).hex()[-40:]
-        )
-        return implementation == delegate
-    except:
-        return False
-
-
-@cache
-def is_eip1969_beacon_proxy(chain, delegator, delegate):
-    ibeacon_abi = """[
-                        {
-                            "inputs": [],
-                            "name": "implementation",
-                            "outputs": [
-                                {
-                                    "internalType": "address",
-                                    "name": "",
-                                    "type": "address"
-                                }
-                            ],
-                            "stateMutability": "view",
-                            "type": "function"
-                        }
-                    ]"""
-
-    beacon_slot = hex(int(Web3.keccak(text="eip1967.proxy.beacon").hex(), 16) - 1)
+EIP1967_IMPLEMENTATION_SLOT = hex(
+    int(Web3.keccak(text="eip1967.proxy.implementation").hex(), 16) - 1
+)
+EIP1967_BEACON_SLOT = hex(int(Web3.keccak(text="eip1967.proxy.beacon").hex(), 16) - 1)
+# IBeacon.implementation()
+BEACON_IMPLEMENTATION_SELECTOR = "0x5c60da1b"
+ZERO_ADDRESS = "0x" + "0" * 40
+
+
+def proxy_slots_requests(delegator: str, block: str) -> List[Tuple[str, list]]:
+    """Requests reading both EIP-1967 slots of a proxy."""
+    address = Web3.to_checksum_address(delegator)
+    return [
+        ("eth_getStorageAt", [address, EIP1967_IMPLEMENTATION_SLOT, block]),
+        ("eth_getStorageAt", [address, EIP1967_BEACON_SLOT, block]),
+    ]
+
+
+def beacon_implementation_request(beacon: str, block: str) -> Tuple[str, list]:
+    return "eth_call", [{"to": beacon, "data": BEACON_IMPLEMENTATION_SELECTOR}, block]
+
+
+def to_address(value: bytes) -> Optional[str]:
+    """Address stored in a storage slot or returned by a call, None if empty."""
+    address = "0x" + bytes(value).hex()[-40:]
+    return address if len(address) == 42 and address != ZERO_ADDRESS else None
+
+
+def read_proxy_implementations(
+    delegator: str, block_number: Optional[int] = None
+) -> Generator[
+    List[Tuple[str, list]], list, Optional[Tuple[Optional[str], Optional[str]]]
+]:
+    """Flow reading the implementation stored in the slot of a proxy and returned by
+    its beacon, yields batches of requests and is resumed with their results. It
+    returns None when the slots cannot be read, e.g. from a node without the
+    historical state."""
+    block = hex(block_number) if block_number is not None else "latest"
+
+    # both slots are read in one batch
     try:
-        beacon = (
-            "0x"
-            + chain.eth.get_storage_at(
-                Web3.to_checksum_address(delegator), beacon_slot
-            ).hex()[-40:]
-        )
-        beacon = chain.eth.contract(
-            address=Web3.to_checksum_address(beacon), abi=ibeacon_abi
-        )
-        implementation = beacon.functions.implementation().call()
-        return implementation == Web3.to_checksum_address(delegate)
-    except:
-        return False
+        implementation_slot, beacon_slot = yield proxy_slots_requests(delegator, block)
+    except (ValueError, ProcessingException, NodeConnectionException) as e:
+        log.warning("Cannot read proxy slots of %s: %s", delegator, e)
+        return None
+
+    implementation = to_address(implementation_slot)
+    beacon = to_address(beacon_slot)
+
+    beacon_implementation = None
+    if beacon:
+        try:
+            (result,) = yield [beacon_implementation_request(beacon, block)]
+            beacon_implementation = to_address(result)
+        except (ValueError, ProcessingException):
+            log.debug("%s is not a beacon of %s.", beacon, delegator)
+        except NodeConnectionException as e:
+            log.warning("Cannot call beacon %s of %s: %s", beacon, delegator, e)
+            return None
+
+    return implementation, beacon_implementation
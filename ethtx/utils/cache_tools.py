@@ -15,17 +15,256 @@
 # the trademark and/or other branding elements.
 
 import os
-from functools import WRAPPER_ASSIGNMENTS, wraps, lru_cache
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from functools import WRAPPER_ASSIGNMENTS, update_wrapper, wraps
+from typing import Any, Callable, Dict, Hashable, Optional
 
 CACHE_SIZE = int(os.environ.get("CACHE_SIZE", 256))
+CACHE_TTL = float(os.environ.get("CACHE_TTL", 300))
 
+# sizes and TTLs of named caches, set with `configure_cache`
+CACHE_CONFIG: Dict[str, Dict[str, Any]] = {}
 
-def cache(func, cache_size: int = CACHE_SIZE):
-    @lru_cache(maxsize=cache_size)
-    def wrapper(*args, **kwargs):
-        return func(*args, **kwargs)
+# all the named caches, several instances may share a name
+_caches: "weakref.WeakSet[TTLCache]" = weakref.WeakSet()
+
+
+class TTLCache:
+    """Bounded, thread-safe LRU cache with entries expiring after `ttl` seconds (never
+    with None). It counts hits, misses and evictions, and loads missing values once
+    for concurrent callers."""
+
+    def __init__(
+        self,
+        maxsize: int = CACHE_SIZE,
+        ttl: Optional[float] = CACHE_TTL,
+        name: Optional[str] = None,
+    ):
+        config = CACHE_CONFIG.get(name, {})
+        self.name = name
+        self.maxsize = config.get("maxsize", maxsize)
+        self.ttl = config.get("ttl", ttl)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._loading: Dict[Hashable, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+        if name is not None:
+            _caches.add(self)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            return value
+
+    def get_or_load(
+        self, key: Hashable, load: Callable[[], Any], cache_none: bool = True
+    ) -> Any:
+        """Cached value of the key, concurrent misses of one key call `load` once."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            loading = self._loading.setdefault(key, threading.RLock())
+
+        with loading:
+            with self._lock:
+                value = self._lookup(key)
+            if value is _MISSING:
+                try:
+                    value = load()
+                    if value is not None or cache_none:
+                        self.set(key, value)
+                finally:
+                    with self._lock:
+                        self._loading.pop(key, None)
+
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry[0] if entry else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            return _MISSING
+
+        self._entries.move_to_end(key)
+        return value
+
+
+def configure_cache(
+    name: str, maxsize: Optional[int] = None, ttl: Optional[float] = None
+) -> None:
+    """Set the size and/or TTL of a named cache, including its existing instances."""
+    config = CACHE_CONFIG.setdefault(name, {})
+    if maxsize is not None:
+        config["maxsize"] = maxsize
+    if ttl is not None:
+        config["ttl"] = ttl
+
+    for cache_ in list(_caches):
+        if cache_.name == name:
+            cache_.maxsize = config.get("maxsize", cache_.maxsize)
+            cache_.ttl = config.get("ttl", cache_.ttl)
 
-    return wrapper
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Counters of all the named caches, summed over their instances."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for cache_ in list(_caches):
+        cache_stats = cache_.stats()
+        if cache_.name not in stats:
+            stats[cache_.name] = cache_stats
+        else:
+            for counter in ("hits", "misses", "evictions", "size"):
+                stats[cache_.name][counter] += cache_stats[counter]
+
+    return stats
+
+
+class cached:
+    """Cache results of a method in a named TTLCache of its instance (or of a function
+    in one TTLCache), keyed by the call arguments. Calls with unhashable arguments are
+    not cached, nor are None results with `cache_none=False`. Bound methods get
+    `invalidate(*args, **kwargs)` and `cache_clear()`."""
+
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        maxsize: int = CACHE_SIZE,
+        ttl: Optional[float] = None,
+        cache_none: bool = True,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_none = cache_none
+
+    def __call__(self, func: Callable) -> "CachedFunction":
+        return CachedFunction(
+            func,
+            self.name or func.__qualname__,
+            self.maxsize,
+            self.ttl,
+            self.cache_none,
+        )
+
+
+class CachedFunction:
+    def __init__(
+        self,
+        func: Callable,
+        name: str,
+        maxsize: int,
+        ttl: Optional[float],
+        cache_none: bool = True,
+    ):
+        update_wrapper(self, func)
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.cache_none = cache_none
+        self._attribute = f"_cache_{func.__name__}"
+        self._cache: Optional[TTLCache] = None
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return BoundCachedFunction(self, instance)
+
+    def __call__(self, *args, **kwargs):
+        if self._cache is None:
+            self._cache = TTLCache(self.maxsize, self.ttl, self.name)
+        return _call_cached(
+            self._cache, self.__wrapped__, args, kwargs, self.cache_none
+        )
+
+    def get_cache(self, instance) -> TTLCache:
+        cache_ = instance.__dict__.get(self._attribute)
+        if cache_ is None:
+            cache_ = TTLCache(self.maxsize, self.ttl, self.name)
+            instance.__dict__[self._attribute] = cache_
+        return cache_
+
+
+class BoundCachedFunction:
+    def __init__(self, function: CachedFunction, instance):
+        self._function = function
+        self._instance = instance
+        self.__wrapped__ = function.__wrapped__.__get__(instance)
+        self.__name__ = function.__name__
+
+    @property
+    def cache(self) -> TTLCache:
+        return self._function.get_cache(self._instance)
+
+    def __call__(self, *args, **kwargs):
+        return _call_cached(
+            self.cache, self.__wrapped__, args, kwargs, self._function.cache_none
+        )
+
+    def invalidate(self, *args, **kwargs) -> None:
+        """Drop the cached result of a call with these arguments."""
+        self.cache.pop(_make_key(args, kwargs))
+
+    def cache_clear(self) -> None:
+        self.cache.clear()
+
+
+def cache(func, cache_size: int = CACHE_SIZE):
+    return cached(maxsize=cache_size)(func)
 
 
 def ignore_unhashable(func):
@@ -43,3 +282,26 @@ def ignore_unhashable(func):
 
     wrapper.__uncached__ = uncached
     return wrapper
+
+
+def _make_key(args: tuple, kwargs: dict) -> Hashable:
+    return (args, tuple(sorted(kwargs.items()))) if kwargs else args
+
+
+def _call_cached(
+    cache_: TTLCache,
+    func: Callable,
+    args: tuple,
+    kwargs: dict,
+    cache_none: bool = True,
+) -> Any:
+    key = _make_key(args, kwargs)
+    try:
+        hash(key)
+    except TypeError:
+        return func(*args, **kwargs)
+
+    return cache_.get_or_load(key, lambda: func(*args, **kwargs), cache_none)
+
+
+_MISSING = object()
@@ -0,0 +1,39 @@
+"""Compare call tracers on a node.
+
+Usage: python scripts/benchmark_tracers.py NODE_URL TX_HASH [TX_HASH ...]
+"""
+import statistics
+import sys
+import time
+
+from ethtx.providers.tracers import TRACERS
+from ethtx.providers.web3_provider import Web3Provider
+
+ROUNDS = 3
+
+
+def benchmark(node_url, tx_hashes):
+    for name in TRACERS:
+        provider = Web3Provider(
+            nodes={"mainnet": {"hook": node_url, "poa": False, "tracer": name}},
+            default_chain="mainnet",
+        )
+        timings = []
+        for _ in range(ROUNDS):
+            for tx_hash in tx_hashes:
+                start = time.perf_counter()
+                provider.get_calls(tx_hash)
+                timings.append(time.perf_counter() - start)
+
+        print(
+            f"{name:>12}: median {statistics.median(timings) * 1000:.1f} ms, "
+            f"total {sum(timings):.2f} s over {len(timings)} traces"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+
+    benchmark(sys.argv[1], sys.argv[2:])
@@ -0,0 +1,38 @@
+"""Export semantics of the most used addresses to a snapshot file, loaded by new
+workers with `EthTxConfig(semantics_snapshot=...)`.
+
+Usage: python scripts/export_semantics_snapshot.py CONNECTION_STRING PATH [--limit N] [--days K]
+"""
+import argparse
+
+from pymongo import MongoClient
+
+from ethtx.providers.semantic_providers import (
+    MongoSemanticsDatabase,
+    SQLiteSemanticsDatabase,
+)
+from ethtx.providers.semantic_providers.snapshot import export_snapshot
+
+
+def export(connection_string, path, limit, days):
+    if connection_string.startswith("sqlite:"):
+        database = SQLiteSemanticsDatabase.from_url(connection_string)
+    else:
+        database = MongoSemanticsDatabase(MongoClient(connection_string).get_database())
+
+    exported = export_snapshot(database, path, limit=limit, days=days)
+    print(
+        f"Exported {exported['addresses']} addresses, {exported['contracts']} "
+        f"contracts and {exported['signatures']} signatures to {path}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("connection_string")
+    parser.add_argument("path")
+    parser.add_argument("--limit", type=int, help="number of the most used addresses")
+    parser.add_argument("--days", type=int, help="addresses used in the last days")
+    args = parser.parse_args()
+
+    export(args.connection_string, args.path, args.limit, args.days)
@@ -0,0 +1,37 @@
+"""Copy semantics stored in MongoDB to a SQLite file, e.g. shipped read-only with
+batch workers (`sqlite:///semantics.db?mode=ro`).
+
+Usage: python scripts/export_sqlite_semantics.py MONGO_CONNECTION_STRING SQLITE_PATH
+"""
+import sys
+import time
+
+from pymongo import MongoClient
+
+from ethtx.providers.semantic_providers import SQLiteSemanticsDatabase
+from ethtx.providers.semantic_providers.const import MongoCollections
+
+
+def export(mongo_connection_string, sqlite_path):
+    mongo_db = MongoClient(mongo_connection_string).get_database()
+    database = SQLiteSemanticsDatabase(sqlite_path)
+
+    start = time.perf_counter()
+    database.bulk_import(
+        addresses=mongo_db[MongoCollections.ADDRESSES].find(),
+        contracts=mongo_db[MongoCollections.CONTRACTS].find(),
+        signatures=mongo_db[MongoCollections.SIGNATURES].find(),
+        bytecodes=mongo_db[MongoCollections.BYTECODES].find(),
+    )
+    database.pack()
+    database.close()
+
+    print(f"Exported to {sqlite_path} in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    export(sys.argv[1], sys.argv[2])
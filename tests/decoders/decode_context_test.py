@@ -0,0 +1,57 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ethtx.decoders.decode_context import decode_context, get_decode_context
+from ethtx.utils.async_tools import run_blocking
+from ..providers.semantic_providers.repository_test import (
+    ADDRESS_RECORD,
+    make_repository,
+)
+
+
+class TestDecodeContext:
+    def test_contexts_of_threads(self, mocker):
+        repository = make_repository(mocker)
+        repository.database.get_address_semantics.side_effect = (
+            lambda chain_id, address: {**ADDRESS_RECORD, "address": address}
+        )
+        barrier = threading.Barrier(2)
+        a, b, c = ("0x" + character * 40 for character in "abc")
+
+        def decode(addresses):
+            with decode_context() as context:
+                for address in addresses:
+                    repository.get_address_label("mainnet", address)
+                    barrier.wait()
+            return context.addresses
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            used = list(executor.map(decode, [[a, b], [c, a]]))
+
+        assert used == [[a, b], [c, a]]
+        assert get_decode_context() is None
+
+    def test_shared_with_blocking_calls(self):
+        async def decode():
+            with decode_context() as context:
+                await asyncio.gather(
+                    run_blocking(lambda: get_decode_context().use("mainnet", "0x1")),
+                    run_blocking(lambda: get_decode_context().use("mainnet", "0x2")),
+                )
+            return context
+
+        context = asyncio.run(decode())
+
+        assert sorted(context.addresses) == ["0x1", "0x2"]
+
+    def test_memoize(self, mocker):
+        load = mocker.Mock(return_value="label")
+
+        with decode_context() as context:
+            assert context.memoize("key", load) == "label"
+            assert context.memoize("key", load) == "label"
+        with decode_context() as context:
+            context.memoize("key", load)
+
+        assert load.call_count == 2
@@ -11,6 +11,11 @@ from ethtx.models.decoded_model import (
     Proxy,
     DecodedTransaction,
 )
+from ethtx.models.semantics_model import (
+    AddressSemantics,
+    ContractSemantics,
+    FunctionSemantics,
+)
 from tests.models.mock import DecodedModelMock, FAKE_TIME, ObjectModelMock
 
 
@@ -205,3 +210,27 @@ class TestDecodedModels:
         assert p.type == "type"
         assert p.semantics is None
         assert p.token is None
+        assert p.get_function_abi("0xa9059cbb") is None
+
+    def test_proxy_entries(self):
+        def delegate(name):
+            function = FunctionSemantics(signature="0xa9059cbb", name=name, inputs=[])
+            return AddressSemantics(
+                chain_id="mainnet",
+                address=name,
+                name=name,
+                is_contract=True,
+                contract=ContractSemantics(
+                    code_hash=name, name=name, functions={"0xa9059cbb": function}
+                ),
+            )
+
+        p = Proxy(
+            address="address",
+            name="name",
+            type="type",
+            semantics=[delegate("first"), delegate("second")],
+        )
+
+        assert p.get_function_abi("0xa9059cbb").name == "first"
+        assert p.get_event_abi("0xa9059cbb") is None
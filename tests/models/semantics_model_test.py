@@ -87,6 +87,32 @@ class TestSemanticsModels:
         assert cs.events == {}
         assert cs.functions == {}
         assert cs.transformations == {}
+        assert cs.anonymous_event is None
+        assert cs.constructor_abi is None
+
+    def test_contract_semantics_indexes(self):
+        event = EventSemantics(
+            signature="0x", anonymous=True, name="Log", parameters=[]
+        )
+        constructor = FunctionSemantics(
+            signature="constructor", name="constructor", inputs=[]
+        )
+        cs = ContractSemantics(
+            code_hash="0x",
+            name="name",
+            events={"0x": event},
+            functions={"constructor": constructor},
+        )
+
+        assert cs.anonymous_event is cs.events["0x"]
+        assert cs.constructor_abi is cs.constructor_abi
+        assert cs.constructor_abi.outputs[-1].parameter_name == "__create_output__"
+        assert cs.functions["constructor"].outputs == []
+
+        cs.events["0x1"] = event.copy(update={"signature": "0x1"})
+        assert cs.anonymous_event is cs.events["0x"]
+        cs.reset_indexes()
+        assert cs.anonymous_event is None
 
     def test_address_semantics(self):
         ads = AddressSemantics(
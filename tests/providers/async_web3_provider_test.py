@@ -0,0 +1,129 @@
+import asyncio
+
+from hexbytes import HexBytes
+
+from ethtx.providers.async_web3_provider import AsyncWeb3Provider
+from ethtx.providers.tracers import JSCallTracer
+from ethtx.providers.web3_provider import Web3Provider
+
+NODES = {"mainnet": {"hook": "http://a", "poa": False}}
+PROXY = "0x" + "1" * 40
+IMPLEMENTATION = "0x" + "2" * 40
+
+
+def async_return(mocker, value):
+    return mocker.AsyncMock(return_value=value)
+
+
+class TestAsyncWeb3Provider:
+    def test_full_transaction_reads_block_ahead(self, mocker):
+        provider = AsyncWeb3Provider(Web3Provider(nodes=NODES, default_chain="mainnet"))
+        batch_request = mocker.patch.object(
+            provider,
+            "_batch_request",
+            async_return(mocker, [mocker.Mock(), mocker.Mock()]),
+        )
+        transaction = mocker.patch.object(Web3Provider, "_create_transaction")
+        mocker.patch.object(Web3Provider, "_create_receipt")
+        mocker.patch.object(provider, "get_calls", async_return(mocker, None))
+        read_block = mocker.patch.object(
+            provider, "_read_block", async_return(mocker, "block")
+        )
+        mocker.patch("ethtx.providers.async_web3_provider.Transaction.from_raw")
+
+        async def decode():
+            await provider.get_full_transaction("0x01")
+            return await asyncio.gather(
+                provider.get_block(transaction.return_value.blockNumber),
+                provider.get_block(transaction.return_value.blockNumber),
+            )
+
+        assert asyncio.run(decode()) == ["block", "block"]
+        assert batch_request.await_count == 1
+        read_block.assert_called_once_with(
+            transaction.return_value.blockNumber, "mainnet"
+        )
+
+    def test_trace_cancelled_on_failure(self, mocker):
+        provider = AsyncWeb3Provider(Web3Provider(nodes=NODES, default_chain="mainnet"))
+        mocker.patch.object(
+            provider,
+            "_batch_request",
+            async_return(mocker, [mocker.Mock(), mocker.Mock()]),
+        )
+        mocker.patch.object(
+            Web3Provider, "_create_transaction", side_effect=ValueError("bad data")
+        )
+
+        async def get_calls(tx_hash, chain_id):
+            await asyncio.sleep(60)
+
+        mocker.patch.object(provider, "get_calls", get_calls)
+
+        async def decode():
+            try:
+                await provider.get_full_transaction("0x01")
+            except ValueError:
+                pending = asyncio.all_tasks() - {asyncio.current_task()}
+                await asyncio.wait_for(
+                    asyncio.gather(*pending, return_exceptions=True), 1
+                )
+                return [task.cancelled() for task in pending]
+
+        assert asyncio.run(decode()) == [True]
+
+    def test_code_hash_stored(self, mocker):
+        web3provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        provider = AsyncWeb3Provider(web3provider)
+        chain = mocker.Mock()
+        chain.eth.get_code = async_return(mocker, HexBytes("0x6080"))
+        mocker.patch.object(provider, "_get_node_connection", return_value=chain)
+
+        code_hash = asyncio.run(provider.get_code_hash(PROXY))
+
+        # the blocking provider reads it from the bytecode store
+        assert web3provider.get_code_hash(PROXY) == code_hash
+        assert chain.eth.get_code.await_count == 1
+
+    def test_proxy_implementations(self, mocker):
+        provider = AsyncWeb3Provider(Web3Provider(nodes=NODES, default_chain="mainnet"))
+        mocker.patch.object(
+            provider,
+            "_batch_request",
+            async_return(
+                mocker,
+                [HexBytes("0x" + "0" * 24 + "2" * 40), HexBytes("0x" + "0" * 64)],
+            ),
+        )
+
+        assert asyncio.run(provider.get_proxy_implementations(PROXY)) == (
+            IMPLEMENTATION,
+            None,
+        )
+
+    def test_native_tracer_falls_back_to_js(self, mocker):
+        nodes = {"mainnet": {**NODES["mainnet"], "tracer": "callTracer"}}
+        web3provider = Web3Provider(nodes=nodes, default_chain="mainnet")
+        provider = AsyncWeb3Provider(web3provider)
+        connection = web3provider._pool.connections[0]
+
+        async def make_node_request(build_request, node=None):
+            if build_request(connection)[1][1]["tracer"] == "callTracer":
+                return connection, {"error": {"message": "tracer not found"}}
+            return connection, {"result": {"type": "CALL"}}
+
+        mocker.patch.object(
+            provider._get_node_connection().provider,
+            "make_node_request",
+            side_effect=make_node_request,
+        )
+
+        tracer, result = asyncio.run(
+            provider._trace(
+                "mainnet", lambda tracer: tracer.transaction_request("0x01")
+            )
+        )
+
+        assert isinstance(tracer, JSCallTracer)
+        assert result == {"type": "CALL"}
+        assert web3provider._get_tracer(connection) is tracer
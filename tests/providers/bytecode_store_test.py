@@ -0,0 +1,49 @@
+from web3 import Web3
+
+from ethtx.providers.bytecode_store import BytecodeStore
+from ethtx.providers.semantic_providers.const import MongoCollections
+from ethtx.providers.web3_provider import Web3Provider
+
+ADDRESS = "0x" + "a" * 40
+BYTECODE = bytes.fromhex("6080604052")
+
+
+class TestBytecodeStore:
+    def test_put_and_get(self):
+        store = BytecodeStore()
+
+        code_hash = store.put("mainnet", ADDRESS.upper(), BYTECODE)
+
+        assert code_hash == Web3.keccak(BYTECODE).hex()
+        assert store.get("mainnet", ADDRESS) == (code_hash, BYTECODE)
+        assert store.get("goerli", ADDRESS) is None
+
+    def test_persisted_between_stores(self, mongo_semantics_database, mongo_db):
+        try:
+            code_hash = BytecodeStore(database=mongo_semantics_database).put(
+                "mainnet", ADDRESS, BYTECODE
+            )
+
+            store = BytecodeStore(database=mongo_semantics_database)
+            store.seed("mainnet", ADDRESS, code_hash)
+
+            assert store.get("mainnet", ADDRESS) == (code_hash, BYTECODE)
+        finally:
+            mongo_db.drop_collection(MongoCollections.BYTECODES)
+
+    def test_code_read_once(self, mocker):
+        provider = Web3Provider(
+            nodes={"mainnet": {"hook": "http://a", "poa": False}},
+            default_chain="mainnet",
+            bytecode_store=BytecodeStore(),
+        )
+        get_code = mocker.patch.object(
+            provider._get_node_connection().eth, "get_code", return_value=BYTECODE
+        )
+
+        code_hash = provider.get_code_hash(ADDRESS)
+
+        assert provider.guess_erc20_token(ADDRESS) is None
+        assert provider.get_code(ADDRESS) == BYTECODE
+        assert code_hash == Web3.keccak(BYTECODE).hex()
+        assert get_code.call_count == 1
@@ -0,0 +1,40 @@
+from eth_abi import decode, encode
+
+from ethtx.providers.multicall import (
+    AGGREGATE3_SELECTOR,
+    decode_aggregate3,
+    decode_decimals,
+    decode_text,
+    encode_aggregate3,
+)
+
+TOKEN = "0x" + "1" * 40
+
+
+class TestMulticall:
+    def test_encode_aggregate3(self):
+        data = bytes.fromhex(encode_aggregate3([(TOKEN, "0x06fdde03")])[2:])
+
+        assert data[:4] == AGGREGATE3_SELECTOR
+        ((address, allow_failure, call_data),) = decode(
+            ["(address,bool,bytes)[]"], data[4:]
+        )[0]
+        assert address.lower() == TOKEN
+        assert allow_failure
+        assert call_data == bytes.fromhex("06fdde03")
+
+    def test_decode_aggregate3(self):
+        data = encode(["(bool,bytes)[]"], [[(True, b"\x01"), (False, b"")]])
+
+        assert decode_aggregate3(data) == [b"\x01", None]
+
+    def test_decode_text(self):
+        assert decode_text(encode(["string"], ["Dai Stablecoin"])) == "Dai Stablecoin"
+        assert decode_text(b"MKR".ljust(32, b"\x00")) == "MKR"
+        assert decode_text(b"") is None
+        assert decode_text(b"\x01" * 40) is None
+
+    def test_decode_decimals(self):
+        assert decode_decimals(encode(["uint8"], [18])) == 18
+        assert decode_decimals(encode(["uint256"], [2**200])) is None
+        assert decode_decimals(None) is None
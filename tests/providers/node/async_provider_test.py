@@ -0,0 +1,56 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from ethtx.exceptions import NodeConnectionException
+from ethtx.providers.node.async_provider import AsyncNodePoolProvider
+from ethtx.providers.node.pool import NodeConnectionPool, OPEN
+
+GOERLI_CHAIN = {"goerli": {"hook": "http://a, http://b", "poa": False}}
+
+
+class TestAsyncNodePoolProvider:
+    def test_failover_to_next_node(self, mocker):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN, failure_threshold=1)
+        provider = AsyncNodePoolProvider(pool=pool, chain="goerli")
+        failing, healthy = pool.connections
+
+        async def post(connection, request_data):
+            if connection is failing:
+                raise aiohttp.ClientConnectionError
+            return b'{"jsonrpc": "2.0", "id": 0, "result": "0x1"}'
+
+        mocker.patch.object(pool, "get_connection", return_value=[failing, healthy])
+        mocker.patch.object(provider, "_post", side_effect=post)
+
+        response = asyncio.run(provider.make_request("eth_blockNumber", []))
+
+        assert response["result"] == "0x1"
+        assert pool.get_stats(failing).state == OPEN
+
+    def test_all_nodes_failing(self, mocker):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN)
+        provider = AsyncNodePoolProvider(pool=pool, chain="goerli")
+        mocker.patch.object(provider, "_post", side_effect=asyncio.TimeoutError)
+
+        with pytest.raises(NodeConnectionException):
+            asyncio.run(provider.make_request("eth_blockNumber", []))
+
+    def test_session_per_event_loop(self):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN)
+        provider = AsyncNodePoolProvider(pool=pool, chain="goerli")
+
+        async def get_session(close: bool):
+            session = provider._get_session()
+            assert provider._get_session() is session
+            if close:
+                await provider.close()
+            return session
+
+        first = asyncio.run(get_session(close=False))
+        second = asyncio.run(get_session(close=True))
+
+        assert first is not second
+        assert second.closed
+        assert provider._sessions == {}
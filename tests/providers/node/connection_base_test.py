@@ -21,4 +21,9 @@ class TestConnectionBase:
         assert str(self.connection) == representation
 
     def test_connection_dict(self):
-        assert dict(self.connection) == {"chain": CHAIN, "url": NODE, "poa": POA}
+        assert dict(self.connection) == {
+            "chain": CHAIN,
+            "url": NODE,
+            "poa": POA,
+            "tracer": None,
+        }
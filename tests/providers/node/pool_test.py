@@ -1,7 +1,10 @@
+import random
+from collections import Counter
+
 import pytest
 
 from ethtx.providers.node.connection_base import NodeConnection
-from ethtx.providers.node.pool import NodeConnectionPool
+from ethtx.providers.node.pool import NodeConnectionPool, CLOSED, OPEN, HALF_OPEN
 
 MAINNET_CHAIN = {"mainnet": {"hook": "a", "poa": True}}
 GOERLI_CHAIN = {"goerli": {"hook": "a, b, c", "poa": False}}
@@ -14,6 +17,15 @@ class TestNodeConnectionPool:
         pool = NodeConnectionPool(nodes=MAINNET_CHAIN)
         assert len(pool) == 1, "Number of connections should equal 1."
 
+    def test_node_params_read_by_key(self):
+        pool = NodeConnectionPool(
+            nodes={"mainnet": {"tracer": "js", "hook": "http://a", "poa": True}}
+        )
+
+        assert pool.connections[0].url == "http://a"
+        assert pool.connections[0].poa is True
+        assert pool.connections[0].tracer == "js"
+
     def test_add_connection(self):
         pool = NodeConnectionPool(nodes=MAINNET_CHAIN)
         pool.add_connection(connection=GOERLI_NODE)
@@ -35,3 +47,78 @@ class TestNodeConnectionPool:
         pool = NodeConnectionPool(nodes=MAINNET_CHAIN)
         with pytest.raises(ValueError):
             pool.add_connection((1, 1, 1))
+
+    def test_faster_nodes_get_more_requests(self, mocker):
+        mocker.patch("ethtx.providers.node.pool.time.monotonic", return_value=100.0)
+        random.seed(0)
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN)
+        a, b, c = pool.connections
+        pool.record_success(a, 0.5)
+        pool.record_success(b, 0.1)
+        pool.record_success(c, 0.12)
+
+        first = Counter(pool.get_connection("goerli")[0].url for _ in range(3000))
+        assert first["b"] > first["c"] > first["a"] > 0
+        assert 0.4 < first["c"] / first["b"] < 1.2
+
+        pool.get_stats(b).outstanding = 2
+        first = Counter(pool.get_connection("goerli")[0].url for _ in range(3000))
+        assert first["c"] > first["b"]
+
+    def test_stale_latency_probed(self, mocker):
+        monotonic = mocker.patch(
+            "ethtx.providers.node.pool.time.monotonic", return_value=100.0
+        )
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN, probe_interval=10.0)
+        a, b, c = pool.connections
+        pool.record_success(a, 5.0)
+        monotonic.return_value = 105.0
+        pool.record_success(b, 0.1)
+        pool.record_success(c, 0.1)
+
+        monotonic.return_value = 110.0
+        assert pool.get_connection("goerli")[0] == a
+
+        # a probe in flight is not repeated
+        pool.get_stats(a).outstanding = 1
+        assert pool.get_stats(a).score(110.0, pool.probe_interval) == 10.0
+
+    def test_ewma_latency(self):
+        pool = NodeConnectionPool(nodes=MAINNET_CHAIN, ewma_alpha=0.5)
+        connection = pool.connections[0]
+        pool.record_success(connection, 1.0)
+        pool.record_success(connection, 3.0)
+
+        assert pool.get_stats(connection).latency == 2.0
+
+    def test_circuit_breaker(self, mocker):
+        monotonic = mocker.patch(
+            "ethtx.providers.node.pool.time.monotonic", return_value=100.0
+        )
+        pool = NodeConnectionPool(
+            nodes=GOERLI_CHAIN, failure_threshold=2, reset_timeout=10.0
+        )
+        a, b, c = pool.connections
+        pool.record_success(b, 0.1)
+        pool.record_success(c, 0.2)
+        pool.record_failure(a)
+        assert pool.get_stats(a).state == CLOSED
+
+        pool.record_failure(a)
+        assert pool.get_stats(a).state == OPEN
+        assert pool.get_connection("goerli")[-1] == a
+
+        # after the reset timeout a single probe is allowed
+        monotonic.return_value = 110.0
+        assert pool.get_connection("goerli")[0] == a
+        with pytest.raises(ValueError):
+            with pool.track(a):
+                assert pool.get_stats(a).state == HALF_OPEN
+                assert pool.get_connection("goerli")[-1] == a
+                raise ValueError
+        assert pool.get_stats(a).state == OPEN
+
+        monotonic.return_value = 120.0
+        with pool.track(a):
+            pass
+        assert pool.get_stats(a).state == CLOSED
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+import requests
+
+from ethtx.exceptions import NodeConnectionException
+from ethtx.providers.node.pool import NodeConnectionPool, OPEN
+from ethtx.providers.node.provider import NodePoolProvider
+
+GOERLI_CHAIN = {"goerli": {"hook": "http://a, http://b", "poa": False}}
+
+
+def rpc_response(mocker, content):
+    response = mocker.MagicMock()
+    response.content = json.dumps(content).encode()
+    return response
+
+
+class TestNodePoolProvider:
+    def test_failover_to_next_node(self, mocker):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN, failure_threshold=1)
+        provider = NodePoolProvider(pool=pool, chain="goerli")
+        failing, healthy = pool.connections
+
+        def post(url, data, **kwargs):
+            if url == failing.url:
+                raise requests.ConnectionError
+            request = json.loads(data)
+            return rpc_response(
+                mocker, {"jsonrpc": "2.0", "id": request["id"], "result": "0x1"}
+            )
+
+        mocker.patch.object(pool, "get_connection", return_value=[failing, healthy])
+        mocker.patch("requests.Session.post", side_effect=post)
+
+        assert provider.make_request("eth_blockNumber", [])["result"] == "0x1"
+        assert pool.get_stats(failing).state == OPEN
+
+    def test_all_nodes_failing(self, mocker):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN)
+        provider = NodePoolProvider(pool=pool, chain="goerli")
+        mocker.patch("requests.Session.post", side_effect=requests.ConnectionError)
+
+        with pytest.raises(NodeConnectionException):
+            provider.make_request("eth_blockNumber", [])
+
+    def test_batch_request(self, mocker):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN)
+        provider = NodePoolProvider(pool=pool, chain="goerli")
+
+        def post(url, data, **kwargs):
+            batch = json.loads(data)
+            return rpc_response(
+                mocker,
+                [
+                    {"jsonrpc": "2.0", "id": request["id"], "result": request["method"]}
+                    for request in reversed(batch)
+                ],
+            )
+
+        post_mock = mocker.patch("requests.Session.post", side_effect=post)
+        responses = provider.make_batch_request(
+            [
+                ("eth_getTransactionByHash", ["0x1"]),
+                ("eth_getTransactionReceipt", ["0x1"]),
+            ]
+        )
+
+        assert post_mock.call_count == 1
+        assert [response["result"] for response in responses] == [
+            "eth_getTransactionByHash",
+            "eth_getTransactionReceipt",
+        ]
+
+    def test_batch_split_into_chunks(self, mocker):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN)
+        provider = NodePoolProvider(pool=pool, chain="goerli", max_batch_size=2)
+
+        def post(url, data, **kwargs):
+            batch = json.loads(data)
+            assert len(batch) <= 2
+            return rpc_response(
+                mocker,
+                [
+                    {"jsonrpc": "2.0", "id": request["id"], "result": request["params"]}
+                    for request in batch
+                ],
+            )
+
+        post_mock = mocker.patch("requests.Session.post", side_effect=post)
+        responses = provider.make_batch_request(
+            [("eth_getTransactionReceipt", [str(i)]) for i in range(5)]
+        )
+
+        assert post_mock.call_count == 3
+        assert [response["result"] for response in responses] == [
+            [str(i)] for i in range(5)
+        ]
+
+    def test_rejected_batch(self, mocker):
+        pool = NodeConnectionPool(nodes=GOERLI_CHAIN)
+        provider = NodePoolProvider(pool=pool, chain="goerli")
+        error = {"code": -32600, "message": "batch too large"}
+        mocker.patch(
+            "requests.Session.post",
+            return_value=rpc_response(
+                mocker, {"jsonrpc": "2.0", "id": None, "error": error}
+            ),
+        )
+
+        with pytest.raises(ValueError, match="batch too large"):
+            provider.make_batch_request([("eth_blockNumber", [])])
+
+    def test_node_request_built_per_node(self, mocker):
+        pool = NodeConnectionPool(
+            nodes={
+                "goerli": {"hook": "http://a, http://b", "poa": False, "tracer": "js"}
+            }
+        )
+        provider = NodePoolProvider(pool=pool, chain="goerli")
+        first, second = pool.connections
+
+        def post(url, data, **kwargs):
+            request = json.loads(data)
+            return rpc_response(
+                mocker,
+                {"jsonrpc": "2.0", "id": request["id"], "result": request["method"]},
+            )
+
+        mocker.patch("requests.Session.post", side_effect=post)
+
+        connection, response = provider.make_node_request(
+            lambda node: (f"{node.tracer}_{node.url[-1]}", []), connection=second
+        )
+
+        assert connection is second
+        assert response["result"] == "js_b"
@@ -0,0 +1,321 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ethtx.decoders.decode_context import decode_context
+from ethtx.models.decoded_model import Proxy
+from ethtx.models.semantics_model import AddressSemantics
+from ethtx.providers.semantic_providers.repository import SemanticsRepository
+
+ADDRESS = "0x" + "a" * 40
+CODE_HASH = "0x" + "c" * 64
+
+ADDRESS_RECORD = {
+    "chain_id": "mainnet",
+    "address": ADDRESS,
+    "name": "Token",
+    "is_contract": True,
+    "contract": CODE_HASH,
+    "standard": None,
+    "erc20": None,
+}
+CONTRACT_RECORD = {
+    "code_hash": CODE_HASH,
+    "name": "Token",
+    "events": {},
+    "functions": {
+        "constructor": {
+            "name": "constructor",
+            "inputs": [],
+            "outputs": [],
+        }
+    },
+    "transformations": {},
+}
+
+
+def project_contract(code_hash, fields):
+    contract = {"code_hash": code_hash, "name": CONTRACT_RECORD["name"]}
+    for field in fields:
+        part, _, signature = field.partition(".")
+        if not signature:
+            contract[part] = CONTRACT_RECORD[part]
+        elif signature in CONTRACT_RECORD[part]:
+            contract.setdefault(part, {})[signature] = CONTRACT_RECORD[part][signature]
+
+    return contract
+
+
+def make_repository(mocker) -> SemanticsRepository:
+    database = mocker.Mock()
+    database.get_address_semantics.return_value = ADDRESS_RECORD
+    database.get_contract_semantics.return_value = CONTRACT_RECORD
+    database.get_contract_semantics_fields.side_effect = project_contract
+
+    return SemanticsRepository(
+        database_connection=database,
+        etherscan_provider=mocker.Mock(),
+        web3provider=mocker.Mock(spec=[]),
+        ens_provider=mocker.Mock(),
+        refresh_ens=False,
+    )
+
+
+class TestSemanticsRepository:
+    def test_semantics_cached(self, mocker):
+        repository = make_repository(mocker)
+
+        semantics = repository.get_semantics("mainnet", ADDRESS)
+
+        assert repository.get_semantics("mainnet", ADDRESS) is semantics
+        assert repository.get_address_label("mainnet", ADDRESS) == "Token"
+        assert repository.check_is_contract("mainnet", ADDRESS)
+        assert repository.database.get_address_semantics.call_count == 1
+
+    def test_semantics_invalidated(self, mocker):
+        repository = make_repository(mocker)
+        repository.database.insert_contract.return_value = None
+
+        semantics = repository.get_semantics("mainnet", ADDRESS)
+        repository.update_semantics(semantics)
+        updated = repository.get_semantics("mainnet", ADDRESS)
+        repository.delete_semantics("mainnet", [ADDRESS])
+        repository.get_semantics("mainnet", ADDRESS)
+
+        assert updated is not semantics
+        assert repository.database.get_address_semantics.call_count == 3
+
+    def test_constructor_abi_not_mutated(self, mocker):
+        repository = make_repository(mocker)
+
+        repository.get_constructor_abi("mainnet", ADDRESS)
+        constructor = repository.get_constructor_abi("mainnet", ADDRESS)
+
+        assert [output.parameter_name for output in constructor.outputs] == [
+            "__create_output__"
+        ]
+        semantics = repository.get_semantics("mainnet", ADDRESS)
+        assert semantics.contract.functions["constructor"].outputs == []
+
+    def test_prefetch_semantics(self, mocker):
+        repository = make_repository(mocker)
+        repository._web3provider = mocker.Mock(spec=["get_tokens_metadata"])
+        database = repository.database
+        database.get_addresses_semantics.return_value = [ADDRESS_RECORD]
+        database.get_contracts_semantics.return_value = [CONTRACT_RECORD]
+        unknown_contract, unknown_sender = "0x" + "b" * 40, "0x" + "d" * 40
+
+        repository.prefetch_semantics(
+            "mainnet",
+            [ADDRESS, unknown_contract, unknown_sender],
+            contracts=[ADDRESS, unknown_contract],
+        )
+        repository.prefetch_semantics("mainnet", [ADDRESS])
+
+        assert repository.get_semantics("mainnet", ADDRESS).name == "Token"
+        database.get_addresses_semantics.assert_called_once()
+        database.get_contracts_semantics.assert_called_once_with([CODE_HASH], None)
+        database.get_address_semantics.assert_not_called()
+        database.get_contract_semantics.assert_not_called()
+        repository._web3provider.get_tokens_metadata.assert_called_once_with(
+            [unknown_contract], "mainnet"
+        )
+
+    def test_contract_read_partially(self, mocker):
+        repository = make_repository(mocker)
+        database = repository.database
+
+        assert repository.get_function_abi("mainnet", ADDRESS, "0xa9059cbb") is None
+        assert repository.get_function_abi("mainnet", ADDRESS, "0xa9059cbb") is None
+        assert repository.get_constructor_abi("mainnet", ADDRESS)
+
+        assert [
+            call.args[1]
+            for call in database.get_contract_semantics_fields.call_args_list
+        ] == [
+            ["functions.0xa9059cbb"],
+            ["functions.constructor"],
+        ]
+        database.get_contract_semantics.assert_not_called()
+
+        semantics = repository.get_semantics("mainnet", ADDRESS)
+
+        assert semantics.contract.is_complete
+        assert "constructor" in semantics.contract.functions
+        database.get_contract_semantics.assert_called_once_with(CODE_HASH)
+
+    def test_prefetched_fields(self, mocker):
+        repository = make_repository(mocker)
+        database = repository.database
+        database.get_addresses_semantics.return_value = [ADDRESS_RECORD]
+        database.get_contracts_semantics.return_value = [
+            project_contract(CODE_HASH, ["functions.constructor"])
+        ]
+
+        repository.prefetch_semantics(
+            "mainnet", [ADDRESS], fields=["functions.constructor"]
+        )
+
+        assert repository.get_function_abi("mainnet", ADDRESS, "constructor")
+        database.get_contract_semantics_fields.assert_not_called()
+
+    def test_cached_contracts_prefetched_at_once(self, mocker):
+        repository = make_repository(mocker)
+        database = repository.database
+        fields = ["functions.0xa9059cbb", "functions.constructor"]
+        database.get_contracts_semantics.side_effect = lambda code_hashes, fields_: [
+            project_contract(code_hash, fields_) for code_hash in code_hashes
+        ]
+
+        repository.get_address_label("mainnet", ADDRESS)
+        repository.prefetch_semantics("mainnet", [ADDRESS], fields=fields)
+        repository.prefetch_semantics("mainnet", [ADDRESS], fields=fields)
+
+        assert repository.get_function_abi("mainnet", ADDRESS, "constructor")
+        assert repository.get_function_abi("mainnet", ADDRESS, "0xa9059cbb") is None
+        database.get_contract_semantics_fields.assert_not_called()
+        database.get_contracts_semantics.assert_called_once_with([CODE_HASH], fields)
+
+    def test_usage(self, mocker):
+        repository = make_repository(mocker)
+
+        for _ in range(2):
+            repository.record()
+            repository.get_address_label("mainnet", ADDRESS)
+            repository.check_is_contract("mainnet", ADDRESS)
+            repository.end_record()
+        repository.flush_usage()
+        repository.flush_usage()
+
+        repository.database.record_usage.assert_called_once_with(
+            [
+                {
+                    "chain_id": "mainnet",
+                    "address": ADDRESS,
+                    "count": 2,
+                    "last_used": mocker.ANY,
+                }
+            ]
+        )
+
+    def test_known_code_hash_reused(self, mocker):
+        repository = make_repository(mocker)
+        repository._web3provider = mocker.Mock(
+            spec=["get_code_hash", "guess_erc20_proxy"]
+        )
+        repository._web3provider.get_code_hash.return_value = CODE_HASH
+        repository._web3provider.guess_erc20_proxy.return_value = None
+        repository.database.get_address_semantics.return_value = None
+        clone = "0x" + "b" * 40
+
+        semantics = repository.get_semantics("mainnet", clone)
+
+        assert semantics.name == "Token"
+        assert "constructor" in semantics.contract.functions
+        repository.etherscan.contract.get_contract_abi.assert_not_called()
+        repository.database.insert_address.assert_called_once()
+
+    def test_undecoded_code_hash_looked_up(self, mocker):
+        repository = make_repository(mocker)
+        repository._web3provider = mocker.Mock(
+            spec=["get_code_hash", "guess_erc20_token"]
+        )
+        repository._web3provider.get_code_hash.return_value = CODE_HASH
+        repository._web3provider.guess_erc20_token.return_value = None
+        repository.database.get_address_semantics.return_value = None
+        repository.database.get_contract_semantics.return_value = {
+            "code_hash": CODE_HASH,
+            "name": ADDRESS,
+            "events": {},
+            "functions": {},
+            "transformations": {},
+        }
+        repository.etherscan.contract.get_contract_abi.return_value = None, False
+
+        repository.get_semantics("mainnet", ADDRESS)
+
+        repository.etherscan.contract.get_contract_abi.assert_called_once_with(
+            "mainnet", ADDRESS
+        )
+
+    def test_created_once(self, mocker):
+        repository = make_repository(mocker)
+        repository.database.get_address_semantics.return_value = None
+
+        def create(chain_id, address):
+            time.sleep(0.05)
+            return AddressSemantics.from_mongo_record(
+                ADDRESS_RECORD, repository.database, CONTRACT_RECORD
+            )
+
+        create_semantics = mocker.patch.object(
+            repository, "_create_address_semantics", side_effect=create
+        )
+        mocker.patch.object(repository, "update_semantics")
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            semantics = list(
+                executor.map(
+                    lambda _: repository.get_semantics("mainnet", ADDRESS), range(4)
+                )
+            )
+
+        create_semantics.assert_called_once()
+        assert all(semantic is semantics[0] for semantic in semantics)
+
+    def test_created_by_lease_owner(self, mocker):
+        repository = make_repository(mocker)
+        repository.creation_lease_ttl = 10
+        database = repository.database
+        database.get_address_semantics.side_effect = [None, None, ADDRESS_RECORD]
+        database.acquire_lease.return_value = False
+        mocker.patch("ethtx.providers.semantic_providers.repository.time.sleep")
+        create_semantics = mocker.patch.object(repository, "_create_address_semantics")
+
+        assert repository.get_semantics("mainnet", ADDRESS).name == "Token"
+
+        create_semantics.assert_not_called()
+        assert database.acquire_lease.call_count == 2
+        database.release_lease.assert_not_called()
+
+    def test_created_with_lease(self, mocker):
+        repository = make_repository(mocker)
+        repository.creation_lease_ttl = 10
+        database = repository.database
+        database.get_address_semantics.return_value = None
+        database.acquire_lease.return_value = True
+        mocker.patch.object(
+            repository,
+            "_create_address_semantics",
+            return_value=AddressSemantics.from_mongo_record(
+                ADDRESS_RECORD, database, CONTRACT_RECORD
+            ),
+        )
+
+        repository.get_semantics("mainnet", ADDRESS)
+
+        lease = f"semantics:mainnet:{ADDRESS}"
+        database.acquire_lease.assert_called_once_with(
+            lease, repository._lease_owner, 10
+        )
+        database.insert_address.assert_called_once()
+        database.flush.assert_called_once()
+        database.release_lease.assert_called_once_with(lease, repository._lease_owner)
+
+    def test_lookups_memoized_per_decode(self, mocker):
+        repository = make_repository(mocker)
+        repository.database.get_address_semantics.return_value = {
+            **ADDRESS_RECORD,
+            "standard": None,
+        }
+        get_semantics = mocker.spy(repository, "_get_semantics")
+        proxies = {ADDRESS: Proxy(address=ADDRESS, name="Proxy", type="GenericProxy")}
+
+        with decode_context():
+            for _ in range(3):
+                assert repository.get_address_label("mainnet", ADDRESS) == "Token"
+                assert repository.check_is_contract("mainnet", ADDRESS)
+                assert repository.get_standard("mainnet", ADDRESS) is None
+            assert repository.get_address_label("mainnet", ADDRESS, proxies) == "Proxy"
+        repository.get_address_label("mainnet", ADDRESS)
+
+        assert get_semantics.call_count == 5
@@ -73,3 +73,221 @@ class TestMongoSemanticsDatabase:
             assert mongo_db.list_collection_names() == [MongoCollections.ADDRESSES]
         finally:
             mongo_db.drop_collection(MongoCollections.ADDRESSES)
+
+    def test_get_many_semantics(self, mongo_db, mongo_semantics_database):
+        try:
+            for address, code_hash in (("a", "hash_a"), ("b", "hash_b")):
+                mongo_semantics_database.insert_address(
+                    {"chain_id": "mainnet", "address": address, "contract": code_hash}
+                )
+                mongo_semantics_database.insert_contract({"code_hash": code_hash})
+
+            addresses = mongo_semantics_database.get_addresses_semantics(
+                "mainnet", ["a", "b", "c"]
+            )
+            contracts = mongo_semantics_database.get_contracts_semantics(["hash_a"])
+
+            assert {address["address"] for address in addresses} == {"a", "b"}
+            assert [contract["code_hash"] for contract in contracts] == ["hash_a"]
+        finally:
+            mongo_db.drop_collection(MongoCollections.ADDRESSES)
+            mongo_db.drop_collection(MongoCollections.CONTRACTS)
+
+    def test_upsert_signature(self, mongo_db, mongo_semantics_database):
+        guessed = {
+            "signature_hash": "0xa9059cbb",
+            "name": "transfer",
+            "args": [{"name": "arg_0", "type": "address"}],
+            "guessed": True,
+        }
+        named = {**guessed, "args": [{"name": "to", "type": "address"}]}
+        named.pop("guessed")
+        try:
+            mongo_semantics_database.create_indexes()
+            mongo_semantics_database.upsert_signature(guessed)
+            mongo_semantics_database.upsert_signature(named)
+            mongo_semantics_database.upsert_signature(
+                {**named, "args": [{"name": "to", "type": "uint256"}]}
+            )
+
+            signature = mongo_semantics_database.get_most_used_signature("0xa9059cbb")
+
+            assert signature["count"] == 2
+            assert signature["args"] == [{"name": "to", "type": "address"}]
+            assert not signature["guessed"]
+            assert (
+                mongo_db.get_collection(MongoCollections.SIGNATURES).count_documents({})
+                == 2
+            )
+        finally:
+            for collection in MongoCollections:
+                mongo_db.drop_collection(collection)
+
+    def test_legacy_signatures_keyed(self, mongo_db, mongo_semantics_database):
+        signatures = mongo_db.get_collection(MongoCollections.SIGNATURES)
+        try:
+            signatures.insert_one(
+                {
+                    "signature_hash": "0x095ea7b3",
+                    "name": "approve",
+                    "args": [
+                        {"name": "spender", "type": "address"},
+                        {"name": "amount", "type": "uint256"},
+                    ],
+                    "count": 7,
+                }
+            )
+
+            mongo_semantics_database.create_indexes()
+
+            assert signatures.find_one()["arg_types"] == "address,uint256"
+            assert "signature_key" in signatures.index_information()
+        finally:
+            for collection in MongoCollections:
+                mongo_db.drop_collection(collection)
+
+    def test_duplicated_signatures_merged(
+        self, mongo_db, mongo_semantics_database, mocker
+    ):
+        signatures = mongo_db.get_collection(MongoCollections.SIGNATURES)
+        signature = {"signature_hash": "0xa9059cbb", "name": "transfer"}
+        try:
+            signatures.insert_many(
+                [
+                    {
+                        **signature,
+                        "args": [{"name": "arg_0", "type": "address"}],
+                        "guessed": True,
+                        "count": 5,
+                    },
+                    {
+                        **signature,
+                        "args": [{"name": "to", "type": "address"}],
+                        "count": 2,
+                    },
+                    {
+                        **signature,
+                        "args": [{"name": "to", "type": "uint256"}],
+                        "count": 1,
+                    },
+                ]
+            )
+
+            mongo_semantics_database.create_indexes()
+
+            assert "signature_key" in signatures.index_information()
+            assert signatures.count_documents({}) == 2
+            merged = signatures.find_one({"arg_types": "address"})
+            assert merged["count"] == 7
+            assert merged["args"] == [{"name": "to", "type": "address"}]
+
+            # the migration runs only until the key index exists
+            migrate = mocker.spy(mongo_semantics_database, "_migrate_legacy_signatures")
+            mongo_semantics_database.create_indexes()
+            assert migrate.call_count == 0
+        finally:
+            for collection in MongoCollections:
+                mongo_db.drop_collection(collection)
+
+    def test_create_indexes(self, mongo_db, mongo_semantics_database):
+        addresses = mongo_db.get_collection(MongoCollections.ADDRESSES)
+        try:
+            for _ in range(2):
+                addresses.insert_one({"chain_id": "mainnet", "address": "0x1"})
+
+            mongo_semantics_database.create_indexes()
+
+            # duplicated addresses keep their index from being created
+            assert mongo_semantics_database.get_missing_indexes() == {
+                MongoCollections.ADDRESSES.value: ["address_key"]
+            }
+
+            addresses.delete_one({"address": "0x1"})
+            mongo_semantics_database.create_indexes()
+
+            assert mongo_semantics_database.get_missing_indexes() == {}
+        finally:
+            for collection in MongoCollections:
+                mongo_db.drop_collection(collection)
+
+    def test_get_contract_fields(self, mongo_db, mongo_semantics_database):
+        function = {"name": "transfer", "inputs": [], "outputs": []}
+        try:
+            mongo_semantics_database.insert_contract(
+                {
+                    "code_hash": "hash",
+                    "name": "Token",
+                    "events": {"0xddf2": {"name": "Transfer"}},
+                    "functions": {"0xa9059cbb": function, "0x095ea7b3": function},
+                    "transformations": {},
+                }
+            )
+
+            contract = mongo_semantics_database.get_contract_semantics_fields(
+                "hash", ["functions.0xa9059cbb", "events", "events.0xddf2"]
+            )
+
+            assert contract == {
+                "code_hash": "hash",
+                "name": "Token",
+                "events": {"0xddf2": {"name": "Transfer"}},
+                "functions": {"0xa9059cbb": function},
+            }
+        finally:
+            mongo_db.drop_collection(MongoCollections.CONTRACTS)
+
+    def test_usage(self, mongo_db, mongo_semantics_database):
+        def use(address, last_used):
+            return {
+                "chain_id": "mainnet",
+                "address": address,
+                "count": 1,
+                "last_used": last_used,
+            }
+
+        try:
+            mongo_semantics_database.record_usage([use("0x1", 10), use("0x2", 20)])
+            mongo_semantics_database.record_usage([use("0x1", 5)])
+
+            assert mongo_semantics_database.get_most_used(limit=1) == [
+                {"chain_id": "mainnet", "address": "0x1", "count": 2, "last_used": 10}
+            ]
+            assert [
+                usage["address"]
+                for usage in mongo_semantics_database.get_most_used(since=15)
+            ] == ["0x2"]
+        finally:
+            mongo_db.drop_collection(MongoCollections.USAGE)
+
+    def test_most_used_signatures(self, mongo_db, mongo_semantics_database):
+        signature = {"signature_hash": "0x1", "name": "a", "args": []}
+        try:
+            mongo_semantics_database.upsert_signature(signature)
+            for _ in range(2):
+                mongo_semantics_database.upsert_signature({**signature, "name": "b"})
+            mongo_semantics_database.upsert_signature(
+                {**signature, "signature_hash": "0x2"}
+            )
+
+            signatures = mongo_semantics_database.get_most_used_signatures(10)
+
+            assert [(s["signature_hash"], s["name"]) for s in signatures] == [
+                ("0x1", "b"),
+                ("0x2", "a"),
+            ]
+        finally:
+            mongo_db.drop_collection(MongoCollections.SIGNATURES)
+
+    def test_lease(self, mongo_db, mongo_semantics_database):
+        try:
+            assert mongo_semantics_database.acquire_lease("key", "first", 10)
+            assert not mongo_semantics_database.acquire_lease("key", "second", 10)
+            assert mongo_semantics_database.acquire_lease("other", "second", 10)
+
+            mongo_semantics_database.release_lease("key", "first")
+
+            assert mongo_semantics_database.acquire_lease("key", "second", -1)
+            # expired
+            assert mongo_semantics_database.acquire_lease("key", "first", 10)
+        finally:
+            mongo_db.drop_collection(MongoCollections.LEASES)
@@ -0,0 +1,152 @@
+from ethtx.providers.semantic_providers import (
+    InProcessSharedCache,
+    SharedCacheSemanticsDatabase,
+)
+from ethtx.providers.semantic_providers.const import MongoCollections
+
+ADDRESS = "0x" + "a" * 40
+CODE_HASH = "0x" + "c" * 64
+
+ADDRESS_RECORD = {
+    "chain_id": "mainnet",
+    "address": ADDRESS,
+    "name": "Token",
+    "contract": CODE_HASH,
+}
+CONTRACT_RECORD = {
+    "code_hash": CODE_HASH,
+    "name": "Token",
+    "events": {"0xddf2": {"name": "Transfer"}},
+    "functions": {"0xa9059cbb": {"name": "transfer"}},
+    "transformations": {},
+}
+
+
+def make_database(mocker):
+    database = mocker.Mock()
+    database.get_address_semantics.return_value = ADDRESS_RECORD
+    database.get_contract_semantics.return_value = CONTRACT_RECORD
+    database.get_contract_semantics_fields.return_value = {
+        "code_hash": CODE_HASH,
+        "name": "Token",
+        "functions": {"0xa9059cbb": {"name": "transfer"}},
+    }
+    return database
+
+
+class TestSharedCacheSemanticsDatabase:
+    def test_shared_by_processes(self, mocker):
+        cache = InProcessSharedCache()
+        first = SharedCacheSemanticsDatabase(make_database(mocker), cache)
+        second = SharedCacheSemanticsDatabase(make_database(mocker), cache)
+
+        assert first.get_address_semantics("mainnet", ADDRESS) == ADDRESS_RECORD
+        assert first.get_contract_semantics(CODE_HASH) == CONTRACT_RECORD
+
+        assert second.get_address_semantics("mainnet", ADDRESS) == ADDRESS_RECORD
+        assert second.get_contract_semantics(CODE_HASH) == CONTRACT_RECORD
+        assert second.get_contract_semantics_fields(
+            CODE_HASH, ["events", "functions.0x0"]
+        ) == {
+            "code_hash": CODE_HASH,
+            "name": "Token",
+            "events": CONTRACT_RECORD["events"],
+        }
+        second.database.get_address_semantics.assert_not_called()
+        second.database.get_contract_semantics.assert_not_called()
+        second.database.get_contract_semantics_fields.assert_not_called()
+
+    def test_projected_entries_cached(self, mocker):
+        database = SharedCacheSemanticsDatabase(
+            make_database(mocker), InProcessSharedCache()
+        )
+        fields = ["functions.0xa9059cbb", "functions.0x0"]
+
+        projected = database.get_contract_semantics_fields(CODE_HASH, fields)
+
+        assert database.get_contract_semantics_fields(CODE_HASH, fields) == projected
+        assert database.get_contract_semantics_fields(CODE_HASH, ["functions.0x0"]) == {
+            "code_hash": CODE_HASH,
+            "name": "Token",
+        }
+        database.database.get_contract_semantics_fields.assert_called_once_with(
+            CODE_HASH, fields
+        )
+
+    def test_written_through(self, mocker):
+        cache = InProcessSharedCache()
+        first = SharedCacheSemanticsDatabase(make_database(mocker), cache)
+        second = SharedCacheSemanticsDatabase(make_database(mocker), cache)
+        first.get_address_semantics("mainnet", ADDRESS)
+        first.get_contract_semantics_fields(CODE_HASH, ["functions.0xa9059cbb"])
+
+        first.insert_address({**ADDRESS_RECORD, "name": "Renamed"}, True)
+        first.insert_contract({**CONTRACT_RECORD, "functions": {}}, True)
+
+        assert second.get_address_semantics("mainnet", ADDRESS)["name"] == "Renamed"
+        assert second.get_contract_semantics_fields(
+            CODE_HASH, ["functions.0xa9059cbb"]
+        ) == {"code_hash": CODE_HASH, "name": "Token"}
+
+        second.delete_semantics_by_address("mainnet", ADDRESS)
+
+        assert len(cache) == 0
+
+    def test_versioned_keys(self, mocker):
+        cache = InProcessSharedCache()
+        database = SharedCacheSemanticsDatabase(make_database(mocker), cache)
+        mocker.patch(
+            "ethtx.providers.semantic_providers.shared_cache.SHARED_CACHE_VERSION", 2
+        )
+
+        database.get_address_semantics("mainnet", ADDRESS)
+
+        assert cache.get([f"ethtx:v2:address:mainnet:{ADDRESS}"]) != [None]
+        assert cache.get([f"ethtx:v1:address:mainnet:{ADDRESS}"]) == [None]
+
+    def test_mongo_records(self, mongo_db, mongo_semantics_database):
+        database = SharedCacheSemanticsDatabase(
+            mongo_semantics_database, InProcessSharedCache()
+        )
+
+        try:
+            mongo_semantics_database.insert_address(dict(ADDRESS_RECORD))
+            mongo_semantics_database.insert_contract(dict(CONTRACT_RECORD))
+            mongo_semantics_database.insert_bytecode(CODE_HASH, b"\x60\x80")
+
+            assert database.get_addresses_semantics("mainnet", [ADDRESS]) == [
+                ADDRESS_RECORD
+            ]
+            assert database.get_contracts_semantics([CODE_HASH]) == [CONTRACT_RECORD]
+            assert database.get_bytecode(CODE_HASH) == b"\x60\x80"
+
+            for collection in MongoCollections:
+                mongo_db.drop_collection(collection)
+
+            assert database.get_address_semantics("mainnet", ADDRESS) == ADDRESS_RECORD
+            assert database.get_bytecode(CODE_HASH) == b"\x60\x80"
+            assert database.get_collection_count() == 0
+        finally:
+            for collection in MongoCollections:
+                mongo_db.drop_collection(collection)
+
+
+class TestInProcessSharedCache:
+    def test_expired(self, mocker):
+        cache = InProcessSharedCache(ttl=10)
+        monotonic = mocker.patch(
+            "ethtx.providers.semantic_providers.shared_cache.time.monotonic",
+            return_value=0,
+        )
+        cache.set({"key": b"value"})
+        cache.set_fields({"hash": {"field": b"value"}})
+
+        assert cache.get(["key"]) == [b"value"]
+        assert cache.get_fields({"hash": ["field", "other"]}) == {
+            "hash": [b"value", None]
+        }
+
+        monotonic.return_value = 10
+
+        assert cache.get(["key"]) == [None]
+        assert cache.get_fields({"hash": ["field"]}) == {"hash": [None]}
@@ -0,0 +1,118 @@
+import gzip
+import json
+
+import pytest
+
+from ethtx.exceptions import InvalidSnapshotException
+from ethtx.providers.semantic_providers import SQLiteSemanticsDatabase
+from ethtx.providers.semantic_providers.snapshot import (
+    export_snapshot,
+    read_snapshot,
+)
+from .repository_test import (
+    ADDRESS,
+    ADDRESS_RECORD,
+    CODE_HASH,
+    CONTRACT_RECORD,
+    make_repository,
+)
+
+COLD_ADDRESS = "0x" + "b" * 40
+SIGNATURE = {
+    "signature_hash": "0xa9059cbb",
+    "name": "transfer",
+    "args": [{"name": "to", "type": "address"}, {"name": "", "type": "uint256"}],
+    "tuple": False,
+    "guessed": False,
+}
+
+
+@pytest.fixture
+def sqlite_database(tmp_path):
+    database = SQLiteSemanticsDatabase(str(tmp_path / "semantics.db"))
+    database.insert_address(ADDRESS_RECORD)
+    database.insert_address({**ADDRESS_RECORD, "address": COLD_ADDRESS})
+    database.insert_contract(CONTRACT_RECORD)
+    database.upsert_signature(SIGNATURE)
+    database.upsert_signature({**SIGNATURE, "name": "other"})
+    database.upsert_signature({**SIGNATURE, "name": "other"})
+    database.record_usage(
+        [
+            {"chain_id": "mainnet", "address": ADDRESS, "count": 5, "last_used": 2000},
+            {
+                "chain_id": "mainnet",
+                "address": COLD_ADDRESS,
+                "count": 1,
+                "last_used": 1000,
+            },
+        ]
+    )
+    yield database
+    database.close()
+
+
+class TestSnapshot:
+    def test_export(self, sqlite_database, tmp_path):
+        path = str(tmp_path / "semantics.snapshot")
+
+        exported = export_snapshot(sqlite_database, path, limit=1)
+        snapshot = read_snapshot(path)
+
+        assert exported == {"addresses": 1, "contracts": 1, "signatures": 1}
+        assert snapshot["addresses"] == [ADDRESS_RECORD]
+        assert snapshot["contracts"] == [CONTRACT_RECORD]
+        assert [signature["name"] for signature in snapshot["signatures"]] == ["other"]
+
+    def test_export_recent(self, sqlite_database, tmp_path, mocker):
+        path = str(tmp_path / "semantics.snapshot")
+        mocker.patch(
+            "ethtx.providers.semantic_providers.snapshot.time.time",
+            return_value=1500 + 24 * 60 * 60,
+        )
+
+        export_snapshot(sqlite_database, path, days=1)
+
+        assert read_snapshot(path)["addresses"] == [ADDRESS_RECORD]
+
+    def test_version(self, tmp_path):
+        path = tmp_path / "semantics.snapshot"
+        path.write_bytes(gzip.compress(json.dumps({"version": 0}).encode()))
+
+        with pytest.raises(InvalidSnapshotException):
+            read_snapshot(str(path))
+
+    def test_load(self, sqlite_database, tmp_path, mocker):
+        path = str(tmp_path / "semantics.snapshot")
+        export_snapshot(sqlite_database, path)
+        repository = make_repository(mocker)
+
+        assert repository.load_snapshot(path) == 2
+
+        semantics = repository.get_semantics("mainnet", ADDRESS)
+        assert semantics.contract.code_hash == CODE_HASH
+        assert semantics.contract.is_complete
+        assert repository.get_most_used_signature("0xa9059cbb").name == "other"
+        repository.database.get_address_semantics.assert_not_called()
+        repository.database.get_contract_semantics.assert_not_called()
+        repository.database.get_most_used_signature.assert_not_called()
+
+    def test_loaded_semantics_outlive_cache(self, sqlite_database, tmp_path, mocker):
+        path = str(tmp_path / "semantics.snapshot")
+        export_snapshot(sqlite_database, path)
+        repository = make_repository(mocker)
+        repository._semantics.maxsize = 1
+        repository.load_snapshot(path)
+
+        # entries expired or evicted from the semantics cache
+        repository._semantics.clear()
+        repository._signatures.clear()
+
+        assert repository.get_semantics("mainnet", ADDRESS).contract.is_complete
+        assert repository.get_most_used_signature("0xa9059cbb").name == "other"
+        assert repository._snapshot.stats()["ttl"] is None
+        repository.database.get_address_semantics.assert_not_called()
+
+        repository.invalidate_semantics("mainnet", ADDRESS)
+        repository.get_semantics("mainnet", ADDRESS)
+
+        repository.database.get_address_semantics.assert_called_once()
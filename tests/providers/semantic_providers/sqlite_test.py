@@ -0,0 +1,177 @@
+import sqlite3
+
+import pytest
+
+from ethtx.providers.semantic_providers import SQLiteSemanticsDatabase
+
+ADDRESS = "0x" + "a" * 40
+CODE_HASH = "0x" + "c" * 64
+
+ADDRESS_RECORD = {
+    "chain_id": "mainnet",
+    "address": ADDRESS,
+    "name": "Token",
+    "is_contract": True,
+    "contract": CODE_HASH,
+    "standard": "ERC20",
+    "erc20": {"name": "Token", "symbol": "TKN", "decimals": 18},
+}
+CONTRACT_RECORD = {
+    "code_hash": CODE_HASH,
+    "name": "Token",
+    "events": {"0xddf2": {"name": "Transfer"}},
+    "functions": {
+        "0xa9059cbb": {"name": "transfer"},
+        "0x095ea7b3": {"name": "approve"},
+    },
+    "transformations": {},
+}
+SIGNATURE = {
+    "signature_hash": "0xa9059cbb",
+    "name": "transfer",
+    "args": [{"name": "", "type": "address"}, {"name": "", "type": "uint256"}],
+    "tuple": False,
+    "guessed": True,
+}
+
+
+@pytest.fixture
+def sqlite_database(tmp_path):
+    database = SQLiteSemanticsDatabase(str(tmp_path / "semantics.db"))
+    yield database
+    database.close()
+
+
+class TestSQLiteSemanticsDatabase:
+    def test_address_and_contract(self, sqlite_database):
+        sqlite_database.insert_address({"_id": 1, **ADDRESS_RECORD})
+        assert sqlite_database.insert_contract(CONTRACT_RECORD)
+
+        assert sqlite_database.get_address_semantics("mainnet", ADDRESS) == (
+            ADDRESS_RECORD
+        )
+        assert sqlite_database.get_addresses_semantics("mainnet", [ADDRESS, "0x0"]) == [
+            ADDRESS_RECORD
+        ]
+        assert sqlite_database.get_contract_semantics(CODE_HASH) == CONTRACT_RECORD
+        assert sqlite_database.get_contract_semantics("0x0") is None
+
+        with pytest.raises(sqlite3.IntegrityError):
+            sqlite_database.insert_contract(CONTRACT_RECORD)
+
+        updated = {**CONTRACT_RECORD, "name": "Renamed", "events": {}}
+        assert sqlite_database.insert_contract(updated, update_if_exist=True) is None
+        assert sqlite_database.get_contract_semantics(CODE_HASH) == updated
+
+        sqlite_database.delete_semantics_by_address("mainnet", ADDRESS)
+
+        assert sqlite_database.get_address_semantics("mainnet", ADDRESS) is None
+        assert sqlite_database.get_contract_semantics(CODE_HASH) is None
+
+    def test_contract_fields(self, sqlite_database):
+        sqlite_database.insert_contract(CONTRACT_RECORD)
+
+        assert sqlite_database.get_contract_semantics_fields(CODE_HASH, []) == {
+            "code_hash": CODE_HASH,
+            "name": "Token",
+        }
+        assert sqlite_database.get_contract_semantics_fields(
+            CODE_HASH, ["functions.0xa9059cbb", "functions.0x0", "events"]
+        ) == {
+            "code_hash": CODE_HASH,
+            "name": "Token",
+            "functions": {"0xa9059cbb": {"name": "transfer"}},
+            "events": CONTRACT_RECORD["events"],
+        }
+        assert sqlite_database.get_contracts_semantics(
+            [CODE_HASH], ["functions", "functions.0xa9059cbb"]
+        ) == [
+            {
+                "code_hash": CODE_HASH,
+                "name": "Token",
+                "functions": CONTRACT_RECORD["functions"],
+            }
+        ]
+
+    def test_upsert_signature(self, sqlite_database):
+        sqlite_database.upsert_signature(SIGNATURE)
+        sqlite_database.upsert_signature(SIGNATURE)
+        named_args = [
+            {"name": "to", "type": "address"},
+            {"name": "amount", "type": "uint256"},
+        ]
+        sqlite_database.upsert_signature(
+            {**SIGNATURE, "args": named_args, "guessed": False}
+        )
+
+        signature = sqlite_database.get_most_used_signature("0xa9059cbb")
+
+        assert signature["count"] == 3
+        assert signature["args"] == named_args
+        assert not signature["guessed"]
+        assert sqlite_database.get_signature_semantics("0xa9059cbb") == [signature]
+
+    def test_many_lookups_batched(self, sqlite_database):
+        addresses = ["0x" + f"{i:040x}" for i in range(1500)]
+        code_hashes = ["0x" + f"{i:064x}" for i in range(1500)]
+        sqlite_database.bulk_import(
+            addresses=[{**ADDRESS_RECORD, "address": address} for address in addresses],
+            contracts=[
+                {**CONTRACT_RECORD, "code_hash": code_hash} for code_hash in code_hashes
+            ],
+        )
+        # the entry is read with the last batch of entries
+        fields = (
+            ["events"]
+            + [f"functions.0x{i:08x}" for i in range(1200)]
+            + ["functions.0xa9059cbb"]
+        )
+
+        assert (
+            len(sqlite_database.get_addresses_semantics("mainnet", addresses)) == 1500
+        )
+        contracts = sqlite_database.get_contracts_semantics(code_hashes, fields)
+        assert len(contracts) == 1500
+        assert contracts[-1]["events"] == CONTRACT_RECORD["events"]
+        assert contracts[-1]["functions"] == {"0xa9059cbb": {"name": "transfer"}}
+
+    def test_bulk_import_read_only(self, sqlite_database):
+        sqlite_database.bulk_import(
+            addresses=iter([ADDRESS_RECORD]),
+            contracts=[CONTRACT_RECORD],
+            signatures=[{**SIGNATURE, "count": 7}],
+            bytecodes=[{"code_hash": CODE_HASH, "bytecode": b"\x60\x80"}],
+        )
+        sqlite_database.pack()
+        read_only = SQLiteSemanticsDatabase.from_url(
+            f"sqlite:///{sqlite_database.path}?mode=ro"
+        )
+
+        try:
+            read_only.insert_address({**ADDRESS_RECORD, "name": "Renamed"}, True)
+
+            assert read_only.read_only
+            assert read_only.get_address_semantics("mainnet", ADDRESS) == (
+                ADDRESS_RECORD
+            )
+            assert read_only.get_contract_semantics(CODE_HASH) == CONTRACT_RECORD
+            assert read_only.get_most_used_signature("0xa9059cbb")["count"] == 7
+            assert read_only.get_bytecode(CODE_HASH) == b"\x60\x80"
+        finally:
+            read_only.close()
+
+    def test_lease(self, sqlite_database, mocker):
+        now = mocker.patch(
+            "ethtx.providers.semantic_providers.sqlite.time.time", return_value=100
+        )
+
+        assert sqlite_database.acquire_lease("key", "first", 10)
+        assert not sqlite_database.acquire_lease("key", "second", 10)
+
+        now.return_value = 111
+
+        assert sqlite_database.acquire_lease("key", "second", 10)
+        sqlite_database.release_lease("key", "first")
+        assert not sqlite_database.acquire_lease("key", "first", 10)
+        sqlite_database.release_lease("key", "second")
+        assert sqlite_database.acquire_lease("key", "first", 10)
@@ -0,0 +1,218 @@
+import time
+
+import pytest
+from pymongo import InsertOne, ReplaceOne
+from pymongo.errors import AutoReconnect
+
+from ethtx.providers.semantic_providers import (
+    MongoSemanticsDatabase,
+    WriteBehindQueue,
+)
+from ethtx.providers.semantic_providers.const import MongoCollections
+
+
+@pytest.fixture
+def queue():
+    queue = WriteBehindQueue(flush_size=100, flush_interval=60)
+    yield queue
+    queue.close()
+
+
+def address(name: str, address_: str = "0x1") -> dict:
+    return {"chain_id": "mainnet", "address": address_, "name": name}
+
+
+class TestWriteBehindQueue:
+    def test_writes_coalesced(self, queue, mongo_db):
+        collection = mongo_db.get_collection(MongoCollections.ADDRESSES)
+        try:
+            for name in ("first", "second"):
+                queue.add(
+                    collection,
+                    ReplaceOne({"address": "0x1"}, address(name), True),
+                    "0x1",
+                )
+
+            assert len(queue) == 1
+            assert collection.count_documents({}) == 0
+
+            queue.flush()
+
+            assert len(queue) == 0
+            assert collection.find_one({"address": "0x1"})["name"] == "second"
+        finally:
+            mongo_db.drop_collection(MongoCollections.ADDRESSES)
+
+    def test_pending_documents_readable(self, queue, mongo_db, mocker):
+        collection = mongo_db.get_collection(MongoCollections.ADDRESSES)
+        write = queue._write
+        written = []
+
+        def read_while_writing(collection_, operations):
+            written.append(queue.get_pending(collection, "0x1"))
+            return write(collection_, operations)
+
+        try:
+            queue.add(
+                collection,
+                ReplaceOne({"address": "0x1"}, address("first"), True),
+                "0x1",
+                address("first"),
+            )
+            assert queue.get_pending(collection, "0x1")["name"] == "first"
+
+            mocker.patch.object(queue, "_write", side_effect=read_while_writing)
+            queue.flush()
+
+            assert written[0]["name"] == "first"
+            assert queue.get_pending(collection, "0x1") is None
+        finally:
+            mongo_db.drop_collection(MongoCollections.ADDRESSES)
+
+    def test_failed_writes_retried(self, mongo_db, mocker):
+        dropped = []
+        queue = WriteBehindQueue(
+            flush_size=100,
+            flush_interval=60,
+            max_retries=1,
+            on_drop=lambda collection, operations, e: dropped.extend(operations),
+        )
+        collection = mongo_db.get_collection(MongoCollections.ADDRESSES)
+        bulk_write = collection.bulk_write
+        try:
+            mocker.patch.object(
+                collection, "bulk_write", side_effect=AutoReconnect("unreachable")
+            )
+            queue.add(
+                collection,
+                ReplaceOne({"address": "0x1"}, address("first"), True),
+                "0x1",
+                address("first"),
+            )
+
+            queue.flush()
+            # the write is queued again and still readable
+            assert len(queue) == 1
+            assert queue.retried == 1
+            assert queue.get_pending(collection, "0x1")["name"] == "first"
+
+            queue.flush()
+            assert len(queue) == 0
+            assert queue.dropped == 1
+            assert len(dropped) == 1
+
+            collection.bulk_write = bulk_write
+            queue.add(
+                collection,
+                ReplaceOne({"address": "0x1"}, address("second"), True),
+                "0x1",
+            )
+            queue.flush()
+            assert collection.find_one({"address": "0x1"})["name"] == "second"
+        finally:
+            queue.close()
+            mongo_db.drop_collection(MongoCollections.ADDRESSES)
+
+    def test_rejected_writes_dropped(self, queue, mongo_db):
+        collection = mongo_db.get_collection(MongoCollections.ADDRESSES)
+        try:
+            collection.create_index("address", unique=True)
+            collection.insert_one(address("stored"))
+            queue.add(collection, InsertOne(address("duplicate")), "0x1")
+            queue.add(collection, InsertOne(address("new", "0x2")), "0x2")
+
+            queue.flush()
+
+            assert len(queue) == 0
+            assert queue.dropped == 1
+            assert collection.find_one({"address": "0x2"})["name"] == "new"
+        finally:
+            mongo_db.drop_collection(MongoCollections.ADDRESSES)
+
+    def test_flushed_on_size(self, mongo_db):
+        queue = WriteBehindQueue(flush_size=2, flush_interval=60)
+        collection = mongo_db.get_collection(MongoCollections.ADDRESSES)
+        try:
+            for address_ in ("0x1", "0x2"):
+                queue.add(
+                    collection,
+                    ReplaceOne({"address": address_}, address("a", address_), True),
+                    address_,
+                )
+            # the flushing thread is woken up without waiting for the interval
+            for _ in range(100):
+                if collection.count_documents({}) == 2:
+                    break
+                time.sleep(0.01)
+
+            assert len(queue) == 0
+            assert collection.count_documents({}) == 2
+        finally:
+            queue.close()
+            mongo_db.drop_collection(MongoCollections.ADDRESSES)
+
+
+class TestWriteBehindSemanticsDatabase:
+    def test_reads_see_queued_writes(self, queue, mongo_db):
+        database = MongoSemanticsDatabase(mongo_db, write_behind=queue)
+        contract = {"code_hash": "0xc0de", "name": "Contract"}
+        try:
+            assert database.insert_contract(contract, update_if_exist=True)
+            assert database.insert_contract(contract, update_if_exist=True) is None
+            database.insert_address(address("Contract"), update_if_exist=True)
+
+            assert len(queue) == 2
+            assert [
+                raw_address["name"]
+                for raw_address in database.get_addresses_semantics("mainnet", ["0x1"])
+            ] == ["Contract"]
+            assert database.get_contracts_semantics(["0xc0de"])[0]["name"] == "Contract"
+            assert database.get_contract_semantics_fields("0xc0de", ["events"]) == {
+                "code_hash": "0xc0de",
+                "name": "Contract",
+            }
+            # reads do not wait for the queued writes
+            assert len(queue) == 2
+            assert (
+                mongo_db.get_collection(MongoCollections.CONTRACTS).count_documents({})
+                == 0
+            )
+
+            queue.flush()
+
+            assert (
+                database.get_address_semantics("mainnet", "0x1")["name"] == "Contract"
+            )
+        finally:
+            mongo_db.drop_collection(MongoCollections.ADDRESSES)
+            mongo_db.drop_collection(MongoCollections.CONTRACTS)
+
+    def test_contract_insert_keeps_stored_contract(self, queue, mongo_db):
+        database = MongoSemanticsDatabase(mongo_db, write_behind=queue)
+        database.create_indexes()
+        contracts = mongo_db.get_collection(MongoCollections.CONTRACTS)
+        try:
+            contracts.insert_one({"code_hash": "0xc0de", "name": "Stored"})
+            database.insert_contract({"code_hash": "0xc0de", "name": "New"})
+            database.insert_contract({"code_hash": "0xbeef", "name": "Other"})
+
+            database.flush()
+
+            assert queue.dropped == 0
+            assert contracts.find_one({"code_hash": "0xc0de"})["name"] == "Stored"
+            assert contracts.find_one({"code_hash": "0xbeef"})["name"] == "Other"
+        finally:
+            for collection in mongo_db.list_collection_names():
+                mongo_db.drop_collection(collection)
+
+    def test_signature_increments_not_coalesced(self, queue, mongo_db):
+        database = MongoSemanticsDatabase(mongo_db, write_behind=queue)
+        signature = {"signature_hash": "0x12345678", "name": "f", "args": []}
+        try:
+            database.upsert_signature(signature)
+            database.upsert_signature(signature)
+            database.flush()
+
+            assert database.get_most_used_signature("0x12345678")["count"] == 2
+        finally:
+            mongo_db.drop_collection(MongoCollections.SIGNATURES)
@@ -0,0 +1,176 @@
+import pytest
+
+from ethtx.exceptions import ProcessingException
+from ethtx.providers.tracers import (
+    JSCallTracer,
+    NativeCallTracer,
+    ParityCallTracer,
+    build_call_tree,
+    get_tracer,
+)
+
+NATIVE_TRACE = {
+    "type": "CALL",
+    "from": "0x1111111111111111111111111111111111111111",
+    "to": "0x2222222222222222222222222222222222222222",
+    "value": "0x0",
+    "gas": "0x10",
+    "gasUsed": "0x8",
+    "input": "0x",
+    "calls": [
+        {
+            "type": "STATICCALL",
+            "from": "0x2222222222222222222222222222222222222222",
+            "to": "0x0000000000000000000000000000000000000001",
+            "input": "0x",
+            "output": "0x",
+        },
+        {
+            "type": "DELEGATECALL",
+            "from": "0x2222222222222222222222222222222222222222",
+            "to": "0x3333333333333333333333333333333333333333",
+            "input": "0x12",
+            "error": "execution reverted",
+            "calls": [
+                {
+                    "type": "CREATE",
+                    "from": "0x3333333333333333333333333333333333333333",
+                    "input": "0x",
+                }
+            ],
+        },
+    ],
+}
+
+PARITY_TRACES = [
+    {
+        "type": "call",
+        "action": {
+            "callType": "call",
+            "from": "0x1111111111111111111111111111111111111111",
+            "to": "0x2222222222222222222222222222222222222222",
+            "value": "0x0",
+            "gas": "0x10",
+            "input": "0x",
+        },
+        "result": {"gasUsed": "0x8", "output": "0x"},
+        "subtraces": 2,
+        "traceAddress": [],
+        "transactionHash": "0xAA",
+    },
+    {
+        "type": "call",
+        "action": {
+            "callType": "staticcall",
+            "from": "0x2222222222222222222222222222222222222222",
+            "to": "0x0000000000000000000000000000000000000001",
+            "gas": "0x1",
+            "input": "0x",
+        },
+        "result": {"gasUsed": "0x1", "output": "0x"},
+        "subtraces": 0,
+        "traceAddress": [0],
+        "transactionHash": "0xAA",
+    },
+    {
+        "type": "call",
+        "action": {
+            "callType": "delegatecall",
+            "from": "0x2222222222222222222222222222222222222222",
+            "to": "0x3333333333333333333333333333333333333333",
+            "gas": "0x4",
+            "input": "0x12",
+        },
+        "result": None,
+        "error": "Reverted",
+        "subtraces": 1,
+        "traceAddress": [1],
+        "transactionHash": "0xAA",
+    },
+    {
+        "type": "create",
+        "action": {
+            "from": "0x3333333333333333333333333333333333333333",
+            "gas": "0x2",
+            "init": "0x60",
+            "value": "0x0",
+        },
+        "result": {
+            "address": "0x4444444444444444444444444444444444444444",
+            "code": "0x",
+            "gasUsed": "0x2",
+        },
+        "subtraces": 0,
+        "traceAddress": [1, 0],
+        "transactionHash": "0xAA",
+    },
+]
+
+
+class TestTracers:
+    def test_get_tracer(self):
+        assert isinstance(get_tracer(), JSCallTracer)
+        assert isinstance(get_tracer("callTracer"), NativeCallTracer)
+        assert "tracerConfig" not in get_tracer("callTracer").tracer_options()
+
+        with pytest.raises(ProcessingException):
+            get_tracer("unknown")
+
+    def test_tracer_options(self):
+        assert get_tracer("js", timeout="5m").tracer_options()["timeout"] == "5m"
+        assert not get_tracer("callTracer", skip_precompiles=False).skip_precompiles
+
+        with pytest.raises(ProcessingException):
+            get_tracer("js", skip_precompiles=True)
+
+    def test_js_tracer_source_is_read_once(self):
+        first = JSCallTracer().transaction_request("0x01")[1][1]["tracer"]
+        second = JSCallTracer().transaction_request("0x02")[1][1]["tracer"]
+
+        assert first is second
+
+    def test_native_call_tree(self):
+        call_tree = NativeCallTracer().parse_transaction(
+            "0x01", "mainnet", NATIVE_TRACE
+        )
+
+        assert call_tree.to_address == "0x2222222222222222222222222222222222222222"
+        assert call_tree.output == "0x"
+        assert [call.type for call in call_tree.calls] == ["DELEGATECALL"]
+        assert call_tree.calls[0].error == "execution reverted"
+        assert call_tree.calls[0].calls[0].to_address is None
+
+    def test_js_call_tree_keeps_all_calls(self):
+        call_tree = build_call_tree("0x01", "mainnet", NATIVE_TRACE)
+
+        assert len(call_tree.calls) == 2
+
+    def test_block_trace_error(self):
+        with pytest.raises(ProcessingException):
+            NativeCallTracer().parse_block(
+                ["0x01"], "mainnet", [{"error": "execution timeout"}]
+            )
+
+    def test_parity_call_tree(self):
+        call_tree = ParityCallTracer().parse_transaction(
+            "0xaa", "mainnet", PARITY_TRACES
+        )
+
+        assert call_tree.type == "CALL"
+        assert [call.type for call in call_tree.calls] == ["DELEGATECALL"]
+        assert call_tree.calls[0].error == "execution reverted"
+        assert call_tree.calls[0].calls[0].type == "CREATE"
+        assert call_tree.calls[0].calls[0].input == "0x60"
+
+    def test_parity_block(self):
+        reward = {"type": "reward", "action": {}, "traceAddress": []}
+        call_trees = ParityCallTracer().parse_block(
+            ["0xaa"], "mainnet", PARITY_TRACES + [reward]
+        )
+
+        assert len(call_trees) == 1
+        assert len(call_trees[0].calls) == 1
+
+    def test_parity_missing_parent(self):
+        with pytest.raises(ProcessingException):
+            ParityCallTracer().parse_transaction("0xaa", "mainnet", PARITY_TRACES[3:])
@@ -0,0 +1,331 @@
+import json
+
+import pytest
+from eth_abi import encode
+from hexbytes import HexBytes
+from web3 import Web3
+
+from ethtx.exceptions import ProcessingException
+from ethtx.providers.node import NodePoolProvider
+from ethtx.providers.tracers import (
+    JSCallTracer,
+    ParityCallTracer,
+)
+from ethtx.providers.web3_provider import Web3Provider
+
+NODES = {"mainnet": {"hook": "http://a, http://b", "poa": False}}
+PROXY = "0x" + "1" * 40
+
+
+class TestWeb3Provider:
+    def test_connection_is_reused(self):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+
+        first = provider._get_node_connection()
+        second = provider._get_node_connection("mainnet")
+
+        assert first is second
+        assert isinstance(first.provider, NodePoolProvider)
+
+    def test_close(self):
+        with Web3Provider(
+            nodes=NODES, default_chain="mainnet", max_workers=2
+        ) as provider:
+            assert provider._executor._max_workers == 2
+
+        with pytest.raises(RuntimeError):
+            provider._executor.submit(print)
+
+    def test_unknown_chain(self):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+
+        with pytest.raises(ProcessingException):
+            provider._get_node_connection("goerli")
+
+    def test_full_transaction_is_batched(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        batch_request = mocker.patch.object(
+            provider, "_batch_request", return_value=[mocker.Mock(), mocker.Mock()]
+        )
+        transaction = mocker.patch.object(provider, "_create_transaction")
+        mocker.patch.object(provider, "_create_receipt")
+        mocker.patch.object(provider, "get_calls")
+        get_block = mocker.patch.object(provider, "get_block")
+        from_raw = mocker.patch("ethtx.providers.web3_provider.Transaction.from_raw")
+
+        provider.get_full_transaction("0x01", "mainnet")
+
+        assert batch_request.call_count == 1
+        assert [method for method, _ in batch_request.call_args[0][1]] == [
+            "eth_getTransactionByHash",
+            "eth_getTransactionReceipt",
+        ]
+        get_block.assert_called_once_with(
+            transaction.return_value.blockNumber, "mainnet"
+        )
+        assert from_raw.call_count == 1
+
+    def test_full_block_falls_back_to_receipts(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        raw_tx = mocker.Mock()
+        raw_block = mocker.MagicMock(transactions=[raw_tx])
+        batch_request = mocker.patch.object(
+            provider,
+            "_batch_request",
+            side_effect=[ValueError("method not found"), [raw_block], [mocker.Mock()]],
+        )
+        tracer = mocker.Mock()
+        tracer.parse_block.return_value = [mocker.Mock()]
+        mocker.patch.object(provider, "_trace", return_value=(tracer, mocker.Mock()))
+        mocker.patch.object(provider, "_create_block")
+        mocker.patch.object(provider, "_create_transaction")
+        mocker.patch.object(provider, "_create_receipt")
+        from_raw = mocker.patch("ethtx.providers.web3_provider.Block.from_raw")
+
+        provider.get_full_block(1, "mainnet")
+
+        assert [method for method, _ in batch_request.call_args_list[0][0][1]] == [
+            "eth_getBlockByNumber",
+            "eth_getBlockReceipts",
+        ]
+        assert [method for method, _ in batch_request.call_args[0][1]] == [
+            "eth_getTransactionReceipt"
+        ]
+        assert tracer.parse_block.call_count == 1
+        assert len(from_raw.call_args[1]["w3transactions"]) == 1
+
+    def test_full_block_receipts_read_in_chunks(self, mocker):
+        nodes = {"mainnet": {**NODES["mainnet"], "max_batch_size": 2}}
+        provider = Web3Provider(nodes=nodes, default_chain="mainnet")
+        tx_hashes = ["0x" + f"{i:064x}" for i in range(5)]
+        batch_sizes = []
+
+        def post(url, data, **kwargs):
+            batch = json.loads(data)
+            if any(request["method"] == "eth_getBlockReceipts" for request in batch):
+                # the node rejects the whole batch
+                content = {"jsonrpc": "2.0", "id": None, "error": "not supported"}
+            else:
+                batch_sizes.append(len(batch))
+                content = [
+                    {
+                        "jsonrpc": "2.0",
+                        "id": request["id"],
+                        "result": {
+                            "number": "0x1",
+                            "transactions": [{"hash": h} for h in tx_hashes],
+                        }
+                        if request["method"] == "eth_getBlockByNumber"
+                        else {"transactionHash": request["params"][0]},
+                    }
+                    for request in batch
+                ]
+            response = mocker.MagicMock()
+            response.content = json.dumps(content).encode()
+            return response
+
+        mocker.patch("requests.Session.post", side_effect=post)
+        tracer = mocker.Mock()
+        tracer.parse_block.return_value = [mocker.Mock()] * len(tx_hashes)
+        mocker.patch.object(provider, "_trace", return_value=(tracer, mocker.Mock()))
+        mocker.patch.object(provider, "_create_block")
+        mocker.patch.object(provider, "_create_transaction")
+        create_receipt = mocker.patch.object(provider, "_create_receipt")
+        mocker.patch("ethtx.providers.web3_provider.Block.from_raw")
+
+        provider.get_full_block(1, "mainnet")
+
+        assert batch_sizes == [1, 2, 2, 1]
+        assert [
+            call[0][2].transactionHash.hex() for call in create_receipt.call_args_list
+        ] == tx_hashes
+
+    def test_native_tracer_falls_back_to_js(self, mocker):
+        nodes = {"mainnet": {**NODES["mainnet"], "tracer": "callTracer"}}
+        provider = Web3Provider(nodes=nodes, default_chain="mainnet")
+        node_provider = provider._get_node_connection().provider
+        connection = provider._pool.connections[0]
+        requests = []
+
+        def make_node_request(build_request, node=None):
+            requests.append(build_request(connection))
+            if requests[-1][1][1]["tracer"] == "callTracer":
+                return connection, {"error": {"message": "tracer not found"}}
+            return connection, {"result": {"type": "CALL"}}
+
+        mocker.patch.object(
+            node_provider, "make_node_request", side_effect=make_node_request
+        )
+
+        tracer, result = provider._trace(
+            "mainnet", lambda tracer: tracer.transaction_request("0x01")
+        )
+
+        assert isinstance(tracer, JSCallTracer)
+        assert result == {"type": "CALL"}
+        assert len(requests) == 2
+        assert provider._get_tracer(connection) is tracer
+
+    def test_tracer_per_node(self):
+        nodes = {
+            "mainnet": {
+                "hook": "http://geth, http://erigon",
+                "poa": False,
+                "tracer": {"http://erigon": "parity"},
+                "tracer_options": {"parity": {"skip_precompiles": False}},
+            }
+        }
+        provider = Web3Provider(nodes=nodes, default_chain="mainnet")
+        geth, erigon = provider._pool.connections
+
+        assert isinstance(provider._get_tracer(geth), JSCallTracer)
+        assert isinstance(provider._get_tracer(erigon), ParityCallTracer)
+        assert not provider._get_tracer(erigon).skip_precompiles
+
+    def test_tracer_options_validated(self):
+        nodes = {
+            "mainnet": {
+                **NODES["mainnet"],
+                "tracer": "callTracer",
+                "tracer_options": {"callTracer": {"timeout": "2m"}},
+            }
+        }
+        provider = Web3Provider(nodes=nodes, default_chain="mainnet")
+        connection = provider._pool.connections[0]
+
+        assert provider._get_tracer(connection).tracer_options()["timeout"] == "2m"
+
+        nodes["mainnet"]["tracer_options"] = {"js": {"with_log": True}}
+        with pytest.raises(ProcessingException):
+            Web3Provider(nodes=nodes, default_chain="mainnet")
+
+    def test_tokens_metadata_in_one_call(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        tokens = ["0x" + "1" * 40, "0x" + "2" * 40]
+        results = [
+            (True, encode(["string"], ["Token"])),
+            (True, b"TKN".ljust(32, b"\x00")),
+            (True, encode(["uint8"], [6])),
+            (True, encode(["string"], ["NFT"])),
+            (True, encode(["string"], ["NFT"])),
+            (False, b""),
+        ]
+        batch_request = mocker.patch.object(
+            provider,
+            "_batch_request",
+            return_value=[encode(["(bool,bytes)[]"], [results])],
+        )
+
+        metadata = provider.get_tokens_metadata(tokens)
+
+        assert metadata[tokens[0]] == dict(name="Token", symbol="TKN", decimals=6)
+        assert provider.guess_erc20_proxy(tokens[1]) is None
+        assert provider.guess_erc721_proxy(tokens[1]) == dict(symbol="NFT", name="NFT")
+        assert batch_request.call_count == 1
+        assert batch_request.call_args[0][1][0][0] == "eth_call"
+
+    def test_tokens_metadata_without_multicall(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        token = "0x" + "1" * 40
+        mocker.patch.object(provider, "_batch_request", return_value=[HexBytes("0x")])
+        make_batch_request = mocker.patch.object(
+            provider._get_node_connection().provider,
+            "make_batch_request",
+            return_value=[
+                {"result": Web3.to_hex(encode(["string"], ["Token"]))},
+                {"result": "0x"},
+                {"error": {"message": "execution reverted"}},
+            ],
+        )
+
+        metadata = provider.get_tokens_metadata([token])
+
+        assert metadata[token] == dict(name="Token", symbol=None, decimals=None)
+        assert len(make_batch_request.call_args[0][0]) == 3
+        assert "mainnet" in provider._no_multicall
+
+    def test_tokens_metadata_not_cached_after_node_error(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        provider._no_multicall.add("mainnet")
+        tokens = ["0x" + "1" * 40, "0x" + "2" * 40]
+        mocker.patch.object(
+            provider._get_node_connection().provider,
+            "make_batch_request",
+            return_value=[
+                {"result": Web3.to_hex(encode(["string"], ["Token"]))},
+                {"error": {"code": -32000, "message": "header not found"}},
+                {"result": Web3.to_hex(encode(["uint8"], [6]))},
+                {"error": {"code": 3, "message": "execution reverted"}},
+                {"result": "0x"},
+                {"result": "0x"},
+            ],
+        )
+
+        metadata = provider.get_tokens_metadata(tokens)
+
+        assert metadata[tokens[0]] == dict(name="Token", symbol=None, decimals=6)
+        assert provider._token_metadata.get(("mainnet", tokens[0])) is None
+        assert provider._token_metadata.get(("mainnet", tokens[1])) == dict(
+            name=None, symbol=None, decimals=None
+        )
+
+    def test_multicall_kept_after_transient_error(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        token = "0x" + "1" * 40
+        mocker.patch.object(
+            provider,
+            "_batch_request",
+            side_effect=ValueError({"message": "request timed out"}),
+        )
+        mocker.patch.object(
+            provider._get_node_connection().provider,
+            "make_batch_request",
+            return_value=[{"result": "0x"}] * 3,
+        )
+
+        provider.get_tokens_metadata([token])
+
+        assert "mainnet" not in provider._no_multicall
+        assert provider._token_metadata.get(("mainnet", token)) == dict(
+            name=None, symbol=None, decimals=None
+        )
+
+    def test_proxy_implementations_cached_per_block(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        implementation, beacon = "0x" + "2" * 40, "0x" + "3" * 40
+        batch_request = mocker.patch.object(
+            provider,
+            "_batch_request",
+            side_effect=[
+                [HexBytes("0x" + "0" * 24 + implementation[2:]), HexBytes(beacon)],
+                [HexBytes("0x" + "0" * 24 + implementation[2:])],
+                [HexBytes("0x" + "0" * 64), HexBytes("0x" + "0" * 64)],
+            ],
+        )
+
+        assert provider.get_proxy_implementations(PROXY, "mainnet", 10) == (
+            implementation,
+            implementation,
+        )
+        assert provider.get_proxy_implementations(PROXY.upper(), "mainnet", 10) == (
+            implementation,
+            implementation,
+        )
+        assert provider.get_proxy_implementations(PROXY, "mainnet", 11) == (None, None)
+
+        slots_requests = batch_request.call_args_list[0][0][1]
+        assert [method for method, _ in slots_requests] == ["eth_getStorageAt"] * 2
+        assert slots_requests[0][1][2] == hex(10)
+        assert batch_request.call_count == 3
+
+    def test_proxy_implementations_read_failure(self, mocker):
+        provider = Web3Provider(nodes=NODES, default_chain="mainnet")
+        batch_request = mocker.patch.object(
+            provider,
+            "_batch_request",
+            side_effect=ValueError({"message": "missing trie node"}),
+        )
+
+        assert provider.get_proxy_implementations(PROXY, "mainnet", 10) == (None, None)
+        assert provider.get_proxy_implementations(PROXY, "mainnet", 10) == (None, None)
+        assert batch_request.call_count == 2
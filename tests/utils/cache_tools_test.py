@@ -0,0 +1,131 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ethtx.utils.cache_tools import (
+    TTLCache,
+    cached,
+    configure_cache,
+    get_cache_stats,
+)
+
+
+class TestTTLCache:
+    def test_bounded(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+        assert len(cache) == 2
+
+    def test_expiry(self, mocker):
+        monotonic = mocker.patch(
+            "ethtx.utils.cache_tools.time.monotonic", return_value=100.0
+        )
+        cache = TTLCache(maxsize=2, ttl=10)
+        cache.set("a", None)
+
+        assert "a" in cache
+        monotonic.return_value = 110.0
+        assert cache.get("a", "expired") == "expired"
+        assert len(cache) == 0
+
+    def test_stats(self):
+        cache = TTLCache(maxsize=1, ttl=None, name="test.stats")
+
+        cache.set("a", 1)
+        cache.get("a")
+        cache.get("b")
+        cache.set("b", 2)
+
+        assert get_cache_stats()["test.stats"] == {
+            "hits": 1,
+            "misses": 1,
+            "evictions": 1,
+            "size": 1,
+            "maxsize": 1,
+            "ttl": None,
+        }
+
+    def test_single_flight(self):
+        cache = TTLCache(maxsize=2, ttl=None)
+        calls = []
+
+        def load():
+            calls.append(1)
+            time.sleep(0.05)
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            values = list(
+                executor.map(lambda _: cache.get_or_load("a", load), range(4))
+            )
+
+        assert values == ["value"] * 4
+        assert len(calls) == 1
+
+    def test_configure_cache(self):
+        cache = TTLCache(maxsize=2, ttl=None, name="test.configured")
+
+        configure_cache("test.configured", maxsize=10, ttl=5)
+
+        assert (cache.maxsize, cache.ttl) == (10, 5)
+        assert TTLCache(name="test.configured").maxsize == 10
+
+
+class Provider:
+    def __init__(self):
+        self.calls = 0
+
+    @cached("test.provider")
+    def read(self, key, chain_id=None):
+        self.calls += 1
+        return key
+
+    @cached("test.provider.found", cache_none=False)
+    def find(self, key):
+        self.calls += 1
+        return None
+
+
+class TestCached:
+    def test_cached_per_instance(self):
+        provider, other_provider = Provider(), Provider()
+
+        provider.read("a")
+        provider.read("a")
+        other_provider.read("a")
+
+        assert provider.calls == 1
+        assert other_provider.calls == 1
+
+    def test_invalidate(self):
+        provider = Provider()
+
+        provider.read("a")
+        provider.read("b")
+        provider.read.invalidate("a")
+        provider.read("a")
+        provider.read("b")
+
+        assert provider.calls == 3
+
+    def test_unhashable_not_cached(self):
+        provider = Provider()
+
+        provider.read(["a"])
+        provider.read(["a"])
+
+        assert provider.calls == 2
+
+    def test_none_not_cached(self):
+        provider = Provider()
+
+        provider.find("a")
+        provider.find("a")
+
+        assert provider.calls == 2